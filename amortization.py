@@ -0,0 +1,94 @@
+import numpy as np
+
+from profiling import profiled
+
+
+def payment_months(term_months):
+    """
+    Number of months with a payment for a loan term of term_months months.
+
+    A payment is due in every month whose index is below the term, so a fractional
+    term (say 12.4 years, 148.8 months) still pays in every month it has begun:
+    ceil(term_months) payments. Complex terms (see sensitivity.py) count by their
+    real part.
+    """
+    return np.ceil(np.real(term_months))
+
+
+@profiled()
+def balance_after(principal, monthly_rate, payment, months_elapsed, term_months=None, payoff_tolerance=0.0):
+    """
+    Remaining loan balance after months_elapsed months, in closed form.
+
+    Each month interest accrues on the balance and then, while the month is within
+    the payment term, the fixed payment is subtracted. For the months with payments
+    the balance is B_k = B_0 * g^k - payment * (g^k - 1) / r with g = 1 + r, which is
+    clipped to zero once the loan is paid off (or falls to payoff_tolerance).
+    Anything still owed after the term only accrues interest.
+
+    All arguments may be NumPy arrays and are broadcast against each other.
+
+    Args:
+      principal: Initial loan balance. Non-positive balances count as paid off.
+      monthly_rate: Monthly interest rate (as a decimal). 0% is handled exactly.
+      payment: Fixed monthly payment made during the term.
+      months_elapsed: Number of months simulated.
+      term_months: Length of the payment term in months; a fractional term pays in
+                   every month it has begun (see payment_months). None means
+                   payments never stop.
+      payoff_tolerance: Balances at or below this are treated as paid off.
+
+    Returns:
+      The balance after months_elapsed months (an array, or a 0-d array for scalars).
+    """
+    principal = np.maximum(principal, 0)
+    if term_months is None:
+        months_with_payments = months_elapsed
+    else:
+        months_with_payments = np.minimum(months_elapsed, np.maximum(payment_months(term_months), 0))
+    log_growth = np.log1p(monthly_rate)
+
+    # g^k - 1 and (g^k - 1) / r, with the 0% interest limit (k) handled explicitly.
+    growth_minus_one = np.expm1(months_with_payments * log_growth)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        annuity_factor = np.where(monthly_rate == 0, months_with_payments, growth_minus_one / monthly_rate)
+    balance_at_term = principal + principal * growth_minus_one - payment * annuity_factor
+    balance_at_term = np.where(balance_at_term <= payoff_tolerance, 0, balance_at_term)
+
+    months_after_term = np.maximum(months_elapsed - months_with_payments, 0)
+    return balance_at_term * np.exp(months_after_term * log_growth)
+
+
+@profiled()
+def amortization_schedule(principal, monthly_rate, payment, num_months, term_months=None, payoff_tolerance=0.0):
+    """
+    Month-by-month balance, interest and principal schedules for one or many loans.
+
+    Loan parameters may be arrays of shape S; every schedule then has shape S + (num_months,).
+
+    Args:
+      principal, monthly_rate, payment, term_months, payoff_tolerance: See balance_after.
+      num_months: Number of months to schedule.
+
+    Returns:
+      A tuple (balances, interests, principals_paid):
+        - balances[..., m]: balance at the end of month m.
+        - interests[..., m]: interest accrued in month m (0 once paid off).
+        - principals_paid[..., m]: reduction of the balance in month m (0 once paid
+          off, negative if the payment does not cover the interest).
+    """
+    principal, monthly_rate, payment = (np.asarray(value, dtype=float)[..., None]
+                                        for value in (principal, monthly_rate, payment))
+    if term_months is not None:
+        term_months = np.asarray(term_months)[..., None]
+
+    # Balance at the start of every month plus the end of the last month.
+    balances = balance_after(principal, monthly_rate, payment, np.arange(num_months + 1), term_months, payoff_tolerance)
+    start_balances = balances[..., :-1]
+    end_balances = balances[..., 1:]
+    interests = start_balances * monthly_rate
+    principals_paid = start_balances - end_balances
+    if term_months is not None:
+        # After the term the balance grows by its interest without any payment.
+        principals_paid = np.where(np.arange(num_months) < term_months, principals_paid, 0)
+    return end_balances, interests, principals_paid
@@ -0,0 +1,364 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from functools import partial
+
+import numpy as np
+
+import profiling
+
+DEFAULT_HISTORY = "benchmarks.json"
+DEFAULT_THRESHOLD = 0.25
+
+# name -> function that does any setup and returns the zero-argument callable to time.
+BENCHMARKS = {}
+
+
+def _no_setup(func, *args, **kwargs):
+    """
+    Setup function for a benchmark that just calls func(*args, **kwargs).
+    """
+    return lambda: partial(func, *args, **kwargs)
+
+
+def benchmark(name):
+    """
+    Registers a benchmark. The decorated function does the setup and returns the callable to time.
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+#####################
+# Scenario sets
+#####################
+
+# Fixed parameters shared by the grid benchmarks (notebook defaults).
+GRID_KWARGS = dict(
+    initial_rent=1500,
+    home_price=800000,
+    down_payment_perc=0.20,
+    loan_term_years=30,
+    loan_interest=0.065,
+    property_tax_rate=0.0105,
+    stock_interest=0.08,
+    home_value_interest=0.054,
+)
+
+# Swept ranges giving about 1k (11 x 10 x 10) and 100k (51 x 51 x 40) cells.
+GRID_RANGES = {
+    "1k": {
+        "loan_interest": (0.04, 0.07, 0.003),
+        "down_payment_perc": (0.05, 0.4, 0.035),
+        "home_price": (500000, 1200000, 70000),
+    },
+    "100k": {
+        "loan_interest": (0.04, 0.07, 0.0006),
+        "down_payment_perc": (0.05, 0.4, 0.007),
+        "home_price": (500000, 1200000, 17500),
+    },
+}
+
+
+def _grid_kwargs(ranges, **extra):
+    kwargs = {name: value for name, value in GRID_KWARGS.items() if name not in ranges}
+    kwargs.update(at_year=30, **extra)
+    return kwargs
+
+
+def _register_single_calls():
+    import buy_v_rent
+    import buy_v_rent_point_in_time
+    import renting
+    import renting_gemini_fixed
+
+    for total_years in (5, 30, 45):
+        for label, func, kwargs in (
+                ("buy_v_rent.get_data", buy_v_rent.get_data, dict(total_years=total_years)),
+                ("renting.get_data", renting.get_data, dict(total_years=total_years)),
+                ("renting_gemini_fixed.get_data", renting_gemini_fixed.get_data, dict(total_years=total_years)),
+                ("buy_v_rent_point_in_time.get_data_at_year", buy_v_rent_point_in_time.get_data_at_year,
+                 dict(target_year=total_years)),
+        ):
+            BENCHMARKS[f"{label}[{total_years}y]"] = _no_setup(func, **kwargs)
+            # The original implementation (reference/) next to it, so speedups can be reproduced.
+            module_name, function_name = label.split(".")
+            reference = getattr(importlib.import_module(f"reference.{module_name}"), function_name)
+            BENCHMARKS[f"reference.{label}[{total_years}y]"] = _no_setup(reference, **kwargs)
+
+
+def _register_grids():
+    import buy_v_rent_point_in_time
+    import renting
+    import renting_gemini_fixed
+
+    for size, ranges in GRID_RANGES.items():
+        BENCHMARKS[f"buy_v_rent_point_in_time.grid_search_buying_diff[{size}]"] = _no_setup(
+            buy_v_rent_point_in_time.grid_search_buying_diff, ranges,
+            **_grid_kwargs(ranges, tenant_rent_initial=0))
+    BENCHMARKS["buy_v_rent_point_in_time.grid_search_buying_diff[100k,float32]"] = _no_setup(
+        buy_v_rent_point_in_time.grid_search_buying_diff, GRID_RANGES["100k"], dtype=np.float32,
+        **_grid_kwargs(GRID_RANGES["100k"], tenant_rent_initial=0))
+
+    # The per-cell models are only timed on the small grid (100k cells takes minutes).
+    ranges = GRID_RANGES["1k"]
+    BENCHMARKS["buy_v_rent_point_in_time.grid_search_buying_diff[1k,scalar]"] = _no_setup(
+        buy_v_rent_point_in_time.grid_search_buying_diff, ranges, engine="scalar",
+        **_grid_kwargs(ranges, tenant_rent_initial=0))
+    BENCHMARKS["renting.grid_search_buying_diff[1k]"] = _no_setup(
+        renting.grid_search_buying_diff, ranges, **_grid_kwargs(ranges))
+    BENCHMARKS["renting_gemini_fixed.grid_search_buying_diff[1k]"] = _no_setup(
+        renting_gemini_fixed.grid_search_buying_diff, ranges, **_grid_kwargs(ranges))
+
+
+@benchmark("buy_v_rent_point_in_time.get_data_at_year_batch[100k scenarios]")
+def _batch_scenarios():
+    import buy_v_rent_point_in_time
+
+    rng = np.random.default_rng(0)
+    num_scenarios = 100000
+    scenarios = dict(
+        target_year=30,
+        initial_rent=rng.uniform(500, 5000, num_scenarios),
+        home_price=rng.uniform(1e5, 2e6, num_scenarios),
+        loan_interest=rng.uniform(0.02, 0.1, num_scenarios),
+        stock_interest=rng.uniform(0.02, 0.12, num_scenarios),
+        home_value_interest=rng.uniform(0, 0.08, num_scenarios),
+    )
+    return partial(buy_v_rent_point_in_time.get_data_at_year_batch, solver="closed_form", **scenarios)
+
+
+@benchmark("buy_v_rent_point_in_time.evaluate_scenarios[100k listings]")
+def _listings():
+    import pandas as pd
+
+    import buy_v_rent_point_in_time
+
+    rng = np.random.default_rng(0)
+    num_listings = 100000
+    listings = pd.DataFrame({
+        "home_price": rng.uniform(1e5, 2e6, num_listings),
+        "initial_rent": rng.uniform(500, 5000, num_listings),
+        "property_tax_rate": rng.uniform(0.002, 0.025, num_listings),
+        "loan_interest": rng.uniform(0.03, 0.09, num_listings),
+    })
+    return partial(buy_v_rent_point_in_time.evaluate_scenarios, listings, target_year=30)
+
+
+@benchmark("buy_v_rent.IncrementalScenario[tenant_rent change,45y]")
+def _incremental_scenario():
+    import itertools
+
+    import buy_v_rent
+
+    scenario = buy_v_rent.IncrementalScenario(total_years=45)
+    scenario.get_data(output="arrays")
+    # Alternates between two values, so every call has one dirty parameter.
+    tenant_rents = itertools.cycle((0, 300))
+    return lambda: scenario.get_data(output="arrays", tenant_rent=next(tenant_rents))
+
+
+@benchmark("monte_carlo.get_percentile_bands[10k paths]")
+def _monte_carlo():
+    import monte_carlo
+
+    return partial(monte_carlo.get_percentile_bands, num_paths=10000, seed=0)
+
+
+# Kernel name -> arguments of a 30-year call (the notebook defaults).
+KERNEL_ARGS = {
+    "remaining_debt": (640000.0, 0.00526, 4045.12, 360, 360),
+    "debt_schedule": (640000.0, 0.00526, 4045.12, 360, 360),
+    "renter_investment": (360, 160000.0, 4045.12, 360, 0.00874, 1500.0, 800000.0, 0.0105, 0.01, 0.054, 0.0),
+}
+
+
+def _kernel_setup(name, backend):
+    """
+    Setup function for a kernel benchmark. Warms the backend up first, so numba's
+    compilation (or cache load) is not timed.
+    """
+    import kernels
+
+    kernels.warmup([backend])
+    return partial(kernels.get_kernel(name, backend), *KERNEL_ARGS[name])
+
+
+def _register_kernels():
+    import kernels
+
+    for backend in kernels.BACKENDS:
+        for name in KERNEL_ARGS:
+            BENCHMARKS[f"kernels.{name}[{backend}]"] = partial(_kernel_setup, name, backend)
+
+
+_register_single_calls()
+_register_grids()
+_register_kernels()
+
+
+#####################
+# Running and history
+#####################
+
+def measure(func, min_time=0.2, max_repeat=50):
+    """
+    Times func and measures its peak traced memory.
+
+    func is called until min_time seconds have been spent (at least twice, at most
+    max_repeat times), then once more under tracemalloc, which slows it down and
+    is therefore not timed.
+
+    Returns:
+      A dictionary with the best time in 'seconds', 'calls_per_second' derived from
+      it, and 'peak_bytes' allocated by one call.
+    """
+    best = float("inf")
+    spent = 0.0
+    repeats = 0
+    while repeats < 2 or (spent < min_time and repeats < max_repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        spent += elapsed
+        repeats += 1
+
+    tracemalloc.start()
+    try:
+        func()
+        _, peak_bytes = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {"seconds": best, "calls_per_second": 1 / best, "peak_bytes": peak_bytes, "repeats": repeats}
+
+
+def run_benchmarks(names=None, min_time=0.2):
+    """
+    Runs the benchmarks in names (default: all of BENCHMARKS) and returns {name: measure(...)}.
+    """
+    if names is None:
+        names = list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"Unknown benchmarks {unknown}.")
+    return {name: measure(BENCHMARKS[name](), min_time=min_time) for name in names}
+
+
+def profile_benchmarks(names, allocations=False, folded_path=None):
+    """
+    Runs each benchmark in names once with profiling enabled and prints its stages.
+
+    Args:
+      names: Benchmarks to profile.
+      allocations: Also record each stage's peak allocations.
+      folded_path: If given, the folded stacks of all benchmarks (each under its own
+                   root frame) are written there for a flamegraph.
+    """
+    lines = []
+    for name in names:
+        func = BENCHMARKS[name]()
+        with profiling.profile(allocations=allocations):
+            with profiling.stage(name):
+                func()
+        print(f"\n== {name} ==")
+        print(profiling.summary().to_string(float_format="{:.6f}".format))
+        lines.extend(profiling.folded())
+    if folded_path is not None:
+        with open(folded_path, "w") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {"runs": []}
+    with open(path) as f:
+        return json.load(f)
+
+
+def find_regressions(results, history, threshold=DEFAULT_THRESHOLD, baseline_runs=5):
+    """
+    Benchmarks that are more than threshold (e.g. 0.25 = 25%) slower than their
+    baseline: the median time of the last baseline_runs recorded runs that have them.
+
+    Returns:
+      A list of (name, baseline seconds, current seconds).
+    """
+    regressions = []
+    for name, result in results.items():
+        earlier = [run["results"][name]["seconds"] for run in history["runs"] if name in run["results"]]
+        if not earlier:
+            continue
+        baseline = float(np.median(earlier[-baseline_runs:]))
+        if result["seconds"] > baseline * (1 + threshold):
+            regressions.append((name, baseline, result["seconds"]))
+    return regressions
+
+
+def record_run(path, history, results):
+    history["runs"].append({
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    })
+    with open(path, "w") as f:
+        json.dump(history, f, indent=1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the simulation entry points.")
+    parser.add_argument("-k", "--filter", default="", help="Only run benchmarks whose name contains this.")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="JSON file with earlier runs.")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Fail when a benchmark is this much slower than its recent runs (0.25 = 25%%).")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend timing each benchmark.")
+    parser.add_argument("--no-save", action="store_true", help="Compare against the history without recording this run.")
+    parser.add_argument("--accept", action="store_true",
+                        help="Record this run even if it has regressions (e.g. after an intended slowdown).")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks and exit.")
+    parser.add_argument("--profile", action="store_true",
+                        help="Instead of timing, run each benchmark once and print its per-stage profile.")
+    parser.add_argument("--allocations", action="store_true", help="With --profile, also record allocations.")
+    parser.add_argument("--folded", help="With --profile, write flamegraph folded stacks to this file.")
+    args = parser.parse_args(argv)
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if args.profile:
+        profile_benchmarks(names, allocations=args.allocations, folded_path=args.folded)
+        return 0
+
+    history = load_history(args.history)
+    results = {}
+    for name in names:
+        results.update(run_benchmarks([name], min_time=args.min_time))
+        result = results[name]
+        print(f"{name:70s} {result['seconds'] * 1000:10.3f} ms {result['calls_per_second']:12.1f} calls/s "
+              f"{result['peak_bytes'] / 2**20:9.2f} MiB peak")
+
+    regressions = find_regressions(results, history, args.threshold)
+    # A regressed run is not recorded by default, so it cannot become the new baseline.
+    if not args.no_save and (args.accept or not regressions):
+        record_run(args.history, history, results)
+
+    for name, baseline, seconds in regressions:
+        print(f"REGRESSION {name}: {baseline * 1000:.3f} ms -> {seconds * 1000:.3f} ms "
+              f"(+{(seconds / baseline - 1) * 100:.0f}%)")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
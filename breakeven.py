@@ -0,0 +1,239 @@
+import numpy as np
+
+import buy_v_rent
+import buy_v_rent_point_in_time as pit
+import renting
+import renting_gemini_fixed
+
+try:
+    from scipy.optimize import brentq
+except ImportError:  # scipy is optional, method="bisect" needs only NumPy
+    brentq = None
+
+DIRECTIONS = ("up", "down", "any")
+METHODS = ("illinois", "bisect", "brentq")
+
+# Parameters of the point-in-time model that breakeven_parameter can solve for.
+PARAMS = (
+    "initial_rent",
+    "home_price",
+    "down_payment_perc",
+    "loan_term_years",
+    "loan_interest",
+    "property_tax_rate",
+    "stock_interest",
+    "home_value_interest",
+    "home_upkeep_percent",
+    "tenant_rent_initial",
+)
+
+
+def first_crossing(diff, direction="up", interpolate=False):
+    """
+    First month in which a diff series changes sign.
+
+    A crossing at month m means diff[m-1] and diff[m] are on different sides of zero:
+    "up" looks for diff[m-1] <= 0 < diff[m] (buying overtakes renting), "down" for
+    diff[m-1] > 0 >= diff[m], and "any" for either.
+
+    Args:
+      diff: A pandas Series or 1-D array of monthly diff values, or a 2-D array with
+            one scenario per row (months along the last axis).
+      direction: "up", "down" or "any".
+      interpolate: If True, return the fractional month where the straight line
+                   between diff[m-1] and diff[m] reaches zero instead of m.
+
+    Returns:
+      The crossing month as a float, NaN where there is no crossing. A number for
+      1-D input, otherwise an array with one entry per row.
+    """
+    if direction not in DIRECTIONS:
+        raise ValueError(f"Unknown direction '{direction}', expected one of {DIRECTIONS}.")
+
+    diff = np.asarray(diff, dtype=float)
+    previous = diff[..., :-1]
+    current = diff[..., 1:]
+    crosses_up = (previous <= 0) & (current > 0)
+    crosses_down = (previous > 0) & (current <= 0)
+    if direction == "up":
+        crosses = crosses_up
+    elif direction == "down":
+        crosses = crosses_down
+    else:
+        crosses = crosses_up | crosses_down
+
+    found = crosses.any(axis=-1)
+    # argmax gives the first True; +1 because crossing k lies between months k and k+1.
+    index = np.argmax(crosses, axis=-1) if crosses.shape[-1] else np.zeros(found.shape, dtype=int)
+    month = index + 1.0
+    if interpolate and crosses.shape[-1]:
+        before = np.take_along_axis(previous, index[..., None], axis=-1)[..., 0]
+        after = np.take_along_axis(current, index[..., None], axis=-1)[..., 0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            month = index + before / (before - after)
+    month = np.where(found, month, np.nan)
+    return float(month) if month.ndim == 0 else month
+
+
+def _buy_v_rent_diff(**params):
+    return buy_v_rent.get_data(**params, columns=['diff'], output="arrays")['diff']
+
+
+def _renting_diff(**params):
+    return renting.get_data(**params, columns=['diff'], output="arrays")['diff']
+
+
+def _renting_gemini_fixed_diff(**params):
+    return renting_gemini_fixed.get_data(**params)['diff'].to_numpy(dtype=float)
+
+
+# Model name -> function returning the monthly diff series for one scenario.
+MODELS = {
+    "buy_v_rent": _buy_v_rent_diff,
+    "renting": _renting_diff,
+    "renting_gemini_fixed": _renting_gemini_fixed_diff,
+}
+
+
+def breakeven_month(model="buy_v_rent", total_years=45, direction="up", interpolate=False, **params):
+    """
+    Month in which buying overtakes renting (or see direction) in a monthly model.
+
+    Args:
+      model: One of MODELS ("buy_v_rent", "renting", "renting_gemini_fixed").
+      total_years: Number of years to simulate.
+      direction, interpolate: See first_crossing.
+      **params: Parameters of the model's get_data. Array values define a batch of
+                scenarios; all arrays are broadcast against each other.
+
+    Returns:
+      The crossing month (NaN if there is none within total_years): a number when all
+      params are scalars, otherwise an array with the broadcast shape of params.
+    """
+    if model not in MODELS:
+        raise ValueError(f"Unknown model '{model}', expected one of {list(MODELS)}.")
+    diff_series = MODELS[model]
+
+    names = list(params)
+    values = np.broadcast_arrays(*(np.asarray(params[name]) for name in names)) if names else []
+    shape = values[0].shape if names else ()
+    if shape == ():
+        return first_crossing(diff_series(total_years=total_years, **params), direction, interpolate)
+
+    diffs = np.stack([
+        diff_series(total_years=total_years, **{name: value[index].item() for name, value in zip(names, values)})
+        for index in np.ndindex(shape)
+    ])
+    return first_crossing(diffs, direction, interpolate).reshape(shape)
+
+
+def _diff_at_year(at_year, params):
+    result = pit.get_data_at_year_batch(target_year=at_year, solver="closed_form", **params)
+    return result['effective_net_worth_with_home'] - result['effective_net_worth_renting']
+
+
+def breakeven_parameter(param, bracket, at_year, method="illinois", xtol=1e-10, maxiter=200, **params):
+    """
+    Value of one parameter that makes buying and renting break even at at_year.
+
+    Solves diff(param) = 0 on the vectorized point-in-time model (closed-form
+    solver), where diff is get_buying_diff. The bracket must straddle the root:
+    scenarios whose diff has the same sign at both ends of the bracket get NaN.
+
+    Args:
+      param: Name of the parameter to solve for, one of PARAMS.
+      bracket: (low, high) values of param; each may be an array.
+      at_year: Whole number of years at which the diff is measured.
+      method: "illinois" (Illinois false position) and "bisect" solve every
+              scenario at once, one batch model evaluation per step; Illinois
+              usually needs 5-10 steps where bisection needs ~35. "brentq" runs
+              scipy.optimize.brentq per scenario.
+      xtol: Absolute tolerance on the parameter value.
+      maxiter: Maximum number of steps.
+      **params: Other parameters of get_data_at_year (defaults are used for the
+                rest). Scalars or arrays; arrays define a batch of scenarios.
+
+    Returns:
+      The breakeven value: a number for a single scenario, otherwise an array with
+      the broadcast shape of at_year, bracket and params.
+    """
+    if param not in PARAMS:
+        raise ValueError(f"Unknown parameter '{param}', expected one of {PARAMS}.")
+    if param in params:
+        raise ValueError(f"Parameter '{param}' cannot be both solved for and fixed.")
+    if method not in METHODS:
+        raise ValueError(f"Unknown method '{method}', expected one of {METHODS}.")
+    if method == "brentq" and brentq is None:
+        raise ValueError("method='brentq' needs scipy; use method='bisect'.")
+
+    low, high = bracket
+    arrays = np.broadcast_arrays(np.asarray(low, dtype=float), np.asarray(high, dtype=float),
+                                 np.asarray(at_year, dtype=float), *(np.asarray(value) for value in params.values()))
+    low, high, at_year = (np.array(value) for value in arrays[:3])
+    params = dict(zip(params, arrays[3:]))
+
+    diff_low = _diff_at_year(at_year, dict(params, **{param: low}))
+    diff_high = _diff_at_year(at_year, dict(params, **{param: high}))
+    bracketed = np.sign(diff_low) * np.sign(diff_high) <= 0
+
+    if method == "brentq":
+        roots = np.full(low.shape, np.nan)
+        for index in np.ndindex(low.shape):
+            if not bracketed[index]:
+                continue
+            scenario = {name: value[index] for name, value in params.items()}
+
+            def diff(value):
+                return float(_diff_at_year(at_year[index], dict(scenario, **{param: value})))
+
+            roots[index] = brentq(diff, low[index], high[index], xtol=xtol, maxiter=maxiter)
+    elif method == "illinois":
+        roots = np.where(diff_low == 0, low, high)
+        converged = ~bracketed | (diff_low == 0) | (diff_high == 0)
+        kept_low = np.zeros(low.shape, dtype=bool)
+        kept_high = np.zeros(low.shape, dtype=bool)
+        for _ in range(maxiter):
+            if np.all(converged):
+                break
+            # Where the secant through the bracket ends crosses zero.
+            with np.errstate(divide='ignore', invalid='ignore'):
+                estimate = (low * diff_high - high * diff_low) / (diff_high - diff_low)
+            estimate = np.where(converged, roots, estimate)
+            diff_estimate = _diff_at_year(at_year, dict(params, **{param: estimate}))
+            root_in_low_half = np.sign(diff_estimate) * np.sign(diff_low) <= 0
+            # Illinois step: halve the value at an end that is kept twice in a row, so
+            # that end moves too and the bracket keeps shrinking.
+            diff_low = np.where(root_in_low_half & kept_low, diff_low / 2, diff_low)
+            diff_high = np.where(~root_in_low_half & kept_high, diff_high / 2, diff_high)
+            kept_low, kept_high = root_in_low_half, ~root_in_low_half
+            high, diff_high = np.where(root_in_low_half, estimate, high), np.where(root_in_low_half, diff_estimate, diff_high)
+            low, diff_low = np.where(root_in_low_half, low, estimate), np.where(root_in_low_half, diff_low, diff_estimate)
+            converged |= (np.abs(estimate - roots) <= xtol) | (diff_estimate == 0) | (np.abs(high - low) <= xtol)
+            roots = estimate
+        roots = np.where(bracketed, roots, np.nan)
+    else:
+        for _ in range(maxiter):
+            if np.all(np.abs(high - low) <= xtol):
+                break
+            middle = (low + high) / 2
+            diff_middle = _diff_at_year(at_year, dict(params, **{param: middle}))
+            # Keep the half whose ends still have opposite signs.
+            root_in_low_half = np.sign(diff_middle) * np.sign(diff_low) <= 0
+            high = np.where(root_in_low_half, middle, high)
+            low = np.where(root_in_low_half, low, middle)
+            diff_low = np.where(root_in_low_half, diff_low, diff_middle)
+        roots = np.where(bracketed, (low + high) / 2, np.nan)
+
+    return float(roots) if roots.ndim == 0 else roots
+
+
+if __name__ == "__main__":
+    # The breakeven loan interest should put the diff at (almost exactly) zero.
+    scenario = dict(initial_rent=3000, home_price=800000, stock_interest=0.08)
+    rate = breakeven_parameter("loan_interest", (0.0, 0.2), at_year=30, **scenario)
+    print(f"breakeven loan_interest at year 30: {rate:.6f}")
+    print("diff there:", pit.get_buying_diff(30, loan_interest=rate, down_payment_perc=0.2, loan_term_years=30,
+                                              property_tax_rate=0.0105, home_value_interest=0.054,
+                                              tenant_rent_initial=0, **scenario))
+    print("breakeven month (buy_v_rent, 5% stocks):",
+          breakeven_month(stock_interest=0.05, initial_rent=3000, interpolate=True))
@@ -1,54 +1,58 @@
+import inspect
+
 import pandas as pd
 import numpy as np
 
+import kernels
+from amortization import amortization_schedule, balance_after
+from column_graph import ColumnArrays, ColumnGraph, IncrementalEvaluation
+from profiling import profiled
+
+try:
+    from scipy.signal import lfilter
+except ImportError:  # scipy is optional, fall back to scaled prefix sums
+    lfilter = None
+
+# Largest log growth factor applied within one block of _growth_prefix_sums, which
+# keeps the g**j / g**-j scale factors far away from float overflow on long horizons.
+_MAX_LOG_GROWTH_PER_BLOCK = 50.0
+
 def get_debt_data(
         initial_loan_principal,
         fixed_monthly_payment_amount, # The payment amount during the loan term
         monthly_loan_rate,
         total_simulation_months,    # e.g., total_years * 12
-        loan_payment_term_months    # e.g., loan_term_years * 12
+        loan_payment_term_months,   # e.g., loan_term_years * 12
+        backend=None                # kernels backend, used for a single loan
         ):
-    current_loan_balance = initial_loan_principal
-    debt_values_over_time = []
-    interest_paid_over_time = []
-    for month_index in range(total_simulation_months):
-        if current_loan_balance <= 0: # Loan already paid off
-            debt_values_over_time.append(0)
-            interest_paid_over_time.append(0)
-            current_loan_balance = 0 # Ensure it stays 0 for subsequent months
-            continue
-
-        interest_for_month = current_loan_balance * monthly_loan_rate
-        interest_paid_over_time.append(interest_for_month)
-
-        payment_made_this_month = 0
-        # Check if payments are still being made in the current month
-        if month_index < loan_payment_term_months:
-            payment_made_this_month = fixed_monthly_payment_amount
-
-        current_loan_balance += interest_for_month      # Add interest
-        current_loan_balance -= payment_made_this_month # Subtract payment
-
-        if current_loan_balance < 0: # Loan paid off (or overpaid)
-            current_loan_balance = 0
-
-        debt_values_over_time.append(current_loan_balance)
+    loan = (initial_loan_principal, monthly_loan_rate, fixed_monthly_payment_amount, loan_payment_term_months)
+    if all(np.ndim(value) == 0 for value in loan):
+        # A single loan goes through the selected kernel (numba when installed).
+        return kernels.get_kernel("debt_schedule", backend)(
+            initial_loan_principal,
+            monthly_loan_rate,
+            fixed_monthly_payment_amount,
+            total_simulation_months,
+            loan_payment_term_months,
+        )
+    debt_values_over_time, interest_paid_over_time, _ = amortization_schedule(
+        initial_loan_principal,
+        monthly_loan_rate,
+        fixed_monthly_payment_amount,
+        total_simulation_months,
+        loan_payment_term_months,
+    )
     return debt_values_over_time, interest_paid_over_time
 
 def get_monthly_interest_owed(
         loan_principal, monthly_payment, monthly_loan_interest_rate, total_years):
-    loan = loan_principal
-    interest = 0
-    interests = []
-    for i in range(total_years*12):
-        monthly_interest = loan * (monthly_loan_interest_rate)
-        loan = loan + monthly_interest - monthly_payment
-        if loan <= 0:
-            loan = 0
-        interests.append(monthly_interest)
+    # Payments continue for the whole simulation (no term), as before.
+    _, interests, _ = amortization_schedule(
+        loan_principal, monthly_loan_interest_rate, monthly_payment, total_years*12)
     return interests
 
 
+@profiled()
 def yearly_incrementing(initial_val, interest, years):
     # calculates rent with 1 year lag to home interest (comment from original)
     # Behavior: value is constant for 12 months, then increments.
@@ -63,13 +67,309 @@ def yearly_incrementing(initial_val, interest, years):
 def cumulative_sum(series):
     return series.cumsum()
 
-def calculate_growth_repeated_investments(investments: pd.Series, rate: float) -> pd.Series:
-    acc = np.zeros(len(investments))
-    acc[0] = investments.iloc[0]
-    for i in range(1, len(investments)):
-        acc[i] = acc[i-1] * (1 + rate) + investments.iloc[i]
-    return pd.Series(acc, index=investments.index)
+def _growth_prefix_sums(values, growth):
+    """
+    acc[..., i] = acc[..., i-1] * growth + values[..., i] along the last axis.
+
+    Uses acc[i] = g**i * cumsum(values[j] * g**-j), computed in blocks so that the
+    scale factors g**j never exceed exp(_MAX_LOG_GROWTH_PER_BLOCK); the balance at
+    the end of each block is carried into the next one.
+    """
+    num_months = values.shape[-1]
+    growth = np.broadcast_to(growth, values.shape[:-1])[..., None]
+    acc = np.empty(values.shape)
+    if num_months == 0:
+        return acc
+
+    if np.any(growth <= 0):
+        # A rate of -100% or below has no logarithm; step through the months instead.
+        acc[..., 0] = values[..., 0]
+        for i in range(1, num_months):
+            acc[..., i] = acc[..., i-1] * growth[..., 0] + values[..., i]
+        return acc
+
+    log_growth = np.log(growth)
+    largest_log_growth = np.max(np.abs(log_growth), initial=0)
+    block = num_months if largest_log_growth == 0 else int(max(1, min(num_months, _MAX_LOG_GROWTH_PER_BLOCK // largest_log_growth)))
+
+    carry = np.zeros(growth.shape)
+    for start in range(0, num_months, block):
+        stop = min(start + block, num_months)
+        exponents = np.arange(stop - start)
+        scale = np.exp(exponents * log_growth)
+        acc[..., start:stop] = scale * (carry * growth + np.cumsum(values[..., start:stop] / scale, axis=-1))
+        carry = acc[..., stop-1:stop]
+    return acc
+
+@profiled()
+def calculate_growth_repeated_investments(investments, rate):
+    """
+    acc[0] = investments[0]; acc[i] = acc[i-1] * (1 + rate) + investments[i].
+
+    Args:
+      investments: A pandas Series, a 1-D array, or a 2-D array with one scenario
+                   per row (months along the last axis).
+      rate: Monthly growth rate. A scalar, or one rate per row for 2-D input.
+
+    Returns:
+      A Series with the same index for Series input, otherwise an array with the
+      same shape as investments.
+    """
+    values = np.asarray(investments, dtype=float)
+    growth = 1 + np.asarray(rate, dtype=float)
+
+    if lfilter is not None and growth.ndim == 0 and values.size:
+        # y[i] = x[i] + g * y[i-1] is a first-order IIR filter.
+        acc = lfilter([1.0], [1.0, -float(growth)], values, axis=-1)
+    else:
+        acc = _growth_prefix_sums(values, growth)
+
+    if isinstance(investments, pd.Series):
+        return pd.Series(acc, index=investments.index)
+    return acc
+
+CAPITAL_GAINS_TAX_RATE = .15
+REALTOR_COST = .06 # percent
+
+#####################
+# Column graph used by get_data
+#####################
+
+_graph = ColumnGraph()
+
+@_graph.node
+def _months(total_years):
+    return np.arange(total_years * 12)
+
+@_graph.node
+def _year(months):
+    return months / 12
+
+@_graph.node
+def _monthly_loan_interest_rate(loan_interest):
+    return (1+loan_interest)**(1/12) - 1
+
+@_graph.node
+def _monthly_stock_interest(stock_interest):
+    return (1+stock_interest)**(1/12) - 1
+
+@_graph.node
+def _loan_principal(home_price, down_payment_perc):
+    return home_price * (1-down_payment_perc)
+
+@_graph.node
+def _down_payment_amount(home_price, loan_principal):
+    return home_price - loan_principal
+
+@_graph.node
+def _monthly_payment(loan_principal, monthly_loan_interest_rate, loan_term_years):
+    yearly_payments = 12
+    payments = loan_term_years * yearly_payments
+    return loan_principal * (monthly_loan_interest_rate * (1 + monthly_loan_interest_rate) ** payments) / ((1 + monthly_loan_interest_rate) ** payments - 1)
+
+@_graph.node
+def _home_value(home_price, home_value_interest, total_years):
+    return np.asarray(yearly_incrementing(home_price, home_value_interest, total_years), dtype=float)
+
+@_graph.node
+def _property_tax_monthly(home_value, property_tax_rate):
+    return home_value * property_tax_rate / 12
+
+@_graph.node
+def _home_upkeep_monthly(home_value, home_upkeep_percent):
+    return home_value * home_upkeep_percent / 12
+
+@_graph.node
+def _mortgage_payment(months, monthly_payment, loan_term_years):
+    return np.where(months <= loan_term_years * 12, monthly_payment, 0.0)
+
+@_graph.node
+def _down_payment(months, down_payment_amount):
+    down_payment = np.zeros(len(months))
+    down_payment[:1] = down_payment_amount
+    return down_payment
+
+@_graph.node
+def _debt_data(loan_principal, monthly_payment, monthly_loan_interest_rate, months, loan_term_years):
+    num_loan_payment_months = loan_term_years * 12
+    return get_debt_data(
+        loan_principal,
+        monthly_payment,
+        monthly_loan_interest_rate,
+        len(months),
+        num_loan_payment_months,
+    )
+
+@_graph.node
+def _remaining_debt(debt_data):
+    return debt_data[0]
+
+@_graph.node
+def _monthly_interest_owed(debt_data):
+    return debt_data[1]
+
+@_graph.node
+def _net_worth_with_home(home_value, remaining_debt):
+    return home_value - remaining_debt
 
+@_graph.node
+def _tenant_rent_monthly(tenant_rent, home_value_interest, total_years):
+    return np.asarray(yearly_incrementing(tenant_rent, home_value_interest, total_years), dtype=float)
+
+@_graph.node
+def _paid_towards_home(down_payment, mortgage_payment, property_tax_monthly, home_upkeep_monthly, tenant_rent_monthly):
+    return down_payment + mortgage_payment + property_tax_monthly + home_upkeep_monthly - tenant_rent_monthly
+
+@_graph.node
+def _rent(initial_rent, home_value_interest, total_years):
+    return np.asarray(yearly_incrementing(initial_rent, home_value_interest, total_years), dtype=float)
+
+@_graph.node
+def _excess_available_to_invest_monthly_renting(paid_towards_home, rent):
+    return paid_towards_home - rent
+
+@_graph.node
+def _cumulative_invested_renting(excess_available_to_invest_monthly_renting, monthly_stock_interest):
+    return calculate_growth_repeated_investments(excess_available_to_invest_monthly_renting, monthly_stock_interest)
+
+@_graph.node
+def _net_worth_renting(cumulative_invested_renting):
+    return cumulative_invested_renting
+
+# not all of investments would be subject to capital gains tax, but in a world where buy v renting doesnt affect maxing out retirement
+# accounts this is a reasonable assumption i think
+@_graph.node
+def _capital_gains_tax(net_worth_renting):
+    return net_worth_renting * (CAPITAL_GAINS_TAX_RATE)
+
+@_graph.node
+def _effective_net_worth_renting(net_worth_renting, capital_gains_tax):
+    return net_worth_renting - capital_gains_tax
+
+@_graph.node
+def _realtor_fees_if_selling(net_worth_with_home):
+    return net_worth_with_home * (REALTOR_COST)
+
+@_graph.node
+def _effective_net_worth_with_home(net_worth_with_home, realtor_fees_if_selling):
+    return net_worth_with_home - realtor_fees_if_selling
+
+@_graph.node
+def _diff(effective_net_worth_with_home, effective_net_worth_renting):
+    return effective_net_worth_with_home - effective_net_worth_renting
+
+#####################
+# Yearly resolution
+#####################
+
+# The same model sampled at the last month of every year (months 11, 23, ...). Rent,
+# home value, tax, upkeep and tenant rent only change once a year, so each year's
+# twelve monthly investments fold into one annuity factor and the recurrences step a
+# year at a time. Only the nodes that depend on the month are replaced; every other
+# node works element-wise and is shared with the monthly graph.
+_yearly_graph = _graph.copy()
+
+def yearly_values(initial_val, interest, years):
+    """
+    yearly_incrementing(initial_val, interest, years) at one month per year.
+    """
+    val = initial_val
+    vals = []
+    for i in range(years):
+        if i != 0:
+            val = val * (1 + interest)
+        vals.append(val)
+    return vals
+
+def _growth_sum(growth, count):
+    """
+    Sum of growth**j for j in range(count) (count where growth is exactly 1). Works on arrays.
+    """
+    growth = np.asarray(growth, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(growth == 1, count, (growth ** count - 1) / (growth - 1))
+
+@_yearly_graph.node(name="months")
+def _yearly_months(total_years):
+    return np.arange(total_years) * 12 + 11
+
+@_yearly_graph.node(name="home_value")
+def _yearly_home_value(home_price, home_value_interest, total_years):
+    return np.asarray(yearly_values(home_price, home_value_interest, total_years), dtype=float)
+
+@_yearly_graph.node(name="tenant_rent_monthly")
+def _yearly_tenant_rent_monthly(tenant_rent, home_value_interest, total_years):
+    return np.asarray(yearly_values(tenant_rent, home_value_interest, total_years), dtype=float)
+
+@_yearly_graph.node(name="rent")
+def _yearly_rent(initial_rent, home_value_interest, total_years):
+    return np.asarray(yearly_values(initial_rent, home_value_interest, total_years), dtype=float)
+
+@_yearly_graph.node(name="down_payment")
+def _yearly_down_payment(months):
+    # Only month 0 has a down payment, and it is never the last month of a year.
+    return np.zeros(len(months))
+
+@_yearly_graph.node(name="debt_data")
+def _yearly_debt_data(loan_principal, monthly_payment, monthly_loan_interest_rate, months, loan_term_years):
+    # The amortization schedule's entries for these months: the balance at the start
+    # and at the end of each month, from the closed form.
+    start_balances, end_balances = balance_after(loan_principal, monthly_loan_interest_rate, monthly_payment,
+                                                 np.stack([months, months + 1]), loan_term_years * 12)
+    return end_balances, start_balances * monthly_loan_interest_rate
+
+@_yearly_graph.node(name="cumulative_invested_renting")
+def _yearly_cumulative_invested_renting(months, excess_available_to_invest_monthly_renting, mortgage_payment,
+                                        monthly_payment, loan_term_years, down_payment_amount,
+                                        monthly_stock_interest):
+    growth = 1 + monthly_stock_interest
+    # Apart from the mortgage and the down payment, every month of year y invests the
+    # same amount as its last month, and those twelve investments are worth
+    # amount * (1 + g + ... + g**11) at the end of the year.
+    yearly_amount = excess_available_to_invest_monthly_renting - mortgage_payment
+    contributions = yearly_amount * _growth_sum(growth, 12)
+
+    # The mortgage is paid in months 0 .. loan_term_years * 12 (inclusive), so
+    # paid_months of the year's months have it, at the start of the year.
+    first_months = months - 11
+    paid_months = np.clip(np.floor(loan_term_years * 12) + 1 - first_months, 0, 12)
+    contributions = contributions + monthly_payment * growth ** (12 - paid_months) * _growth_sum(growth, paid_months)
+
+    # The down payment is invested in month 0 and grows for the rest of year 0.
+    contributions[:1] += down_payment_amount * growth ** 11
+
+    return calculate_growth_repeated_investments(contributions, growth ** 12 - 1)
+
+# DataFrame column -> graph node, in DataFrame order.
+COLUMNS = {
+    'months': 'months',
+    'year': 'year',
+    'home_value': 'home_value',
+    'property_tax_monthly': 'property_tax_monthly',
+    'home_upkeep_monthly': 'home_upkeep_monthly',
+    'mortgage_payment': 'mortgage_payment',
+    'down_payment': 'down_payment',
+    'remaining_debt': 'remaining_debt',
+    'monthly_interest_owed': 'monthly_interest_owed',
+    'net_worth_with_home': 'net_worth_with_home',
+    'tenant_rent': 'tenant_rent_monthly',
+    'paid_towards_home': 'paid_towards_home',
+    'rent': 'rent',
+    'excess_available_to_invest_monthly_renting': 'excess_available_to_invest_monthly_renting',
+    'cumulative_invested_renting': 'cumulative_invested_renting',
+    'net_worth_renting': 'net_worth_renting',
+    'capital_gains_tax': 'capital_gains_tax',
+    'effective_net_worth_renting': 'effective_net_worth_renting',
+    'realtor_fees_if_selling': 'realtor_fees_if_selling',
+    'effective_net_worth_with_home': 'effective_net_worth_with_home',
+    'diff': 'diff',
+}
+
+# Columns get_data returns by default: the original DataFrame's. 'diff' is only
+# computed when asked for with columns=.
+DEFAULT_COLUMNS = [column for column in COLUMNS if column != 'diff']
+
+@profiled()
 def get_data(total_years=45,
              initial_rent=1500,
              home_price=800000,
@@ -80,70 +380,152 @@ def get_data(total_years=45,
              stock_interest=.11,
              home_value_interest=.054,
              home_upkeep_percent = .01,
-             tenant_rent = 0
+             tenant_rent = 0,
+             columns=None,
+             output="dataframe",
+             resolution="monthly",
              ):
+    """
+    Month-by-month buy vs rent model.
 
-    yearly_payments=12
+    columns: Names of the columns to compute, from COLUMNS (default:
+             DEFAULT_COLUMNS, i.e. all but 'diff'). Only
+             these columns and the values they depend on are computed.
+    output: "dataframe" returns a pandas DataFrame; "arrays" returns a
+            ColumnArrays dict of NumPy arrays (call .to_dataframe() if needed).
+    resolution: "monthly" gives one row per month. "yearly" gives only the last
+                month of every year (months 11, 23, ...), with the same values
+                as those monthly rows, and steps a year at a time.
+    """
+    columns = _check_output(columns, output)
+    graph = _resolution_graph(resolution)
+    params = dict(
+        total_years=total_years,
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+        home_upkeep_percent=home_upkeep_percent,
+        tenant_rent=tenant_rent,
+    )
+    values = graph.evaluate(params, [COLUMNS[column] for column in columns])
+    return _output(values, columns, output)
 
-    monthly_loan_interest_rate = (1+loan_interest)**(1/12) - 1
-    months = total_years * 12
 
-    loan_principal = home_price * (1-down_payment_perc)
-    down_payment = home_price - loan_principal
-    payments = loan_term_years * yearly_payments
-    monthly_payment = loan_principal * (monthly_loan_interest_rate * (1 + monthly_loan_interest_rate) ** payments) / ((1 + monthly_loan_interest_rate) ** payments - 1)
+def _check_output(columns, output):
+    """
+    Validates get_data's columns and output arguments and returns the column list.
+    """
+    if output not in ("dataframe", "arrays"):
+        raise ValueError(f"Unknown output '{output}', expected 'dataframe' or 'arrays'.")
+    if columns is None:
+        columns = list(DEFAULT_COLUMNS)
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns {unknown}, expected names from COLUMNS.")
+    return columns
 
-    monthly_stock_interest = (1+stock_interest)**(1/12) - 1
-    monthly_home_appreciation = (1+home_value_interest)**(1/12) - 1
 
-    df = pd.DataFrame({"months": list(range(months))})
-    df['year'] = df['months'] / 12
+def _resolution_graph(resolution):
+    if resolution not in ("monthly", "yearly"):
+        raise ValueError(f"Unknown resolution '{resolution}', expected 'monthly' or 'yearly'.")
+    return _graph if resolution == "monthly" else _yearly_graph
 
-    df['home_value'] = yearly_incrementing(home_price, home_value_interest, total_years)
-    df['property_tax_monthly'] = df['home_value'] * property_tax_rate / 12
-    df['home_upkeep_monthly'] = df['home_value'] * home_upkeep_percent / 12
 
-    df['mortgage_payment'] = monthly_payment
-    df['mortgage_payment'] = df['months'].apply(lambda month: monthly_payment if month <= loan_term_years * 12 else 0)
+def _output(values, columns, output):
+    arrays = ColumnArrays((column, values[COLUMNS[column]]) for column in columns)
+    if output == "arrays":
+        return arrays
+    return arrays.to_dataframe()
 
-    df['down_payment']  = 0
-    df.loc[0, 'down_payment'] += down_payment
 
-    num_loan_payment_months = loan_term_years * 12 # Or use your existing 'payments' variable: loan_term_years * yearly_payments
+# Model parameters of get_data and their defaults.
+PARAM_DEFAULTS = {
+    name: parameter.default for name, parameter in inspect.signature(get_data).parameters.items()
+    if name not in ("columns", "output", "resolution")
+}
 
-    df['remaining_debt'], df['monthly_interest_owed'] = get_debt_data(
-        loan_principal,
-        monthly_payment,
-        monthly_loan_interest_rate,
-        months,
-        num_loan_payment_months,
-    )
 
-    df['net_worth_with_home'] = df['home_value'] - df['remaining_debt']
+class IncrementalScenario:
+    """
+    get_data for one scenario whose parameters are changed one at a time, e.g. by
+    a slider or while exploring in the notebook.
+
+    Columns computed for earlier parameter values are kept, and a change only
+    recomputes the columns downstream of it: tenant_rent only redoes
+    tenant_rent_monthly, paid_towards_home and what follows from them, and
+    property_tax_rate never touches the amortization.
 
-    df['tenant_rent'] = yearly_incrementing(tenant_rent, home_value_interest, total_years)
-    df['paid_towards_home'] = df['down_payment'] + df['mortgage_payment'] + df['property_tax_monthly'] + df['home_upkeep_monthly'] - df['tenant_rent']
+        scenario = IncrementalScenario(total_years=30, home_price=900000)
+        df = scenario.get_data()
+        df = scenario.get_data(tenant_rent=300)   # only the dirty columns are recomputed
 
-    #####################
-    # RENT
-    #####################
+    Arrays returned with output="arrays" are shared with the cache and must not be
+    modified in place.
+    """
 
-    df['rent'] = yearly_incrementing(initial_rent, home_value_interest, total_years)
+    def __init__(self, resolution="monthly", **params):
+        """
+        Args:
+          resolution: See get_data.
+          **params: Model parameters of get_data; the rest take get_data's defaults.
+        """
+        unknown = [name for name in params if name not in PARAM_DEFAULTS]
+        if unknown:
+            raise ValueError(f"Unknown parameters {unknown}, expected names from PARAM_DEFAULTS.")
+        self.resolution = resolution
+        self._evaluation = IncrementalEvaluation(_resolution_graph(resolution), dict(PARAM_DEFAULTS, **params))
 
-    df['excess_available_to_invest_monthly_renting'] = df['paid_towards_home'] - df['rent']
+    @property
+    def params(self):
+        return {name: self._evaluation.values[name] for name in PARAM_DEFAULTS}
 
-    df['cumulative_invested_renting'] = calculate_growth_repeated_investments(df['excess_available_to_invest_monthly_renting'],
-                                                                              monthly_stock_interest)
+    @property
+    def last_computed(self):
+        """Names of the nodes the last get_data call had to compute."""
+        return self._evaluation.last_computed
 
-    df['net_worth_renting'] =  df['cumulative_invested_renting']
+    def get_data(self, columns=None, output="dataframe", **changes):
+        """
+        Same as get_data for the scenario's parameters, after applying changes.
 
-    CAPITAL_GAINS_TAX_RATE = .15
-    # not all of investments would be subject to capital gains tax, but in a world where buy v renting doesnt affect maxing out retirement
-    # accounts this is a reasonable assumption i think
-    df['capital_gains_tax'] = df['net_worth_renting'] * (CAPITAL_GAINS_TAX_RATE)
-    df['effective_net_worth_renting'] = df['net_worth_renting'] - df['capital_gains_tax']
-    REALTOR_COST = .06 # percent
-    df['realtor_fees_if_selling'] = df['net_worth_with_home'] * (REALTOR_COST)
-    df['effective_net_worth_with_home'] = df['net_worth_with_home'] - df['realtor_fees_if_selling']
+        Args:
+          columns, output: See get_data.
+          **changes: New values for some model parameters; they stay in effect for
+                     later calls.
+        """
+        columns = _check_output(columns, output)
+        self._evaluation.update(**changes)
+        values = self._evaluation.evaluate([COLUMNS[column] for column in columns])
+        return _output(values, columns, output)
 
-    return df
+def get_buying_diff(at_year,
+                    initial_rent,
+                    home_price,
+                    down_payment_perc,
+                    loan_term_years,
+                    loan_interest,
+                    property_tax_rate,
+                    stock_interest,
+                    home_value_interest,
+                    tenant_rent,
+                    ):
+    arrays = get_data(
+        total_years=at_year,
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+        tenant_rent=tenant_rent,
+        columns=['diff'],
+        output="arrays",
+        resolution="yearly")
+    return arrays['diff'][-1]
@@ -1,10 +1,19 @@
 import numpy as np
+import pandas as pd
+
+import kernels
+from amortization import balance_after, payment_months
+from profiling import profiled
+from sweep import expand_param_ranges, run_adaptive_grid, run_grid, run_grid_to_file, sample_drift
 
 # Helper function to calculate remaining debt after a certain number of months
-def calculate_remaining_debt(initial_principal, monthly_rate, fixed_monthly_payment, num_payments_to_simulate, loan_payment_term_months):
+def calculate_remaining_debt(initial_principal, monthly_rate, fixed_monthly_payment, num_payments_to_simulate, loan_payment_term_months,
+                             backend=None):
     """
     Calculates the remaining loan balance after a specific number of months
-    by simulating month-by-month payments and interest accrual.
+    using the "remaining_debt" kernel of the given backend (see kernels.py): the
+    closed-form amortization kernel (amortization.balance_after) for "numpy", a
+    numba-compiled month loop for "numba".
 
     Args:
         initial_principal: The starting loan amount.
@@ -12,44 +21,14 @@ def calculate_remaining_debt(initial_principal, monthly_rate, fixed_monthly_paym
         fixed_monthly_payment: The constant monthly payment amount.
         num_payments_to_simulate: The number of months to simulate forward.
         loan_payment_term_months: The total number of months the loan payments are scheduled for.
+        backend: Kernel backend (default: kernels.DEFAULT_BACKEND).
 
     Returns:
         The remaining loan balance after num_payments_to_simulate months.
     """
-    current_balance = initial_principal
-    # If the loan starts at 0 or less, it's already paid off.
-    if current_balance <= 0:
-        return 0
-
-    for month_index in range(num_payments_to_simulate):
-        # If balance is non-positive, loan is paid off, stop simulation.
-        if current_balance <= 0:
-            break
-
-        # Calculate interest for the current month based on the balance at the start of the month.
-        interest_for_month = current_balance * monthly_rate
-
-        # Determine the payment amount for this month.
-        payment_made_this_month = 0
-        # Payments are only made if the current month is within the loan's payment term.
-        if month_index < loan_payment_term_months:
-            payment_made_this_month = fixed_monthly_payment
-
-        # Add accrued interest to the balance.
-        current_balance += interest_for_month
-
-        # Check if the payment covers the entire remaining balance (including interest).
-        if payment_made_this_month >= current_balance:
-            current_balance = 0 # Loan is paid off.
-        else:
-            # Subtract the payment from the balance.
-            current_balance -= payment_made_this_month
-
-        # Ensure the balance doesn't dip below zero due to floating-point inaccuracies.
-        if current_balance < 0:
-            current_balance = 0
-
-    return current_balance
+    remaining_debt = kernels.get_kernel("remaining_debt", backend)
+    return remaining_debt(initial_principal, monthly_rate, fixed_monthly_payment,
+                          num_payments_to_simulate, loan_payment_term_months)
 
 # Helper function to get a value that increments yearly at a specific year
 def get_yearly_incrementing_value(initial_val, rate, target_year):
@@ -75,6 +54,84 @@ def get_yearly_incrementing_value(initial_val, rate, target_year):
     return initial_val * (1 + rate) ** target_year
 
 
+def _geometric_sum(log_ratio, count):
+    """
+    Sum of ratio**j for j in range(count), given log(ratio).
+
+    Written with expm1 so that ratios very close to 1 stay accurate, and
+    falling back to `count` when the ratio is exactly 1. Works on arrays.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(log_ratio == 0, count, np.expm1(count * log_ratio) / np.expm1(log_ratio))
+
+
+@profiled()
+def closed_form_renter_investment(
+    num_months_to_simulate,
+    down_payment,
+    monthly_payment,
+    loan_payment_term_months,
+    monthly_stock_interest,
+    initial_rent,
+    home_price,
+    property_tax_rate,
+    home_upkeep_percent,
+    home_value_interest,
+    tenant_rent_initial,
+    ):
+    """
+    Closed-form equivalent of the renter's month-by-month investment loop in get_data_at_year.
+
+    The renter invests, every month, the homeowner's outlay minus rent. That amount
+    is the sum of three parts, each with a geometric-series solution:
+      - the down payment, invested once in month 0,
+      - the mortgage payment, invested during the first min(N, ceil(term)) months,
+      - property tax + upkeep - tenant rent - rent, which is constant within a year
+        and grows by (1 + home_value_interest) every year.
+    num_months_to_simulate must be a whole number of years. All arguments may be NumPy arrays.
+
+    Returns:
+        The renter's investment balance after num_months_to_simulate months.
+    """
+    num_years = num_months_to_simulate // 12
+    log_stock_growth = np.log1p(monthly_stock_interest)
+
+    # Down payment: invested in month 0 and compounded for the remaining N - 1 months.
+    down_payment_value = np.where(
+        num_months_to_simulate > 0,
+        down_payment * np.exp((num_months_to_simulate - 1) * log_stock_growth),
+        0)
+
+    # Mortgage payments: made in months 0 .. K-1 with K = min(N, term), where a
+    # fractional term pays in every month it has begun.
+    months_with_payments = np.minimum(num_months_to_simulate, np.maximum(payment_months(loan_payment_term_months), 0))
+    mortgage_value = (
+        monthly_payment
+        * np.exp((num_months_to_simulate - months_with_payments) * log_stock_growth)
+        * _geometric_sum(log_stock_growth, months_with_payments)
+    )
+
+    # Costs that step once a year: a * q^y in every month of year y.
+    first_year_monthly_amount = (
+        home_price * property_tax_rate / 12
+        + home_price * home_upkeep_percent / 12
+        - tenant_rent_initial
+        - initial_rent
+    )
+    # Each year's 12 contributions are worth a * q^y * S12 at the end of that year, and
+    # then compound for the remaining years at G = g^12.
+    log_yearly_stock_growth = 12 * log_stock_growth
+    yearly_value = (
+        first_year_monthly_amount
+        * _geometric_sum(log_stock_growth, 12)
+        * np.exp((num_years - 1) * log_yearly_stock_growth)
+        * _geometric_sum(np.log1p(home_value_interest) - log_yearly_stock_growth, num_years)
+    )
+
+    return down_payment_value + mortgage_value + yearly_value
+
+
+@profiled()
 def get_data_at_year(
     target_year, # The specific year (integer, 0-indexed) to calculate values for
     initial_rent=1500,
@@ -86,7 +143,9 @@ def get_data_at_year(
     stock_interest=0.11,
     home_value_interest=0.054,
     home_upkeep_percent=0.01,
-    tenant_rent_initial=0 # Renamed from tenant_rent for clarity
+    tenant_rent_initial=0, # Renamed from tenant_rent for clarity
+    solver="closed_form",
+    backend=None
     ):
     """
     Calculates key financial metrics for renting vs. buying at a specific target year,
@@ -105,6 +164,14 @@ def get_data_at_year(
         home_value_interest: Expected annual appreciation rate of the home value.
         home_upkeep_percent: Annual home upkeep cost as a percentage of home value.
         tenant_rent_initial: Initial monthly rent received from tenants (if any).
+        solver: "closed_form" computes the renter's investments with geometric-series
+                formulas in O(1) and needs a whole target_year; "loop" simulates
+                them month by month.
+        backend: Backend of the kernels (see kernels.py) computing the remaining debt
+                 and, with solver="loop", running the month loop. By default the
+                 debt uses kernels.DEFAULT_BACKEND and the loop kernels.LOOP_BACKEND
+                 (numba if installed, otherwise plain Python). The "numpy" backend
+                 always uses the closed forms.
 
     Returns:
         A dictionary containing the calculated financial metrics for the state *after*
@@ -112,10 +179,15 @@ def get_data_at_year(
         Returns None if target_year is negative.
     """
 
+    if solver not in ("closed_form", "loop"):
+        raise ValueError(f"Unknown solver '{solver}', expected 'closed_form' or 'loop'.")
+
     if target_year < 0:
         # Or raise ValueError("target_year must be non-negative.")
         print("Error: target_year must be non-negative.")
         return None
+    if solver == "closed_form" and target_year != np.floor(target_year):
+        raise ValueError("solver='closed_form' needs whole target years.")
 
     # --- Basic Calculations ---
     # Calculate values at the end of target_year, which means simulating target_year * 12 months.
@@ -156,7 +228,8 @@ def get_data_at_year(
         monthly_loan_interest_rate,
         monthly_payment,
         num_months_to_simulate, # Calculate debt after this many months
-        loan_payment_term_months
+        loan_payment_term_months,
+        backend=backend,
     )
 
     # Net worth is the appreciated home value minus the remaining debt.
@@ -164,48 +237,37 @@ def get_data_at_year(
 
     # --- Calculate Point-in-Time Renter Values at end of target_year ---
 
-    # Simulate month-by-month investment growth for the renter scenario up to the target month.
-    # This is necessary because the amount invested changes yearly.
-    cumulative_investment_renting = 0
-
-    # Loop through each month from the start up to the end of the target year.
-    for month_index in range(num_months_to_simulate):
-        # Determine the current year (0-indexed) based on the month index.
-        current_year = month_index // 12
-
-        # Get values that change annually, based on the current year of the simulation.
-        current_rent_value = get_yearly_incrementing_value(initial_rent, home_value_interest, current_year)
-        current_home_value_for_costs = get_yearly_incrementing_value(home_price, home_value_interest, current_year)
-        current_tenant_rent = get_yearly_incrementing_value(tenant_rent_initial, home_value_interest, current_year)
-
-        # Calculate homeowner's costs for *this specific month* to find the comparison point.
-        prop_tax_monthly = current_home_value_for_costs * property_tax_rate / 12
-        upkeep_monthly = current_home_value_for_costs * home_upkeep_percent / 12
-        # Determine if a mortgage payment is made in this month.
-        mortgage_payment_this_month = monthly_payment if month_index < loan_payment_term_months else 0
-
-        # Total cash outflow for the homeowner this month (excluding down payment initially).
-        paid_towards_home_this_month = (
-            mortgage_payment_this_month
-            + prop_tax_monthly
-            + upkeep_monthly
-            - current_tenant_rent # Subtract tenant rent income
+    if solver == "closed_form":
+        cumulative_investment_renting = float(closed_form_renter_investment(
+            num_months_to_simulate,
+            down_payment,
+            monthly_payment,
+            loan_payment_term_months,
+            monthly_stock_interest,
+            initial_rent,
+            home_price,
+            property_tax_rate,
+            home_upkeep_percent,
+            home_value_interest,
+            tenant_rent_initial,
+        ))
+    else:
+        # Simulate month-by-month investment growth for the renter scenario up to the target month.
+        # This is necessary because the amount invested changes yearly.
+        renter_investment = kernels.get_kernel("renter_investment", backend or kernels.LOOP_BACKEND)
+        cumulative_investment_renting = renter_investment(
+            num_months_to_simulate,
+            down_payment,
+            monthly_payment,
+            loan_payment_term_months,
+            monthly_stock_interest,
+            initial_rent,
+            home_price,
+            property_tax_rate,
+            home_upkeep_percent,
+            home_value_interest,
+            tenant_rent_initial,
         )
-        # Add the one-time down payment cost in the very first month (month 0).
-        if month_index == 0:
-            paid_towards_home_this_month += down_payment
-
-        # Renter's cost this month is simply the rent.
-        rent_this_month = current_rent_value
-
-        # Calculate the difference in cash flow: money the renter *didn't* spend compared to the homeowner.
-        # This is the amount assumed to be invested by the renter each month.
-        excess_available = paid_towards_home_this_month - rent_this_month
-
-        # Update the renter's cumulative investment:
-        # 1. Grow the existing investment by one month's stock interest.
-        # 2. Add the excess cash available from this month.
-        cumulative_investment_renting = cumulative_investment_renting * (1 + monthly_stock_interest) + excess_available
 
     # The final value after the loop is the renter's total investment value at the end of the target year.
     net_worth_renting_at_target = cumulative_investment_renting
@@ -247,6 +309,338 @@ def get_data_at_year(
 
     return results
 
+
+def _check_float_dtype(dtype):
+    if np.dtype(dtype).kind != "f":
+        raise ValueError(f"dtype must be a floating point type such as np.float32, got {np.dtype(dtype)}.")
+
+
+def _is_reduced_precision(dtype):
+    return np.dtype(dtype).itemsize < 8
+
+
+def _yearly_growth(rate, years):
+    """
+    (1 + rate) ** years for arrays, as exp(years * log1p(rate)), which does not round
+    the rate to the precision of 1 + rate (that costs float32 about 1e-6 over 45 years).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(years == 0, 1, np.exp(years * np.log1p(rate)))
+
+
+def _batch_loan_terms(home_price, down_payment_perc, loan_term_years, loan_interest, stock_interest):
+    """
+    Monthly rates, loan principal, down payment, term and fixed payment for array inputs,
+    with the same guards as get_data_at_year.
+    """
+    yearly_payments = 12
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Same guards as the scalar version for rates at or below -100%.
+        # (1 + r)**(1/12) - 1, written with log1p/expm1 so nothing cancels (in float32 the
+        # plain form loses about six digits of the monthly rate).
+        monthly_loan_interest_rate = np.where(loan_interest > -1, np.expm1(np.log1p(loan_interest) / 12), 0)
+        monthly_stock_interest = np.where(stock_interest > -1, np.expm1(np.log1p(stock_interest) / 12), 0)
+
+        loan_principal = home_price * (1 - down_payment_perc)
+        down_payment = home_price - loan_principal
+        loan_payment_term_months = loan_term_years * yearly_payments
+
+        # Fixed monthly mortgage payment (P&I), including the 0% interest case.
+        rate = monthly_loan_interest_rate
+        n = loan_payment_term_months
+        growth_minus_one = np.expm1(n * np.log1p(rate))
+        amortized_payment = loan_principal * (rate * (growth_minus_one + 1)) / growth_minus_one
+        monthly_payment = np.where(
+            (loan_principal > 0) & (loan_payment_term_months > 0),
+            np.where(rate > 1e-9, amortized_payment, loan_principal / loan_payment_term_months),
+            0)
+
+    return (monthly_loan_interest_rate, monthly_stock_interest, loan_principal, down_payment,
+            loan_payment_term_months, monthly_payment)
+
+
+def _renter_investment_by_month(
+    num_months,
+    down_payment,
+    monthly_payment,
+    loan_payment_term_months,
+    monthly_stock_interest,
+    initial_rent,
+    home_price,
+    property_tax_rate,
+    home_upkeep_percent,
+    home_value_interest,
+    tenant_rent_initial,
+    compensated=False,
+    ):
+    """
+    The renter's month-by-month investment loop of get_data_at_year, on arrays.
+
+    Yields the investment balance after each of the first num_months months.
+
+    With compensated=True (for reduced-precision inputs) each month's growth is
+    added as balance * rate rather than multiplied in as balance * (1 + rate),
+    which would round the rate to the precision of 1 + rate, and the additions use
+    Kahan summation. The rounding error then stays near one unit in the last place
+    over hundreds of months instead of growing with every month.
+    """
+    cumulative_investment_renting = 0
+    compensation = 0
+    for month_index in range(num_months):
+        current_year = month_index // 12
+        if month_index % 12 == 0:
+            # Rent, home value and tenant rent only change once a year.
+            yearly_growth = _yearly_growth(home_value_interest, current_year)
+            current_rent_value = initial_rent * yearly_growth
+            current_home_value_for_costs = home_price * yearly_growth
+            current_tenant_rent = tenant_rent_initial * yearly_growth
+            prop_tax_monthly = current_home_value_for_costs * property_tax_rate / 12
+            upkeep_monthly = current_home_value_for_costs * home_upkeep_percent / 12
+
+        mortgage_payment_this_month = np.where(month_index < loan_payment_term_months, monthly_payment, 0)
+
+        # Renter: invest whatever the homeowner spends beyond rent.
+        paid_towards_home_this_month = (
+            mortgage_payment_this_month
+            + prop_tax_monthly
+            + upkeep_monthly
+            - current_tenant_rent
+        )
+        if month_index == 0:
+            paid_towards_home_this_month = paid_towards_home_this_month + down_payment
+        excess_available = paid_towards_home_this_month - current_rent_value
+        if compensated:
+            increment = cumulative_investment_renting * monthly_stock_interest + excess_available - compensation
+            total = cumulative_investment_renting + increment
+            compensation = (total - cumulative_investment_renting) - increment
+            cumulative_investment_renting = total
+        else:
+            cumulative_investment_renting = cumulative_investment_renting * (1 + monthly_stock_interest) + excess_available
+        yield cumulative_investment_renting
+
+
+def _batch_results(
+    target_year,
+    num_months_to_simulate,
+    remaining_debt,
+    cumulative_investment_renting,
+    monthly_payment,
+    loan_payment_term_months,
+    initial_rent,
+    home_price,
+    property_tax_rate,
+    home_value_interest,
+    home_upkeep_percent,
+    tenant_rent_initial,
+    ):
+    """
+    The get_data_at_year result dictionary from the simulated debt and investments (arrays).
+    """
+    # --- Final Calculations (Taxes, Fees) ---
+    CAPITAL_GAINS_TAX_RATE = 0.15
+    REALTOR_COST = 0.06
+
+    # target_year is an array here, so apply the yearly growth directly.
+    yearly_growth_at_target = _yearly_growth(home_value_interest, target_year)
+    home_value_at_target = home_price * yearly_growth_at_target
+    net_worth_with_home_at_target = home_value_at_target - remaining_debt
+    net_worth_renting_at_target = cumulative_investment_renting
+    effective_net_worth_renting = net_worth_renting_at_target - net_worth_renting_at_target * CAPITAL_GAINS_TAX_RATE
+    effective_net_worth_with_home = net_worth_with_home_at_target - home_value_at_target * REALTOR_COST
+
+    return {
+        "target_year": target_year,
+        "months_simulated": num_months_to_simulate,
+        "home_value": home_value_at_target,
+        "remaining_debt": remaining_debt,
+        "home_equity": home_value_at_target - remaining_debt,
+        "net_worth_with_home": net_worth_with_home_at_target,
+        "net_worth_renting": net_worth_renting_at_target,
+        "effective_net_worth_with_home": effective_net_worth_with_home,
+        "effective_net_worth_renting": effective_net_worth_renting,
+        "monthly_mortgage_payment_during_year": np.where(num_months_to_simulate < loan_payment_term_months, monthly_payment, 0),
+        "monthly_property_tax_during_year": home_value_at_target * property_tax_rate / 12,
+        "monthly_home_upkeep_during_year": home_value_at_target * home_upkeep_percent / 12,
+        "monthly_rent_during_year": initial_rent * yearly_growth_at_target,
+        "monthly_tenant_rent_during_year": tenant_rent_initial * yearly_growth_at_target
+    }
+
+
+@profiled()
+def get_data_at_year_batch(
+    target_year,
+    initial_rent=1500,
+    home_price=800000,
+    down_payment_perc=0.20,
+    loan_term_years=30,
+    loan_interest=0.065,
+    property_tax_rate=0.0105,
+    stock_interest=0.11,
+    home_value_interest=0.054,
+    home_upkeep_percent=0.01,
+    tenant_rent_initial=0,
+    solver="closed_form",
+    dtype=float
+    ):
+    """
+    Vectorized version of get_data_at_year for many scenarios at once.
+
+    Every argument may be a scalar or a NumPy array, and all arguments are broadcast
+    against each other. As in get_data_at_year, the default solver="closed_form"
+    takes the renter's investments from closed_form_renter_investment, so the cost
+    does not depend on the horizon; target_year must then be a whole number of years.
+
+    With solver="loop" every scenario is advanced one month at a time in lockstep,
+    so a whole parameter grid costs one pass over the longest horizon instead of one
+    Python loop per grid cell. Each scenario's investment balance is taken once its
+    own horizon is reached.
+
+    Args:
+        Same as get_data_at_year, but each may be an array (except solver).
+        Complex arrays are kept complex (see sensitivity.py); everything else is
+        converted to dtype.
+        dtype: Floating point type of the computation and results. np.float32
+               halves memory and bandwidth for very large batches at about 1e-6
+               relative error; the month loop then uses compensated summation
+               (see _renter_investment_by_month).
+
+    Returns:
+        A dictionary with the same keys as get_data_at_year, where every value is
+        an array with the broadcast shape of the inputs.
+    """
+    _check_float_dtype(dtype)
+    (target_year, initial_rent, home_price, down_payment_perc, loan_term_years,
+     loan_interest, property_tax_rate, stock_interest, home_value_interest,
+     home_upkeep_percent, tenant_rent_initial) = np.broadcast_arrays(*[
+        np.asarray(value, dtype=complex if np.iscomplexobj(value) else dtype) for value in (
+            target_year, initial_rent, home_price, down_payment_perc, loan_term_years,
+            loan_interest, property_tax_rate, stock_interest, home_value_interest,
+            home_upkeep_percent, tenant_rent_initial)
+    ])
+
+    if solver not in ("closed_form", "loop"):
+        raise ValueError(f"Unknown solver '{solver}', expected 'closed_form' or 'loop'.")
+    if np.any(target_year < 0):
+        raise ValueError("target_year must be non-negative.")
+    if solver == "closed_form" and np.any(target_year != np.floor(target_year)):
+        raise ValueError("solver='closed_form' needs whole target years.")
+
+    num_months_to_simulate = np.rint(target_year * 12).astype(int)
+    # Month counts in the working precision, so integers do not promote float32 to float64.
+    months = num_months_to_simulate.astype(dtype)
+    (monthly_loan_interest_rate, monthly_stock_interest, loan_principal, down_payment,
+     loan_payment_term_months, monthly_payment) = _batch_loan_terms(
+        home_price, down_payment_perc, loan_term_years, loan_interest, stock_interest)
+
+    # The debt has a closed form; with the loop solver only the renter's investments
+    # are stepped month by month.
+    remaining_debt = balance_after(loan_principal, monthly_loan_interest_rate, monthly_payment,
+                                   months, loan_payment_term_months)
+
+    if solver == "closed_form":
+        cumulative_investment_renting = closed_form_renter_investment(
+            months, down_payment, monthly_payment, loan_payment_term_months,
+            monthly_stock_interest, initial_rent, home_price, property_tax_rate, home_upkeep_percent,
+            home_value_interest, tenant_rent_initial)
+    else:
+        cumulative_investment_renting = np.zeros(remaining_debt.shape, dtype=remaining_debt.dtype)
+        balances = _renter_investment_by_month(
+            int(num_months_to_simulate.max(initial=0)), down_payment, monthly_payment, loan_payment_term_months,
+            monthly_stock_interest, initial_rent, home_price, property_tax_rate, home_upkeep_percent,
+            home_value_interest, tenant_rent_initial, compensated=_is_reduced_precision(dtype))
+        for months_done, balance in enumerate(balances, start=1):
+            cumulative_investment_renting = np.where(
+                num_months_to_simulate == months_done, balance, cumulative_investment_renting)
+
+    return _batch_results(
+        target_year, num_months_to_simulate, remaining_debt, cumulative_investment_renting,
+        monthly_payment, loan_payment_term_months, initial_rent, home_price, property_tax_rate,
+        home_value_interest, home_upkeep_percent, tenant_rent_initial)
+
+
+@profiled()
+def get_data_over_years_batch(
+    target_years,
+    initial_rent=1500,
+    home_price=800000,
+    down_payment_perc=0.20,
+    loan_term_years=30,
+    loan_interest=0.065,
+    property_tax_rate=0.0105,
+    stock_interest=0.11,
+    home_value_interest=0.054,
+    home_upkeep_percent=0.01,
+    tenant_rent_initial=0,
+    dtype=float
+    ):
+    """
+    get_data_at_year_batch for every year in target_years, from a single simulation.
+
+    The state at a shorter horizon is a prefix of the state at a longer one, so each
+    scenario is simulated once up to max(target_years) and the values at every
+    requested year are read off along the way: O(max year) work per scenario instead
+    of O(sum of years).
+
+    Args:
+        target_years: A 1-D array of years (non-negative).
+        Other arguments: Same as get_data_at_year; each may be an array, and they are
+        broadcast against each other to the scenario shape S.
+        dtype: See get_data_at_year_batch.
+
+    Returns:
+        A dictionary with the same keys as get_data_at_year, where every value has
+        shape S + (len(target_years),).
+    """
+    _check_float_dtype(dtype)
+    target_years = np.asarray(target_years, dtype=dtype)
+    if target_years.ndim != 1:
+        raise ValueError("target_years must be a 1-D array.")
+    if np.any(target_years < 0):
+        raise ValueError("target_year must be non-negative.")
+
+    (initial_rent, home_price, down_payment_perc, loan_term_years, loan_interest,
+     property_tax_rate, stock_interest, home_value_interest, home_upkeep_percent,
+     tenant_rent_initial) = np.broadcast_arrays(*[
+        np.asarray(value, dtype=dtype) for value in (
+            initial_rent, home_price, down_payment_perc, loan_term_years, loan_interest,
+            property_tax_rate, stock_interest, home_value_interest, home_upkeep_percent,
+            tenant_rent_initial)
+    ])
+
+    num_months_to_simulate = np.rint(target_years * 12).astype(int)
+    (monthly_loan_interest_rate, monthly_stock_interest, loan_principal, down_payment,
+     loan_payment_term_months, monthly_payment) = _batch_loan_terms(
+        home_price, down_payment_perc, loan_term_years, loan_interest, stock_interest)
+
+    # Simulate to the longest horizon and record the balance whenever a requested horizon ends.
+    cumulative_investment_renting = np.zeros(home_price.shape + target_years.shape, dtype=dtype)
+    balances = _renter_investment_by_month(
+        int(num_months_to_simulate.max(initial=0)), down_payment, monthly_payment, loan_payment_term_months,
+        monthly_stock_interest, initial_rent, home_price, property_tax_rate, home_upkeep_percent,
+        home_value_interest, tenant_rent_initial, compensated=_is_reduced_precision(dtype))
+    for months_done, balance in enumerate(balances, start=1):
+        recorded = num_months_to_simulate == months_done
+        if recorded.any():
+            cumulative_investment_renting[..., recorded] = np.asarray(balance)[..., None]
+
+    # Scenario parameters get a trailing axis so they broadcast against the years.
+    (initial_rent, home_price, property_tax_rate, home_value_interest, home_upkeep_percent,
+     tenant_rent_initial, loan_principal, monthly_loan_interest_rate, monthly_payment,
+     loan_payment_term_months) = (value[..., None] for value in (
+        initial_rent, home_price, property_tax_rate, home_value_interest, home_upkeep_percent,
+        tenant_rent_initial, loan_principal, monthly_loan_interest_rate, monthly_payment,
+        loan_payment_term_months))
+    remaining_debt = balance_after(loan_principal, monthly_loan_interest_rate, monthly_payment,
+                                   num_months_to_simulate.astype(dtype), loan_payment_term_months)
+    target_years = np.broadcast_to(target_years, remaining_debt.shape)
+    num_months_to_simulate = np.broadcast_to(num_months_to_simulate, remaining_debt.shape)
+
+    return _batch_results(
+        target_years, num_months_to_simulate, remaining_debt, cumulative_investment_renting,
+        monthly_payment, loan_payment_term_months, initial_rent, home_price, property_tax_rate,
+        home_value_interest, home_upkeep_percent, tenant_rent_initial)
+
 # --- Example Usage ---
 # Calculate metrics for the end of year 10
 # year_10_data = get_data_at_year(target_year=10) # Use default parameters
@@ -293,9 +687,135 @@ def get_buying_diff(at_year,
              tenant_rent_initial=tenant_rent_initial)
     return result['effective_net_worth_with_home'] - result['effective_net_worth_renting']
 
-import numpy as np
 
-def grid_search_buying_diff(param_ranges=None, **kwargs):
+def get_buying_diff_batch(at_year,
+                          initial_rent,
+                          home_price,
+                          down_payment_perc,
+                          loan_term_years,
+                          loan_interest,
+                          property_tax_rate,
+                          stock_interest,
+                          home_value_interest,
+                          tenant_rent_initial,
+                          solver="closed_form",
+                          dtype=float,
+                          ):
+    """Same as get_buying_diff, but every argument may be an array (see get_data_at_year_batch)."""
+    result = get_data_at_year_batch(
+        target_year=at_year,
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+        tenant_rent_initial=tenant_rent_initial,
+        solver=solver,
+        dtype=dtype)
+    return result['effective_net_worth_with_home'] - result['effective_net_worth_renting']
+
+def get_buying_diff_over_years_batch(at_year,
+                                    initial_rent,
+                                    home_price,
+                                    down_payment_perc,
+                                    loan_term_years,
+                                    loan_interest,
+                                    property_tax_rate,
+                                    stock_interest,
+                                    home_value_interest,
+                                    tenant_rent_initial,
+                                    dtype=float,
+                                    ):
+    """
+    get_buying_diff_batch for a 1-D array of years at once (see get_data_over_years_batch).
+
+    The result has a trailing axis with one entry per value of at_year.
+    """
+    result = get_data_over_years_batch(
+        target_years=at_year,
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+        tenant_rent_initial=tenant_rent_initial,
+        dtype=dtype)
+    return result['effective_net_worth_with_home'] - result['effective_net_worth_renting']
+
+
+# Columns evaluate_scenarios accepts: the per-scenario parameters of get_data_at_year.
+SCENARIO_COLUMNS = (
+    "target_year",
+    "initial_rent",
+    "home_price",
+    "down_payment_perc",
+    "loan_term_years",
+    "loan_interest",
+    "property_tax_rate",
+    "stock_interest",
+    "home_value_interest",
+    "home_upkeep_percent",
+    "tenant_rent_initial",
+)
+
+
+@profiled()
+def evaluate_scenarios(table, solver="closed_form", **fixed):
+    """
+    Runs get_data_at_year for every row of a table of scenarios, vectorized across rows.
+
+    For tables of arbitrary scenarios (e.g. real listings with their own price, rent,
+    tax rate and quoted mortgage rate) rather than a rectangular grid. All rows are
+    evaluated at once by get_data_at_year_batch.
+
+    Args:
+      table: A pandas DataFrame or a dictionary of equal-length 1-D arrays, one row
+             per scenario. Columns must be names from SCENARIO_COLUMNS.
+      solver: See get_data_at_year_batch. "closed_form" (the default) is the fast
+              one and needs whole target years.
+      **fixed: Values for parameters that are not columns of table and are the same
+               for every row (e.g. target_year=30). Parameters given neither way
+               take get_data_at_year's defaults; target_year must be given.
+
+    Returns:
+      A DataFrame with one row per scenario (with table's index if it is a DataFrame)
+      and the keys of get_data_at_year's result as columns.
+    """
+    if isinstance(table, pd.DataFrame):
+        index = table.index
+        columns = {name: table[name].to_numpy() for name in table.columns}
+    else:
+        index = None
+        columns = {name: np.asarray(values) for name, values in table.items()}
+
+    unknown = [name for name in list(columns) + list(fixed) if name not in SCENARIO_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown scenario parameters {unknown}, expected names from SCENARIO_COLUMNS.")
+    both = [name for name in fixed if name in columns]
+    if both:
+        raise ValueError(f"Parameters {both} cannot be both columns of the table and fixed.")
+    if "target_year" not in columns and "target_year" not in fixed:
+        raise ValueError("target_year must be a column of the table or given as a keyword.")
+    lengths = {len(values) for values in columns.values() if np.ndim(values) == 1}
+    if len(lengths) > 1 or any(np.ndim(values) != 1 for values in columns.values()):
+        raise ValueError("Every column of table must be 1-D with one value per scenario.")
+    num_scenarios = lengths.pop() if lengths else 0
+
+    result = get_data_at_year_batch(solver=solver, **fixed, **columns)
+    return pd.DataFrame({key: np.broadcast_to(value, (num_scenarios,)) for key, value in result.items()},
+                        index=index)
+
+
+@profiled()
+def grid_search_buying_diff(param_ranges=None, engine="vectorized", executor="serial", max_workers=None, chunk_size=None,
+                            adaptive=False, coarse_step=8, gradient_threshold=None, out_dir=None, dtype=float,
+                            **kwargs):
     """
     Performs a grid search over specified parameters to find the buying diff 
     at a specific year.
@@ -312,18 +832,45 @@ def grid_search_buying_diff(param_ranges=None, **kwargs):
       home_value_interest: Home value appreciation interest rate.
       param_ranges: A dictionary where keys are parameter names and values 
                     are tuples (start, stop, step) for the range.
+      engine: "vectorized" evaluates the whole grid at once with
+              get_buying_diff_batch; "scalar" calls get_buying_diff per cell.
+              When at_year is swept, the vectorized engine simulates every
+              scenario once to the last year and reads the earlier years off
+              the same run (get_buying_diff_over_years_batch).
+      executor: "serial", "thread" or "process" (see sweep.run_grid).
+      max_workers: Number of pool workers (default: CPU count).
+      chunk_size: Number of grid cells per task.
+      adaptive: If True, evaluate a coarse grid and refine only the cells where the
+                buying diff changes sign (see sweep.run_adaptive_grid).
+      coarse_step: Grid steps between the initially evaluated values (adaptive only).
+      gradient_threshold: Also refine cells whose diff changes by more than this per
+                          grid step (adaptive only).
+      out_dir: If given, stream the results into a memory-mapped file in this
+               directory instead of building them in memory, resuming an
+               interrupted sweep with the same parameters (see
+               sweep.run_grid_to_file). 'results' is then a read-only memmap.
+      dtype: Floating point type of the results (and, with the vectorized engine, of
+             the computation). np.float32 halves memory and bandwidth for very large
+             grids at a drift of a few dollars; not supported with adaptive=True.
 
     Returns:
       A dictionary containing:
         - 'results': A NumPy array with the buying diff values.
         - 'param_values': A dictionary with parameter names as keys and lists of 
                           parameter values used in the grid search as values.
+        - 'precision': Only for a reduced-precision dtype: the drift of the results
+                       from float64 on a sample of cells (see sweep.sample_drift).
+      With adaptive=True, a sweep.AdaptiveGrid instead; its to_dense() returns
+      that dictionary.
     """
 
 
     if param_ranges is None:
         param_ranges = {}
 
+    if engine not in ("vectorized", "scalar"):
+        raise ValueError(f"Unknown engine '{engine}', expected 'vectorized' or 'scalar'.")
+
     # Validation
     valid_params = [
         "at_year",
@@ -346,24 +893,132 @@ def grid_search_buying_diff(param_ranges=None, **kwargs):
         if param not in param_ranges and param not in kwargs:
             raise ValueError(f"Parameter '{param}' must be specified.")
 
-    param_values = {}
-    for param_name, (start, stop, step) in param_ranges.items():
-        param_values[param_name] = np.arange(start, stop, step)
+    param_values = expand_param_ranges(param_ranges)
 
-    # Determine the shape of the results array
-    shape = tuple(len(values) for values in param_values.values())
-    results = np.zeros(shape)
+    _check_float_dtype(dtype)
+    reduced_precision = _is_reduced_precision(dtype)
+    if reduced_precision and adaptive:
+        raise ValueError("A reduced-precision dtype is not supported with adaptive=True.")
+    # The batch functions compute in dtype; the scalar engine only stores in it.
+    func_kwargs = dict(kwargs, dtype=dtype) if reduced_precision and engine == "vectorized" else kwargs
 
-    # Generate all combinations of parameter values
-    param_combinations = np.array(np.meshgrid(*param_values.values())).T.reshape(-1, len(param_ranges))
+    def with_precision(grid):
+        if reduced_precision:
+            grid["precision"] = sample_drift(get_buying_diff_batch, param_values, kwargs, grid["results"])
+        return grid
 
-    for i, combination in enumerate(param_combinations):
-        kwargs.update({param_name: value for param_name, value in zip(param_ranges.keys(), combination)})
-        index = tuple(np.searchsorted(param_values[param_name], value)
-                      for param_name, value in zip(param_ranges.keys(), combination))
-        # positive values for buying
-        results[index] = get_buying_diff(**kwargs)
+    if adaptive:
+        return run_adaptive_grid(
+            get_buying_diff_batch if engine == "vectorized" else get_buying_diff,
+            param_values,
+            kwargs,
+            coarse_step=coarse_step,
+            gradient_threshold=gradient_threshold,
+            executor=executor,
+            max_workers=max_workers,
+            chunk_size=chunk_size,
+            vectorized=engine == "vectorized",
+        )
 
-    return {"results": results, "param_values": param_values}
+    if out_dir is not None:
+        results = run_grid_to_file(
+            get_buying_diff_batch if engine == "vectorized" else get_buying_diff,
+            param_values,
+            func_kwargs,
+            out_dir,
+            executor=executor,
+            max_workers=max_workers,
+            chunk_size=chunk_size or 65536,
+            vectorized=engine == "vectorized",
+            dtype=dtype,
+        )
+        return with_precision({"results": results, "param_values": param_values})
 
+    if engine == "vectorized":
+        func = get_buying_diff_over_years_batch if "at_year" in param_values else get_buying_diff_batch
+    else:
+        # The closed-form solver costs the same for any year, so there is no prefix to reuse.
+        func = get_buying_diff
 
+    # positive values for buying
+    results = run_grid(
+        func,
+        param_values,
+        func_kwargs,
+        executor=executor,
+        max_workers=max_workers,
+        chunk_size=chunk_size,
+        vectorized=engine == "vectorized",
+        time_axis="at_year" if engine == "vectorized" else None,
+        dtype=dtype,
+    )
+
+    return with_precision({"results": results, "param_values": param_values})
+
+
+if __name__ == "__main__":
+    # Check the closed-form solver against the month-by-month loop on random scenarios.
+    rng = np.random.default_rng(0)
+    worst_relative_error = 0
+    for _ in range(500):
+        scenario = dict(
+            target_year=int(rng.integers(0, 46)),
+            initial_rent=rng.uniform(500, 5000),
+            home_price=rng.uniform(1e5, 2e6),
+            down_payment_perc=rng.choice([0, rng.uniform(0, 1), 1]),
+            loan_term_years=rng.choice([int(rng.integers(0, 41)), rng.uniform(0, 40)]),
+            loan_interest=rng.choice([0, rng.uniform(-0.02, 0.15)]),
+            property_tax_rate=rng.uniform(0, 0.03),
+            stock_interest=rng.choice([0, rng.uniform(-0.05, 0.15)]),
+            home_value_interest=rng.choice([0, rng.uniform(-0.05, 0.1)]),
+            home_upkeep_percent=rng.uniform(0, 0.03),
+            tenant_rent_initial=rng.uniform(0, 3000),
+        )
+        loop_result = get_data_at_year(**scenario, solver="loop")
+        closed_form_result = get_data_at_year(**scenario, solver="closed_form")
+        for key, value in loop_result.items():
+            relative_error = abs(closed_form_result[key] - value) / max(abs(value), 1)
+            worst_relative_error = max(worst_relative_error, relative_error)
+            assert relative_error < 1e-6, (key, scenario, value, closed_form_result[key])
+    print(f"closed_form matches loop on 500 random scenarios (worst relative error {worst_relative_error:.2e})")
+
+    # Like get_data_at_year_batch, the closed form refuses years it cannot represent.
+    for get_data in (get_data_at_year, get_data_at_year_batch):
+        try:
+            get_data(10.5, solver="closed_form")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"{get_data.__name__} accepted a fractional target_year with solver='closed_form'")
+    print("solver='closed_form' rejects fractional target years")
+
+    # evaluate_scenarios gives the same numbers as get_data_at_year, row by row.
+    listings = pd.DataFrame({
+        "home_price": rng.uniform(2e5, 1.5e6, 1000),
+        "initial_rent": rng.uniform(1000, 5000, 1000),
+        "property_tax_rate": rng.uniform(0.005, 0.025, 1000),
+        "loan_interest": rng.uniform(0.04, 0.08, 1000),
+    })
+    table = evaluate_scenarios(listings, target_year=10)
+    for row in range(0, 1000, 100):
+        expected = get_data_at_year(10, **listings.iloc[row].to_dict())
+        assert np.allclose(table.iloc[row].to_numpy(dtype=float), list(expected.values()), rtol=1e-9), row
+    print("evaluate_scenarios matches get_data_at_year row by row")
+
+    # get_buying_diff_batch gives the same diffs with either solver.
+    grid = dict(
+        at_year=np.arange(0, 46)[:, None],
+        initial_rent=rng.uniform(500, 5000, 200),
+        home_price=rng.uniform(1e5, 2e6, 200),
+        down_payment_perc=0.2,
+        loan_term_years=30,
+        loan_interest=rng.uniform(0.02, 0.1, 200),
+        property_tax_rate=0.0105,
+        stock_interest=rng.uniform(0.02, 0.12, 200),
+        home_value_interest=0.054,
+        tenant_rent_initial=0,
+    )
+    loop_diff = get_buying_diff_batch(**grid, solver="loop")
+    closed_form_diff = get_buying_diff_batch(**grid, solver="closed_form")
+    assert np.allclose(closed_form_diff, loop_diff, rtol=1e-9, atol=1e-3)
+    print("get_buying_diff_batch gives the same diffs with solver='loop' and solver='closed_form'")
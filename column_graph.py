@@ -0,0 +1,203 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+
+from profiling import stage
+
+
+class ColumnGraph:
+    """
+    A set of named values computed from model parameters and from each other.
+
+    Every node is a function whose argument names are the names of its inputs,
+    either other nodes or model parameters, e.g.
+
+        graph = ColumnGraph()
+
+        @graph.node
+        def property_tax_monthly(home_value, property_tax_rate):
+            return home_value * property_tax_rate / 12
+
+    Evaluating a set of target nodes computes only those targets and what they
+    depend on; IncrementalEvaluation also keeps them for later evaluations with
+    some parameters changed. A leading underscore in the function name is dropped from the node
+    name, so node functions can stay private to their module.
+    """
+
+    def __init__(self):
+        self.functions = {}
+        self.inputs = {}
+        # tuple(targets) -> evaluation order, cleared whenever a node is added.
+        self._orders = {}
+
+    def node(self, func=None, *, name=None):
+        """
+        Registers func as a node (usable as a decorator, with or without name=).
+        """
+        def register(func):
+            node_name = name or func.__name__.lstrip('_')
+            self.functions[node_name] = func
+            self.inputs[node_name] = tuple(inspect.signature(func).parameters)
+            self._orders.clear()
+            return func
+
+        if func is None:
+            return register
+        return register(func)
+
+    def copy(self):
+        """
+        A new graph with the same nodes, e.g. to override some of them in a variant model.
+        """
+        graph = ColumnGraph()
+        graph.functions = dict(self.functions)
+        graph.inputs = dict(self.inputs)
+        return graph
+
+    def evaluation_order(self, targets):
+        """
+        The nodes needed for targets, each listed after all nodes it depends on.
+        Names that are not nodes (model parameters) are left out.
+        """
+        key = tuple(targets)
+        if key not in self._orders:
+            self._orders[key] = tuple(self._evaluation_order(key))
+        return self._orders[key]
+
+    def _evaluation_order(self, targets):
+        order = []
+        visiting = set()
+        visited = set()
+
+        def visit(node_name):
+            if node_name in visited or node_name not in self.functions:
+                return
+            if node_name in visiting:
+                raise ValueError(f"Column graph has a cycle through '{node_name}'.")
+            visiting.add(node_name)
+            for input_name in self.inputs[node_name]:
+                visit(input_name)
+            visiting.discard(node_name)
+            visited.add(node_name)
+            order.append(node_name)
+
+        for target in targets:
+            if target not in self.functions:
+                raise ValueError(f"Unknown column '{target}'.")
+            visit(target)
+        return order
+
+    def dependents(self, names):
+        """
+        Every node that depends on any of names (parameters or nodes), directly or
+        through other nodes. The names themselves are not included.
+        """
+        names = set(names)
+        dirty = set()
+        for node_name in self.evaluation_order(list(self.functions)):
+            if any(input_name in names or input_name in dirty for input_name in self.inputs[node_name]):
+                dirty.add(node_name)
+        return dirty
+
+    def evaluate(self, params, targets):
+        """
+        Computes targets (and only what they need) from the model parameters.
+
+        Args:
+          params: A dictionary of model parameter values.
+          targets: Names of the nodes to compute.
+
+        Returns:
+          A dictionary with the value of every node that was computed, plus params.
+        """
+        values = dict(params)
+        self.compute_missing(values, targets)
+        return values
+
+    def compute_missing(self, values, targets):
+        """
+        Adds targets and what they need to values, computing only the nodes that
+        values does not hold yet.
+
+        Returns:
+          The names of the nodes that were computed, in evaluation order.
+        """
+        computed = []
+        for node_name in self.evaluation_order(targets):
+            if node_name in values:
+                continue
+            func = self.functions[node_name]
+            with stage(node_name):
+                values[node_name] = func(*(values[input_name] for input_name in self.inputs[node_name]))
+            computed.append(node_name)
+        return computed
+
+
+def _same_value(old, new):
+    """True if a parameter did not change (NumPy arrays are compared by value)."""
+    if old is new:
+        return True
+    try:
+        return bool(np.array_equal(old, new))
+    except TypeError:
+        return False
+
+
+class IncrementalEvaluation:
+    """
+    Repeated evaluation of a ColumnGraph while its parameters change.
+
+    Every computed node is kept. update() drops only the nodes downstream of the
+    parameters that actually changed, and evaluate() recomputes only the nodes it
+    needs that are missing, reusing everything upstream of the change.
+
+    Values are shared between evaluations, so arrays returned by evaluate() must
+    not be modified in place.
+    """
+
+    def __init__(self, graph, params):
+        self.graph = graph
+        self.param_names = frozenset(params)
+        self.values = dict(params)
+        # Nodes computed by the last call of evaluate().
+        self.last_computed = ()
+
+    def update(self, **changes):
+        """
+        Sets new values for some parameters.
+
+        Returns:
+          The names of the parameters whose value actually changed.
+        """
+        unknown = [name for name in changes if name not in self.param_names]
+        if unknown:
+            raise ValueError(f"Unknown parameters {unknown}, expected names from {sorted(self.param_names)}.")
+        changed = [name for name, value in changes.items() if not _same_value(self.values[name], value)]
+        for node_name in self.graph.dependents(changed):
+            self.values.pop(node_name, None)
+        self.values.update(changes)
+        return changed
+
+    def evaluate(self, targets):
+        """
+        Computes the targets that are not up to date (and what they need).
+
+        Returns:
+          The dictionary of every up-to-date node value, plus the parameters.
+        """
+        self.last_computed = tuple(self.graph.compute_missing(self.values, targets))
+        return self.values
+
+
+class ColumnArrays(dict):
+    """
+    Model output as a dictionary of column name -> NumPy array.
+
+    Cheaper than a DataFrame for callers that only read a few values; the
+    DataFrame is built on demand with to_dataframe().
+    """
+
+    def to_dataframe(self):
+        with stage("to_dataframe"):
+            return pd.DataFrame(dict(self))
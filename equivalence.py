@@ -0,0 +1,221 @@
+"""
+Differential checks of the optimized engines against the original models.
+
+    python equivalence.py --scenarios 200
+
+runs every engine and its frozen original (reference/) on the same randomized
+scenarios and reports the largest absolute and relative error of every output
+column. Exits with status 1 if an optimized engine drifts past --tolerance.
+"""
+import argparse
+import sys
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+import buy_v_rent
+import buy_v_rent_point_in_time as pit
+import kernels
+import renting
+import renting_gemini_fixed
+from reference import buy_v_rent as reference_buy_v_rent
+from reference import buy_v_rent_point_in_time as reference_pit
+from reference import renting as reference_renting
+from reference import renting_gemini_fixed as reference_renting_gemini_fixed
+
+# Relative errors are measured against max(|reference|, this many dollars), so that
+# values crossing zero do not produce huge relative errors from rounding noise.
+DOLLAR_FLOOR = 1.0
+DEFAULT_TOLERANCE = 1e-6
+
+# Parameter name -> function(rng) drawing one value. Ranges stay where the original
+# implementations are well defined (e.g. no 0% loan interest, which they divide by).
+PARAM_SAMPLERS = {
+    "total_years": lambda rng: int(rng.integers(1, 46)),
+    "initial_rent": lambda rng: rng.uniform(500, 6000),
+    "home_price": lambda rng: rng.uniform(1e5, 2e6),
+    "down_payment_perc": lambda rng: rng.choice([0.0, rng.uniform(0, 0.6), 1.0], p=[0.1, 0.8, 0.1]),
+    "loan_term_years": lambda rng: rng.choice([int(rng.choice([10, 15, 20, 30, 40])), rng.uniform(0.1, 40)],
+                                              p=[0.8, 0.2]),
+    "loan_interest": lambda rng: rng.uniform(0.01, 0.12),
+    "property_tax_rate": lambda rng: rng.uniform(0, 0.03),
+    "stock_interest": lambda rng: rng.choice([rng.uniform(-0.05, 0.15), 0.0], p=[0.9, 0.1]),
+    "home_value_interest": lambda rng: rng.choice([rng.uniform(-0.03, 0.1), 0.0], p=[0.9, 0.1]),
+    "home_upkeep_percent": lambda rng: rng.uniform(0, 0.03),
+    "tenant_rent": lambda rng: rng.choice([0.0, rng.uniform(0, 3000)]),
+}
+
+
+def _draw(rng, names):
+    # .item() turns the NumPy scalars rng.choice returns into plain numbers.
+    return {name: np.asarray(PARAM_SAMPLERS[name](rng)).item() for name in names}
+
+
+def _monthly(get_data, **renames):
+    """
+    Adapter: runs a monthly model on a drawn scenario and returns its DataFrame.
+    """
+    def run(scenario):
+        return get_data(**{renames.get(name, name): value for name, value in scenario.items()})
+    return run
+
+
+def _year_ends(run):
+    """
+    Adapter: keeps only the last month of every year (the rows of resolution="yearly").
+    """
+    def run_year_ends(scenario):
+        return run(scenario).iloc[11::12].reset_index(drop=True)
+    return run_year_ends
+
+
+def _point_in_time(get_data_at_year):
+    """
+    Adapter: runs a point-in-time model at scenario's total_years, as a one-row DataFrame.
+    """
+    def run(scenario):
+        scenario = dict(scenario)
+        target_year = scenario.pop("total_years")
+        tenant_rent = scenario.pop("tenant_rent", 0)
+        result = get_data_at_year(target_year, tenant_rent_initial=tenant_rent, **scenario)
+        return pd.DataFrame({key: [float(value)] for key, value in result.items()})
+    return run
+
+
+def _point_in_time_batch(solver):
+    """
+    Adapter: runs get_data_at_year_batch with the given solver on a single scenario.
+    """
+    def get_data_at_year(target_year, **params):
+        return pit.get_data_at_year_batch(target_year, solver=solver, **params)
+    return _point_in_time(get_data_at_year)
+
+
+def _buy_v_rent_at_year_end(scenario):
+    """buy_v_rent.get_data's last row (the end of total_years), renamed to the point-in-time keys."""
+    row = buy_v_rent.get_data(**scenario).iloc[[-1]]
+    return pd.DataFrame({
+        "home_value": row["home_value"].to_numpy(),
+        "remaining_debt": row["remaining_debt"].to_numpy(),
+        "net_worth_with_home": row["net_worth_with_home"].to_numpy(),
+        "net_worth_renting": row["net_worth_renting"].to_numpy(),
+        "effective_net_worth_with_home": row["effective_net_worth_with_home"].to_numpy(),
+        "effective_net_worth_renting": row["effective_net_worth_renting"].to_numpy(),
+    })
+
+
+_MONTHLY_PARAMS = ["total_years", "initial_rent", "home_price", "down_payment_perc", "loan_term_years",
+                   "loan_interest", "property_tax_rate", "stock_interest", "home_value_interest"]
+_BUY_V_RENT_PARAMS = _MONTHLY_PARAMS + ["home_upkeep_percent", "tenant_rent"]
+
+# name -> (reference, candidate, parameters drawn, strict). Each engine maps a scenario
+# dict to a DataFrame; columns present in both are compared. Strict comparisons are
+# optimized engines that must match their reference; the others compare different
+# models and are reported for information only.
+COMPARISONS = {
+    "buy_v_rent": (_monthly(reference_buy_v_rent.get_data), _monthly(buy_v_rent.get_data),
+                   _BUY_V_RENT_PARAMS, True),
+    "buy_v_rent_yearly": (_year_ends(_monthly(reference_buy_v_rent.get_data)),
+                          _monthly(partial(buy_v_rent.get_data, resolution="yearly")), _BUY_V_RENT_PARAMS, True),
+    "renting": (_monthly(reference_renting.get_data), _monthly(renting.get_data),
+                _MONTHLY_PARAMS, True),
+    "renting_gemini_fixed": (_monthly(reference_renting_gemini_fixed.get_data),
+                             _monthly(renting_gemini_fixed.get_data), _MONTHLY_PARAMS, True),
+    "point_in_time": (_point_in_time(reference_pit.get_data_at_year), _point_in_time(pit.get_data_at_year),
+                      _BUY_V_RENT_PARAMS, True),
+    "point_in_time_batch": (_point_in_time(reference_pit.get_data_at_year), _point_in_time_batch("loop"),
+                            _BUY_V_RENT_PARAMS, True),
+    "point_in_time_closed_form": (_point_in_time(reference_pit.get_data_at_year),
+                                  _point_in_time_batch("closed_form"), _BUY_V_RENT_PARAMS, True),
+    "point_in_time_vs_buy_v_rent": (_buy_v_rent_at_year_end, _point_in_time(pit.get_data_at_year),
+                                    _BUY_V_RENT_PARAMS, False),
+}
+# The month loop of every kernel backend (see kernels.py).
+for _backend in kernels.BACKENDS:
+    COMPARISONS[f"point_in_time_loop[{_backend}]"] = (
+        _point_in_time(reference_pit.get_data_at_year),
+        _point_in_time(partial(pit.get_data_at_year, solver="loop", backend=_backend)), _BUY_V_RENT_PARAMS, True)
+
+
+def column_errors(reference, candidate):
+    """
+    Max absolute and relative error of every column the two DataFrames share.
+
+    Returns:
+      {column: (max absolute error, max relative error)}. A column where exactly one
+      side is NaN counts as an infinite error.
+    """
+    errors = {}
+    for column in reference.columns:
+        if column not in candidate.columns:
+            continue
+        expected = reference[column].to_numpy(dtype=float)
+        actual = candidate[column].to_numpy(dtype=float)
+        if expected.shape != actual.shape:
+            errors[column] = (np.inf, np.inf)
+            continue
+        both_nan = np.isnan(expected) & np.isnan(actual)
+        absolute = np.where(both_nan, 0.0, np.abs(actual - expected))
+        absolute = np.where(np.isnan(absolute), np.inf, absolute)
+        relative = absolute / np.maximum(np.abs(np.nan_to_num(expected)), DOLLAR_FLOOR)
+        errors[column] = (float(np.max(absolute, initial=0)), float(np.max(relative, initial=0)))
+    return errors
+
+
+def run_comparison(name, num_scenarios=100, seed=0):
+    """
+    Runs one comparison on randomized scenarios.
+
+    Returns:
+      A DataFrame with one row per compared column: the max absolute and relative
+      error over all scenarios and the scenario with the largest relative error.
+    """
+    reference, candidate, param_names, _ = COMPARISONS[name]
+    rng = np.random.default_rng(seed)
+    worst = {}
+    for _ in range(num_scenarios):
+        scenario = _draw(rng, param_names)
+        for column, (absolute, relative) in column_errors(reference(scenario), candidate(scenario)).items():
+            if column not in worst:
+                worst[column] = [absolute, relative, scenario]
+            else:
+                worst[column][0] = max(worst[column][0], absolute)
+                if relative > worst[column][1]:
+                    worst[column][1:] = [relative, scenario]
+
+    return pd.DataFrame(
+        [(column, absolute, relative, scenario) for column, (absolute, relative, scenario) in worst.items()],
+        columns=["column", "max_abs_error", "max_rel_error", "worst_scenario"],
+    ).set_index("column")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the optimized engines against the reference models.")
+    parser.add_argument("comparisons", nargs="*", help=f"Which of {list(COMPARISONS)} to run (default: all).")
+    parser.add_argument("--scenarios", type=int, default=100, help="Random scenarios per comparison.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Largest acceptable relative error for the strict comparisons.")
+    args = parser.parse_args(argv)
+
+    names = args.comparisons or list(COMPARISONS)
+    failed = []
+    for name in names:
+        report = run_comparison(name, num_scenarios=args.scenarios, seed=args.seed)
+        strict = COMPARISONS[name][3]
+        print(f"\n== {name} ({'must match' if strict else 'informational'}) ==")
+        print(report[["max_abs_error", "max_rel_error"]].to_string(float_format="{:.3e}".format))
+        if strict and (report["max_rel_error"] > args.tolerance).any():
+            failed.append(name)
+            for column, row in report[report["max_rel_error"] > args.tolerance].iterrows():
+                print(f"  worst scenario for {column}: {row['worst_scenario']}")
+
+    if failed:
+        print(f"\nFAILED (relative error above {args.tolerance:g}): {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,200 @@
+"""
+Heatmap slicer for saved sweeps.
+
+    python heatmap_server.py sweeps/latest --x home_price --y loan_interest
+
+serves a Dash app with one heatmap of the buying diff over two parameters and one
+slider for every other parameter of the sweep (saved with result_store.save_sweep).
+"""
+import argparse
+import itertools
+from functools import lru_cache
+
+import numpy as np
+
+from result_store import ResultStore
+
+try:
+    import dash
+    from dash import ALL, Input, Output, dcc, html
+except ImportError:  # dash is only needed to serve the app, not to build figures
+    dash = None
+
+
+def colorscale(zmin, zmax):
+    """
+    Red below zero, white at zero, green above (renting vs buying), as in the notebook.
+    """
+    if zmin > 0 or zmax < 0 or zmax == zmin:
+        return [[0, 'red'], [.5, 'white'], [1, 'green']]
+    return [[0, 'red'], [(0 - zmin) / (zmax - zmin), 'white'], [1, 'green']]
+
+
+def figure_payload(z, x_values, y_values, x_name, y_name, fixed_values, zmin, zmax):
+    """
+    A plain-dict Plotly figure: heatmap of z with the zero contour drawn on top.
+
+    Args:
+      z: 2-D array with rows along y and columns along x.
+      x_values, y_values: The axis values.
+      x_name, y_name: The axis parameter names.
+      fixed_values: {name: value} of the other parameters, shown in the hover text.
+      zmin, zmax: Colour range (shared by all slices so colours are comparable).
+    """
+    fixed_text = ''.join(f'<b>{name}:</b> {value:.3f}<br>' for name, value in fixed_values.items())
+    x_values = np.asarray(x_values).tolist()
+    y_values = np.asarray(y_values).tolist()
+    z = np.asarray(z).tolist()
+    return {
+        "data": [
+            {
+                "type": "heatmap",
+                "z": z,
+                "x": x_values,
+                "y": y_values,
+                "zmin": zmin,
+                "zmax": zmax,
+                "colorscale": colorscale(zmin, zmax),
+                "hovertemplate": (fixed_text
+                                  + '<b>' + x_name + ':</b> %{x:.2f}<br>'
+                                  + '<b>' + y_name + ':</b> %{y:.2f}<br>'
+                                  + '<b>Value:</b> %{z:,.0f}<extra></extra>'),
+            },
+            {
+                "type": "contour",
+                "z": z,
+                "x": x_values,
+                "y": y_values,
+                "contours": {"start": 0, "end": 0, "size": 0.5, "coloring": "lines"},
+                "line": {"width": 2},
+                "showscale": False,
+                "hoverinfo": "skip",
+            },
+        ],
+        "layout": {
+            "xaxis": {"title": {"text": x_name}},
+            "yaxis": {"title": {"text": y_name}},
+            "uirevision": f"{x_name}/{y_name}",
+        },
+    }
+
+
+class HeatmapSlices:
+    """
+    Figure payloads for every 2-D slice of a saved sweep, built once and cached.
+
+    A slice is identified by its x and y parameters and the grid index of every
+    other parameter (in sweep order).
+    """
+
+    def __init__(self, store, max_cached=4096):
+        self.store = store
+        self.figure = lru_cache(maxsize=max_cached)(self._figure)
+
+    def other_names(self, x, y):
+        return [name for name in self.store.names if name not in (x, y)]
+
+    def _figure(self, x, y, other_indices):
+        fixed_values = {name: self.store.param_values[name][index]
+                        for name, index in zip(self.other_names(x, y), other_indices)}
+        z = self.store.slice(x, y, **fixed_values)
+        return figure_payload(z, self.store.param_values[x], self.store.param_values[y], x, y,
+                              fixed_values, self.store.min, self.store.max)
+
+    def precompute(self, x, y):
+        """
+        Builds the payload of every slice with these x and y parameters.
+        """
+        sizes = [len(self.store.param_values[name]) for name in self.other_names(x, y)]
+        for other_indices in itertools.product(*(range(size) for size in sizes)):
+            self.figure(x, y, other_indices)
+
+
+def create_app(store, x=None, y=None, precompute=True):
+    """
+    The Dash heatmap slicer for a ResultStore (or the path of a saved sweep).
+
+    Args:
+      store: A ResultStore or a directory written by result_store.save_sweep.
+      x, y: Parameters initially shown across and down (default: the last two).
+      precompute: Build every slice for the initial x/y pair before serving, so
+                  scrubbing the sliders only looks figures up. Other pairs are
+                  built on first use and kept in the same bounded LRU cache, so
+                  startup does not grow with the number of parameter pairs.
+    """
+    if dash is None:
+        raise ImportError("create_app needs dash (pip install dash).")
+    if not isinstance(store, ResultStore):
+        store = ResultStore(store)
+    if len(store.names) < 2:
+        raise ValueError("A heatmap needs a sweep over at least two parameters.")
+    x = x or store.names[-1]
+    y = y or store.names[-2]
+
+    slices = HeatmapSlices(store)
+    if precompute:
+        slices.precompute(x, y)
+
+    axis_options = [{'label': name, 'value': name} for name in store.names]
+    sliders = []
+    for name, values in store.param_values.items():
+        sliders.append(html.Div([
+            html.Label(name),
+            dcc.Slider(
+                id={'type': 'param-slider', 'name': name},
+                min=0,
+                max=len(values) - 1,
+                step=1,
+                value=0,
+                marks={i: f"{value:.3f}" for i, value in enumerate(values)},
+            ),
+        ]))
+
+    app = dash.Dash(__name__)
+    app.layout = html.Div([
+        html.H1("Buying vs renting heatmap slicer"),
+        html.Div([
+            html.Label("x"),
+            dcc.Dropdown(id='x-param', options=axis_options, value=x, clearable=False),
+            html.Label("y"),
+            dcc.Dropdown(id='y-param', options=axis_options, value=y, clearable=False),
+        ]),
+        html.Div(sliders),
+        dcc.Graph(id='heatmap-graph', figure=slices.figure(x, y, (0,) * (len(store.names) - 2))),
+    ])
+
+    @app.callback(
+        Output('heatmap-graph', 'figure'),
+        Output({'type': 'param-slider', 'name': ALL}, 'disabled'),
+        Input('x-param', 'value'),
+        Input('y-param', 'value'),
+        Input({'type': 'param-slider', 'name': ALL}, 'value'),
+    )
+    def update_heatmap(x_param, y_param, slider_indices):
+        # Sliders of the parameters on the axes do nothing, so they are disabled.
+        disabled = [name in (x_param, y_param) for name in store.names]
+        if x_param == y_param:
+            return dash.no_update, disabled
+        indices = dict(zip(store.names, slider_indices))
+        other_indices = tuple(indices[name] for name in slices.other_names(x_param, y_param))
+        return slices.figure(x_param, y_param, other_indices), disabled
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve a heatmap slicer for a sweep saved with result_store.save_sweep.")
+    parser.add_argument("path", help="Directory of the saved sweep.")
+    parser.add_argument("--x", help="Parameter shown across (default: the last one).")
+    parser.add_argument("--y", help="Parameter shown down (default: the second to last).")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--debug", action="store_true")
+    args = parser.parse_args(argv)
+
+    app = create_app(args.path, x=args.x, y=args.y)
+    app.run(host=args.host, port=args.port, debug=args.debug)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Interchangeable implementations of the scalar loan and investment recurrences.
+
+    import kernels
+
+    kernels.warmup()                                    # compile (or load) numba kernels now
+    remaining_debt = kernels.get_kernel("remaining_debt")
+    remaining_debt(640000, 0.00526, 4045.12, 120, 360)
+
+Every backend provides the same kernels with the same arguments:
+  - remaining_debt(principal, monthly_rate, payment, num_months, term_months):
+    loan balance after num_months months (a float).
+  - debt_schedule(principal, monthly_rate, payment, num_months, term_months):
+    (balances, interests), the balance at the end of and the interest accrued in
+    every month (arrays of length num_months).
+  - renter_investment(num_months, down_payment, monthly_payment, term_months,
+    monthly_stock_interest, initial_rent, home_price, property_tax_rate,
+    home_upkeep_percent, home_value_interest, tenant_rent_initial):
+    the renter's investment balance after num_months months (a float), see
+    buy_v_rent_point_in_time.get_data_at_year.
+
+Backends:
+  - "python": the original month-by-month loops.
+  - "numpy": the closed forms (amortization.balance_after and
+    buy_v_rent_point_in_time.closed_form_renter_investment).
+  - "numba": the loops compiled with numba, if it is installed. Compiled code is
+    cached on disk (cache=True), so only the first process to call a kernel pays
+    for the compilation. Asking for "numba" without numba installed silently
+    gives the numpy backend.
+"""
+import time
+
+import numpy as np
+
+from amortization import amortization_schedule, balance_after
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional, the numpy backend is used instead
+    njit = None
+
+
+def _remaining_debt_loop(principal, monthly_rate, payment, num_months, term_months):
+    balance = principal
+    if balance <= 0:
+        return 0.0
+    for month_index in range(num_months):
+        if balance <= 0:
+            break
+        balance += balance * monthly_rate
+        payment_this_month = payment if month_index < term_months else 0.0
+        if payment_this_month >= balance:
+            balance = 0.0
+        else:
+            balance -= payment_this_month
+        if balance < 0:
+            balance = 0.0
+    return balance
+
+
+def _debt_schedule_loop(principal, monthly_rate, payment, num_months, term_months):
+    balances = np.zeros(num_months)
+    interests = np.zeros(num_months)
+    balance = principal
+    for month_index in range(num_months):
+        if balance <= 0:
+            # Paid off: the balance and interest stay 0.
+            balance = 0.0
+            continue
+        interest = balance * monthly_rate
+        interests[month_index] = interest
+        balance += interest
+        if month_index < term_months:
+            balance -= payment
+        if balance < 0:
+            balance = 0.0
+        balances[month_index] = balance
+    return balances, interests
+
+
+def _renter_investment_loop(num_months, down_payment, monthly_payment, term_months, monthly_stock_interest,
+                            initial_rent, home_price, property_tax_rate, home_upkeep_percent,
+                            home_value_interest, tenant_rent_initial):
+    investment = 0.0
+    rent = prop_tax = upkeep = tenant_rent = 0.0
+    for month_index in range(num_months):
+        if month_index % 12 == 0:
+            # Rent, home value and tenant rent only change once a year.
+            level = (1 + home_value_interest) ** (month_index // 12)
+            rent = initial_rent * level
+            home_value = home_price * level
+            tenant_rent = tenant_rent_initial * level
+            prop_tax = home_value * property_tax_rate / 12
+            upkeep = home_value * home_upkeep_percent / 12
+        mortgage_payment = monthly_payment if month_index < term_months else 0.0
+        paid_towards_home = mortgage_payment + prop_tax + upkeep - tenant_rent
+        if month_index == 0:
+            paid_towards_home += down_payment
+        investment = investment * (1 + monthly_stock_interest) + (paid_towards_home - rent)
+    return investment
+
+
+def _term(term_months):
+    return float("inf") if term_months is None else float(term_months)
+
+
+def _loop_backend(remaining_debt, debt_schedule, renter_investment):
+    """
+    Kernels running the given loop implementations. Arguments are converted to
+    plain floats and ints first, so numba compiles (and caches) one signature only.
+    """
+    def remaining_debt_kernel(principal, monthly_rate, payment, num_months, term_months=None):
+        return float(remaining_debt(float(principal), float(monthly_rate), float(payment),
+                                    int(num_months), _term(term_months)))
+
+    def debt_schedule_kernel(principal, monthly_rate, payment, num_months, term_months=None):
+        return debt_schedule(float(principal), float(monthly_rate), float(payment),
+                             int(num_months), _term(term_months))
+
+    def renter_investment_kernel(num_months, down_payment, monthly_payment, term_months, *amounts):
+        return float(renter_investment(int(num_months), float(down_payment), float(monthly_payment),
+                                       _term(term_months), *(float(amount) for amount in amounts)))
+
+    return {
+        "remaining_debt": remaining_debt_kernel,
+        "debt_schedule": debt_schedule_kernel,
+        "renter_investment": renter_investment_kernel,
+    }
+
+
+def _numpy_remaining_debt(principal, monthly_rate, payment, num_months, term_months=None):
+    return float(balance_after(principal, monthly_rate, payment, num_months, term_months))
+
+
+def _numpy_debt_schedule(principal, monthly_rate, payment, num_months, term_months=None):
+    balances, interests, _ = amortization_schedule(principal, monthly_rate, payment, num_months, term_months)
+    return balances, interests
+
+
+def _numpy_renter_investment(*args):
+    # Imported here because buy_v_rent_point_in_time imports this module.
+    from buy_v_rent_point_in_time import closed_form_renter_investment
+
+    return float(closed_form_renter_investment(*args))
+
+
+# Backend name -> {kernel name -> function}.
+BACKENDS = {
+    "python": _loop_backend(_remaining_debt_loop, _debt_schedule_loop, _renter_investment_loop),
+    "numpy": {
+        "remaining_debt": _numpy_remaining_debt,
+        "debt_schedule": _numpy_debt_schedule,
+        "renter_investment": _numpy_renter_investment,
+    },
+}
+if njit is not None:
+    BACKENDS["numba"] = _loop_backend(*(njit(cache=True)(loop) for loop in (
+        _remaining_debt_loop, _debt_schedule_loop, _renter_investment_loop)))
+
+# Backend used when none is given: the fastest one available.
+DEFAULT_BACKEND = "numba" if "numba" in BACKENDS else "numpy"
+# Fastest available backend that steps through the months one by one.
+LOOP_BACKEND = "numba" if "numba" in BACKENDS else "python"
+
+# Kernel name -> arguments of a small call, used by warmup.
+_WARMUP_ARGS = {
+    "remaining_debt": (640000.0, 0.005, 4000.0, 24, 360),
+    "debt_schedule": (640000.0, 0.005, 4000.0, 24, 360),
+    "renter_investment": (24, 160000.0, 4000.0, 360, 0.007, 1500.0, 800000.0, 0.0105, 0.01, 0.054, 0.0),
+}
+
+
+def resolve_backend(backend=None):
+    """
+    Name of the backend that will run for backend (None gives DEFAULT_BACKEND,
+    "numba" gives "numpy" if numba is not installed).
+    """
+    if backend is None:
+        return DEFAULT_BACKEND
+    if backend == "numba" and "numba" not in BACKENDS:
+        return "numpy"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {sorted(BACKENDS) + ['numba']}.")
+    return backend
+
+
+def get_kernel(name, backend=None):
+    """
+    The kernel called name from the given backend (see resolve_backend).
+    """
+    kernels = BACKENDS[resolve_backend(backend)]
+    if name not in kernels:
+        raise ValueError(f"Unknown kernel '{name}', expected one of {sorted(kernels)}.")
+    return kernels[name]
+
+
+def warmup(backends=None):
+    """
+    Calls every kernel once, so that numba compiles them (or loads them from its
+    on-disk cache) now rather than in the first timed or latency-sensitive call.
+
+    Args:
+      backends: Backend names (default: all available).
+
+    Returns:
+      {backend: seconds the warmup took}.
+    """
+    timings = {}
+    for backend in backends or BACKENDS:
+        start = time.perf_counter()
+        for name, args in _WARMUP_ARGS.items():
+            get_kernel(name, backend)(*args)
+        timings[resolve_backend(backend)] = time.perf_counter() - start
+    return timings
+
+
+if __name__ == "__main__":
+    # Warms the numba cache and checks that all backends agree over 30 years.
+    print("warmup seconds:", warmup())
+    loan = (640000.0, 0.005, 4000.0, 360, 360)
+    checks = {
+        "remaining_debt": loan,
+        "debt_schedule": loan,
+        "renter_investment": (360,) + _WARMUP_ARGS["renter_investment"][1:],
+    }
+    for name, args in checks.items():
+        for backend in BACKENDS:
+            result = get_kernel(name, backend)(*args)
+            if name == "debt_schedule":
+                result = (float(result[0][-1]), float(result[1].sum()))
+            print(f"{name:18s} {backend:7s} {result}")
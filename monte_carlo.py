@@ -0,0 +1,364 @@
+import numpy as np
+import pandas as pd
+
+from buy_v_rent import get_debt_data
+
+CAPITAL_GAINS_TAX_RATE = .15
+REALTOR_COST = .06
+
+DISTRIBUTIONS = ("normal", "lognormal", "bootstrap")
+
+
+def draw_monthly_returns(num_paths, months, annual_return, annual_volatility, distribution="lognormal", rng=None):
+    """
+    Draws independent monthly returns for num_paths paths.
+
+    The mean monthly return of both distributions is the deterministic monthly rate
+    used by buy_v_rent.get_data, so a volatility of 0 reproduces the deterministic
+    model. For "lognormal" the log returns are shifted down by sigma**2 / 2 to make
+    that hold; their median return is then slightly below the deterministic rate.
+
+    Args:
+      num_paths: Number of paths (rows).
+      months: Number of months (columns).
+      annual_return: Expected annual return, e.g. .11.
+      annual_volatility: Annualized standard deviation, e.g. .16.
+      distribution: "normal" draws the monthly return itself from a normal
+                    distribution; "lognormal" draws log(1 + monthly return).
+      rng: A numpy Generator (default: a fresh default_rng()).
+
+    Returns:
+      An array of shape (num_paths, months) of monthly returns.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    monthly_volatility = annual_volatility / np.sqrt(12)
+    if distribution == "normal":
+        monthly_return = (1 + annual_return)**(1/12) - 1
+        return rng.normal(monthly_return, monthly_volatility, size=(num_paths, months))
+    if distribution == "lognormal":
+        # E[exp(X)] = exp(mu + sigma**2 / 2) for normal X, so the mean gross return is 1 + the monthly rate.
+        monthly_log_return = np.log1p(annual_return) / 12 - monthly_volatility**2 / 2
+        return np.expm1(rng.normal(monthly_log_return, monthly_volatility, size=(num_paths, months)))
+    raise ValueError(f"Unknown distribution '{distribution}', expected 'normal' or 'lognormal'.")
+
+
+def load_returns_csv(path, stock_column="stock_return", home_column="home_return"):
+    """
+    Reads historical monthly returns (as decimals, one row per month) from a local CSV.
+
+    Returns:
+      An array of shape (num_months, 2) with the stock and home return columns.
+    """
+    df = pd.read_csv(path, usecols=[stock_column, home_column])
+    return df[[stock_column, home_column]].dropna().to_numpy(dtype=float)
+
+
+def block_bootstrap_returns(historical_returns, num_paths, months, block_size=12, rng=None):
+    """
+    Resamples historical monthly returns in contiguous blocks.
+
+    Stock and home returns are drawn from the same months so that their
+    correlation is kept. Blocks wrap around the end of the history.
+
+    Args:
+      historical_returns: Array of shape (num_months, 2), see load_returns_csv.
+      num_paths: Number of paths to draw.
+      months: Length of each path.
+      block_size: Number of consecutive months per block.
+      rng: A numpy Generator (default: a fresh default_rng()).
+
+    Returns:
+      A tuple (stock_returns, home_returns), each of shape (num_paths, months).
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    num_history = len(historical_returns)
+    if num_history == 0:
+        raise ValueError("historical_returns is empty.")
+    num_blocks = -(-months // block_size)
+    starts = rng.integers(0, num_history, size=(num_paths, num_blocks))
+    month_indices = (starts[:, :, None] + np.arange(block_size)) % num_history
+    month_indices = month_indices.reshape(num_paths, -1)[:, :months]
+    sampled = historical_returns[month_indices]
+    return sampled[..., 0], sampled[..., 1]
+
+
+def yearly_incrementing_paths(initial_val, monthly_returns):
+    """
+    Path-wise version of buy_v_rent.yearly_incrementing.
+
+    The value is constant for 12 months and then steps by the compounded
+    return of the previous 12 months of that path.
+
+    Args:
+      initial_val: Starting value (scalar).
+      monthly_returns: Array of shape (num_paths, months).
+
+    Returns:
+      An array of shape (num_paths, months).
+    """
+    num_paths, months = monthly_returns.shape
+    # Growth index at the end of every month, then hold each year-end level for the next 12 months.
+    growth_index = np.cumprod(1 + monthly_returns, axis=1)
+    levels = np.ones((num_paths, months))
+    year_starts = np.arange(12, months, 12)
+    for year_start in year_starts:
+        levels[:, year_start:year_start + 12] = growth_index[:, year_start - 1:year_start]
+    return initial_val * levels
+
+
+def growth_repeated_investments_paths(investments, monthly_rates):
+    """
+    Path-wise version of buy_v_rent.calculate_growth_repeated_investments with a
+    different rate in every month: acc[i] = acc[i-1] * (1 + rate[i]) + investments[i].
+
+    Args:
+      investments: Array of shape (num_paths, months) (or broadcastable to it).
+      monthly_rates: Array of shape (num_paths, months).
+
+    Returns:
+      An array of shape (num_paths, months).
+    """
+    investments = np.broadcast_to(investments, monthly_rates.shape)
+    acc = np.empty(monthly_rates.shape)
+    acc[:, 0] = investments[:, 0]
+    for i in range(1, monthly_rates.shape[1]):
+        acc[:, i] = acc[:, i-1] * (1 + monthly_rates[:, i]) + investments[:, i]
+    return acc
+
+
+def simulate_diff_paths(stock_returns,
+                        home_returns,
+                        initial_rent=1500,
+                        home_price=800000,
+                        down_payment_perc=0.20,
+                        loan_term_years=30,
+                        loan_interest=0.065,
+                        property_tax_rate=0.0105,
+                        home_upkeep_percent=.01,
+                        tenant_rent=0,
+                        ):
+    """
+    Runs the buy_v_rent.get_data model over many return paths at once.
+
+    Args:
+      stock_returns: Monthly stock returns, shape (num_paths, months).
+      home_returns: Monthly home value returns, shape (num_paths, months). Rent and
+                    tenant rent follow the home value, as in get_data.
+      Remaining arguments: same as buy_v_rent.get_data.
+
+    Returns:
+      effective_net_worth_with_home - effective_net_worth_renting for every path
+      and month, shape (num_paths, months).
+    """
+    months = stock_returns.shape[1]
+    yearly_payments = 12
+
+    monthly_loan_interest_rate = (1+loan_interest)**(1/12) - 1
+    loan_principal = home_price * (1-down_payment_perc)
+    down_payment = home_price - loan_principal
+    payments = loan_term_years * yearly_payments
+    monthly_payment = loan_principal * (monthly_loan_interest_rate * (1 + monthly_loan_interest_rate) ** payments) / ((1 + monthly_loan_interest_rate) ** payments - 1)
+
+    # The loan does not depend on the market path.
+    remaining_debt, _ = get_debt_data(loan_principal, monthly_payment, monthly_loan_interest_rate, months, payments)
+    remaining_debt = np.asarray(remaining_debt, dtype=float)
+    month_index = np.arange(months)
+    fixed_outlay = np.where(month_index <= loan_term_years * 12, monthly_payment, 0)
+    fixed_outlay[0] += down_payment
+
+    # Everything that follows the home value, expressed per unit of home price growth.
+    home_level = yearly_incrementing_paths(1, home_returns)
+    home_value = home_price * home_level
+    paid_towards_home = (fixed_outlay
+                         + home_value * property_tax_rate / 12
+                         + home_value * home_upkeep_percent / 12
+                         - tenant_rent * home_level)
+    excess_available_to_invest_monthly_renting = paid_towards_home - initial_rent * home_level
+    del paid_towards_home
+
+    net_worth_renting = growth_repeated_investments_paths(excess_available_to_invest_monthly_renting, stock_returns)
+    del excess_available_to_invest_monthly_renting
+
+    net_worth_with_home = home_value - remaining_debt
+    effective_net_worth_with_home = net_worth_with_home - net_worth_with_home * REALTOR_COST
+    effective_net_worth_renting = net_worth_renting - net_worth_renting * CAPITAL_GAINS_TAX_RATE
+    return effective_net_worth_with_home - effective_net_worth_renting
+
+
+class _StreamingPercentiles:
+    """
+    Approximate per-month percentiles over many chunks with fixed memory.
+
+    Each month gets a fixed histogram whose range is taken from the first chunk
+    (widened on both sides). Values outside the range are counted in under/overflow
+    bins, whose contents are bounded by the exact running min/max.
+    """
+
+    def __init__(self, first_chunk, num_bins=4096, margin=.5):
+        low = first_chunk.min(axis=0)
+        high = first_chunk.max(axis=0)
+        spread = np.maximum(high - low, np.maximum(np.abs(high), 1) * 1e-9)
+        self.num_bins = num_bins
+        self.low = low - margin * spread
+        self.width = (high - low + 2 * margin * spread) / num_bins
+        self.months = first_chunk.shape[1]
+        # Bin 0 is underflow, bin num_bins + 1 is overflow.
+        self.counts = np.zeros((self.months, num_bins + 2), dtype=np.int64)
+        self.minimum = np.full(self.months, np.inf)
+        self.maximum = np.full(self.months, -np.inf)
+        self.add(first_chunk)
+
+    def add(self, chunk):
+        self.minimum = np.minimum(self.minimum, chunk.min(axis=0))
+        self.maximum = np.maximum(self.maximum, chunk.max(axis=0))
+        bins = np.floor((chunk - self.low) / self.width).astype(np.int64) + 1
+        np.clip(bins, 0, self.num_bins + 1, out=bins)
+        flat = bins + np.arange(self.months) * (self.num_bins + 2)
+        self.counts += np.bincount(flat.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+
+    def percentile(self, q):
+        edges = self.low[:, None] + self.width[:, None] * np.arange(self.num_bins + 1)
+        # Lower/upper edge of every bin, with the under/overflow bins bounded by the observed extremes.
+        lower = np.concatenate([self.minimum[:, None], edges], axis=1)
+        upper = np.concatenate([edges, self.maximum[:, None]], axis=1)
+        lower = np.minimum(lower, upper)
+
+        cumulative = np.cumsum(self.counts, axis=1)
+        total = cumulative[:, -1]
+        target = q / 100 * total
+        bin_index = np.minimum((cumulative < target[:, None]).sum(axis=1), self.num_bins + 1)
+        rows = np.arange(self.months)
+        below = np.where(bin_index > 0, cumulative[rows, bin_index - 1], 0)
+        in_bin = np.maximum(self.counts[rows, bin_index], 1)
+        fraction = np.clip((target - below) / in_bin, 0, 1)
+        return lower[rows, bin_index] + fraction * (upper[rows, bin_index] - lower[rows, bin_index])
+
+
+def get_percentile_bands(total_years=45,
+                         initial_rent=1500,
+                         home_price=800000,
+                         down_payment_perc=0.20,
+                         loan_term_years=30,
+                         loan_interest=0.065,
+                         property_tax_rate=0.0105,
+                         stock_interest=.11,
+                         home_value_interest=.054,
+                         home_upkeep_percent=.01,
+                         tenant_rent=0,
+                         num_paths=10000,
+                         distribution="lognormal",
+                         stock_volatility=.16,
+                         home_value_volatility=.05,
+                         returns_csv=None,
+                         block_size=12,
+                         percentiles=(5, 25, 50, 75, 95),
+                         memory_budget_bytes=256 * 2**20,
+                         seed=None,
+                         ):
+    """
+    Monte Carlo version of buy_v_rent.get_data.
+
+    Draws num_paths paths of monthly stock and home returns, runs the get_data model
+    over all of them in one vectorized pass per chunk, and summarizes
+    effective_net_worth_with_home - effective_net_worth_renting per month.
+
+    Paths are processed in chunks sized so that the working arrays stay within
+    memory_budget_bytes. When all paths fit in one chunk the percentiles are exact;
+    otherwise they come from fixed per-month histograms (see _StreamingPercentiles),
+    accurate to a small fraction of each month's spread.
+
+    Args:
+      total_years ... tenant_rent: Same as buy_v_rent.get_data.
+      num_paths: Number of simulated paths.
+      distribution: "normal", "lognormal" (see draw_monthly_returns) or "bootstrap"
+                    (block bootstrap of returns_csv, see block_bootstrap_returns).
+      stock_volatility: Annualized volatility of stock returns.
+      home_value_volatility: Annualized volatility of home value returns.
+      returns_csv: CSV with stock_return and home_return columns, for "bootstrap".
+      block_size: Block length in months for "bootstrap".
+      percentiles: Percentiles to report, in [0, 100].
+      memory_budget_bytes: Upper bound for the per-chunk working arrays.
+      seed: Seed for the random generator. Results are reproducible for a given
+            seed and memory_budget_bytes (the budget decides how draws are chunked).
+
+    Returns:
+      A DataFrame with 'months', 'year', 'mean' and one 'p<q>' column per percentile.
+    """
+    if num_paths < 1:
+        raise ValueError("num_paths must be at least 1.")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{distribution}', expected one of {DISTRIBUTIONS}.")
+    if distribution == "bootstrap":
+        if returns_csv is None:
+            raise ValueError("distribution='bootstrap' needs returns_csv.")
+        historical_returns = load_returns_csv(returns_csv)
+
+    months = total_years * 12
+    rng = np.random.default_rng(seed)
+    model_kwargs = dict(
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        home_upkeep_percent=home_upkeep_percent,
+        tenant_rent=tenant_rent,
+    )
+
+    # About eight (num_paths, months) float64 arrays are alive at the peak of a chunk.
+    bytes_per_path = 8 * 8 * months
+    chunk_paths = int(max(1, min(num_paths, memory_budget_bytes // bytes_per_path)))
+
+    summary = None
+    total = np.zeros(months)
+    for start in range(0, num_paths, chunk_paths):
+        n = min(chunk_paths, num_paths - start)
+        if distribution == "bootstrap":
+            stock_returns, home_returns = block_bootstrap_returns(historical_returns, n, months, block_size, rng)
+        else:
+            stock_returns = draw_monthly_returns(n, months, stock_interest, stock_volatility, distribution, rng)
+            home_returns = draw_monthly_returns(n, months, home_value_interest, home_value_volatility, distribution, rng)
+
+        diff = simulate_diff_paths(stock_returns, home_returns, **model_kwargs)
+        del stock_returns, home_returns
+        total += diff.sum(axis=0)
+
+        if chunk_paths >= num_paths:
+            bands = {f"p{q:g}": np.percentile(diff, q, axis=0) for q in percentiles}
+        elif summary is None:
+            summary = _StreamingPercentiles(diff)
+        else:
+            summary.add(diff)
+        del diff
+
+    if summary is not None:
+        bands = {f"p{q:g}": summary.percentile(q) for q in percentiles}
+
+    df = pd.DataFrame({"months": list(range(months))})
+    df['year'] = df['months'] / 12
+    df['mean'] = total / num_paths
+    for name, values in bands.items():
+        df[name] = values
+    return df
+
+
+if __name__ == "__main__":
+    from buy_v_rent import get_data
+
+    # With zero volatility every path is the deterministic get_data scenario.
+    deterministic = get_data(total_years=30)
+    bands = get_percentile_bands(total_years=30, num_paths=10, stock_volatility=0, home_value_volatility=0)
+    expected = deterministic['effective_net_worth_with_home'] - deterministic['effective_net_worth_renting']
+    print("max deviation from get_data:", np.max(np.abs(bands['p50'] - expected)))
+
+    # The lognormal draws have the deterministic monthly rate as their mean.
+    returns = draw_monthly_returns(2000, 1200, .11, .16, rng=np.random.default_rng(0))
+    deterministic_rate = 1.11**(1/12) - 1
+    assert abs(returns.mean() - deterministic_rate) < 5e-4, returns.mean()
+    print(f"mean lognormal monthly return {returns.mean():.6f}, deterministic {deterministic_rate:.6f}")
+
+    bands = get_percentile_bands(total_years=45, num_paths=20000, memory_budget_bytes=64 * 2**20, seed=0)
+    print(bands[bands['months'] % 60 == 59].round(0))
@@ -0,0 +1,241 @@
+"""
+Opt-in per-stage timing for the simulation hot paths.
+
+    import profiling
+
+    with profiling.profile(allocations=True):
+        buy_v_rent_point_in_time.grid_search_buying_diff(...)
+    print(profiling.summary().to_string())
+    profiling.write_folded("grid.folded")   # flamegraph.pl / speedscope input
+
+Functions decorated with @profiled and blocks wrapped in `with stage(name):` are
+recorded as stages. Stages nest, so the same stage called from two places is
+recorded twice, once under each caller. While profiling is disabled (the default)
+a decorated function costs one flag check and stage() returns a shared no-op
+context manager.
+
+Only the calling process is recorded: sweeps run with a process executor do
+their work (and record nothing) in the worker processes.
+"""
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+
+import pandas as pd
+
+_enabled = False
+_allocations = False
+_started_tracemalloc = False
+
+# Stage path (tuple of names, outermost first) -> [calls, seconds, child seconds, peak bytes].
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+# Stage name -> decorated function, for every function decorated with @profiled.
+INSTRUMENTED = {}
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+class _Stage:
+    """
+    One running stage. Times its block and, if allocations are traced, the peak
+    memory allocated above what was in use when it started.
+    """
+    __slots__ = ("name", "path", "start", "start_memory", "peak_memory", "child_seconds")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        stack = _stack()
+        self.path = (stack[-1].path if stack else ()) + (self.name,)
+        self.child_seconds = 0.0
+        if _allocations:
+            current, peak = tracemalloc.get_traced_memory()
+            if stack:
+                stack[-1].peak_memory = max(stack[-1].peak_memory, peak)
+            # The peak is reset so this stage sees only its own; the parent got the old one above.
+            tracemalloc.reset_peak()
+            self.start_memory = self.peak_memory = current
+        stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        stack = _stack()
+        stack.pop()
+        peak_bytes = 0
+        if _allocations:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            peak_bytes = self.peak_memory - self.start_memory
+        if stack:
+            parent = stack[-1]
+            parent.child_seconds += seconds
+            if _allocations:
+                parent.peak_memory = max(parent.peak_memory, self.peak_memory)
+        with _lock:
+            entry = _stats.setdefault(self.path, [0, 0.0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += self.child_seconds
+            entry[3] = max(entry[3], peak_bytes)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def stage(name):
+    """
+    Context manager recording its block as stage name (a no-op unless profiling is enabled).
+    """
+    if not _enabled:
+        return _NO_STAGE
+    return _Stage(name)
+
+
+def profiled(name=None):
+    """
+    Decorator recording every call of the function as a stage.
+
+    Args:
+      name: Stage name (default: module.qualname of the function).
+    """
+    def decorate(func):
+        stage_name = name or f"{func.__module__}.{func.__qualname__}"
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Stage(stage_name):
+                return func(*args, **kwargs)
+
+        INSTRUMENTED[stage_name] = wrapper
+        return wrapper
+    return decorate
+
+
+def enable(allocations=False):
+    """
+    Starts recording stages.
+
+    Args:
+      allocations: Also record the peak memory allocated by each stage (with
+                   tracemalloc, which slows everything down noticeably).
+    """
+    global _enabled, _allocations, _started_tracemalloc
+    if allocations and not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _started_tracemalloc = True
+    _allocations = allocations
+    _enabled = True
+
+
+def disable():
+    """
+    Stops recording. Recorded stages are kept until reset().
+    """
+    global _enabled, _allocations, _started_tracemalloc
+    _enabled = False
+    _allocations = False
+    if _started_tracemalloc:
+        tracemalloc.stop()
+        _started_tracemalloc = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """
+    Forgets all recorded stages.
+    """
+    with _lock:
+        _stats.clear()
+
+
+@contextmanager
+def profile(allocations=False):
+    """
+    Records the stages run inside the with block (earlier records are reset first).
+    """
+    reset()
+    enable(allocations=allocations)
+    try:
+        yield
+    finally:
+        disable()
+
+
+def summary(by="path"):
+    """
+    The recorded stages as a table, slowest first.
+
+    Args:
+      by: "path" keeps a row per call path (e.g. "grid_search;run_grid;get_data");
+          "name" adds up every path that ends in the same stage (a stage that calls
+          itself is then counted more than once).
+
+    Returns:
+      A DataFrame indexed by stage with columns calls, total_seconds, self_seconds
+      (total minus time in nested stages), mean_ms and peak_bytes (0 unless
+      allocations were recorded).
+    """
+    if by not in ("path", "name"):
+        raise ValueError(f"Unknown grouping '{by}', expected 'path' or 'name'.")
+    with _lock:
+        stats = {path: list(entry) for path, entry in _stats.items()}
+
+    rows = {}
+    for path, (calls, seconds, child_seconds, peak_bytes) in stats.items():
+        key = ";".join(path) if by == "path" else path[-1]
+        row = rows.setdefault(key, [0, 0.0, 0.0, 0])
+        row[0] += calls
+        row[1] += seconds
+        row[2] += seconds - child_seconds
+        row[3] = max(row[3], peak_bytes)
+
+    table = pd.DataFrame.from_dict(rows, orient="index",
+                                   columns=["calls", "total_seconds", "self_seconds", "peak_bytes"])
+    table.index.name = "stage"
+    table.insert(3, "mean_ms", table["total_seconds"] / table["calls"].clip(lower=1) * 1000)
+    return table.sort_values("total_seconds", ascending=False)
+
+
+def folded():
+    """
+    The recorded stages in the folded-stack format of flamegraph.pl and speedscope:
+    one "outer;inner;stage microseconds" line per call path, with the time spent in
+    that stage itself (not in nested stages).
+    """
+    with _lock:
+        stats = {path: list(entry) for path, entry in _stats.items()}
+    return [f"{';'.join(path)} {max(round((seconds - child_seconds) * 1e6), 0)}"
+            for path, (_, seconds, child_seconds, _) in sorted(stats.items())]
+
+
+def write_folded(path):
+    with open(path, "w") as f:
+        f.write("\n".join(folded()) + "\n")
+
@@ -0,0 +1,6 @@
+"""
+Frozen copies of the original (loop-based) model implementations.
+
+These are the reference the optimized engines are checked against by
+equivalence.py. They are intentionally left as they were: do not optimize them.
+"""
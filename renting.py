@@ -1,5 +1,12 @@
+import numpy as np
 import pandas as pd
 
+from amortization import amortization_schedule
+from column_graph import ColumnArrays, ColumnGraph
+from profiling import profiled
+from sweep import expand_param_ranges, run_adaptive_grid, run_grid, run_grid_to_file
+
+@profiled()
 def yearly_incrementing(initial_val, interest, years):
     # calculates rent with 1 year lag to home interest
     val=initial_val
@@ -21,114 +28,259 @@ def cumulative_sum(l):
 
 def get_monthly_interest_owed(
         loan_principal, monthly_payment, monthly_loan_interest_rate, total_years):
-    loan = loan_principal
-    interest = 0
-    interests = []
-    for i in range(total_years*12):
-        monthly_interest = loan * (monthly_loan_interest_rate)
-        loan = loan + monthly_interest - monthly_payment
-        if loan <= 0:
-            loan = 0
-        interests.append(monthly_interest)
+    # Payments continue for the whole simulation (no term).
+    _, interests, _ = amortization_schedule(
+        loan_principal, monthly_loan_interest_rate, monthly_payment, total_years*12)
     return interests
 
 
-def get_data(total_years=45,
-             initial_rent=1500,
-             home_price=800000,
-             down_payment_perc=0.20,
-             loan_term_years=30,
-             loan_interest=0.065,
-             property_tax_rate=0.0105,
-             stock_interest=.11,
-             home_value_interest=.054,
-             ):
-    yearly_payments=12
-
-    monthly_stock_interest = (1+stock_interest)**(1/12) - 1
-    monthly_loan_interest_rate = (1+loan_interest)**(1/12) - 1
-    monthly_home_appreciation = (1+home_value_interest)**(1/12) - 1
-    months = total_years * 12
+#####################
+# Column graph used by get_data
+#####################
 
+_graph = ColumnGraph()
 
-    loan_principal = home_price * (1-down_payment_perc)
-    down_payment = home_price - loan_principal
-    payments = loan_term_years * yearly_payments
-    monthly_payment = loan_principal * (monthly_loan_interest_rate * (1 + monthly_loan_interest_rate) ** payments) / ((1 + monthly_loan_interest_rate) ** payments - 1)
+@_graph.node
+def _months(total_years):
+    return np.arange(total_years * 12)
 
-    
-    df = pd.DataFrame(
-        {"months": list(range(months))}
-    )
-    df['year'] = df['months'] /12
+@_graph.node
+def _year(months):
+    return months /12
 
-    df['home_value'] = yearly_incrementing(home_price, home_value_interest, total_years)
+@_graph.node
+def _monthly_stock_interest(stock_interest):
+    return (1+stock_interest)**(1/12) - 1
 
-    df['property_tax'] = df['home_value'] * property_tax_rate/12
+@_graph.node
+def _monthly_loan_interest_rate(loan_interest):
+    return (1+loan_interest)**(1/12) - 1
 
-    # renting
+@_graph.node
+def _monthly_home_appreciation(home_value_interest):
+    return (1+home_value_interest)**(1/12) - 1
 
-    df['rent'] = yearly_incrementing(initial_rent, home_value_interest, total_years)
+@_graph.node
+def _loan_principal_amount(home_price, down_payment_perc):
+    return home_price * (1-down_payment_perc)
 
-    df['cumulative_rent'] = cumulative_sum(df['rent'])
+@_graph.node
+def _down_payment_amount(home_price, loan_principal_amount):
+    return home_price - loan_principal_amount
 
-    df['monthly interest lost to rent'] = df['cumulative_rent'] * monthly_stock_interest
-
-    df['invested instead of downpayment'] = down_payment * (1+monthly_stock_interest)**(df['months'])
-    df['real price of rent'] = cumulative_sum(df['monthly interest lost to rent']) + df['cumulative_rent']
-
-    df['excess_available_investing_if_renting'] = df['property_tax'] + monthly_payment - df['rent']
-
-    df['renting available to invest'] = cumulative_sum(df['excess_available_investing_if_renting'])
-    df['monthly investment return with no mortgage']= df['renting available to invest']*monthly_stock_interest
-    df['cumulative investment while renting'] = cumulative_sum(df['monthly investment return with no mortgage']) + df['renting available to invest']    
-    df['renting'] =df['cumulative investment while renting']  - df['real price of rent'] + df['invested instead of downpayment']
-    # buying
-
-
-    df['monthly_payment'] = monthly_payment
-    df['monthly_payment'] = df['months'].apply(lambda month: monthly_payment if month <= loan_term_years * 12 else 0)
-
-    df.loc[0, 'monthly_payment'] += down_payment
-
-    df['loan_principal'] = loan_principal
-    df['down_payment'] = down_payment
-
-    df['monthly_interest_owed'] = get_monthly_interest_owed(
-        loan_principal, monthly_payment, monthly_loan_interest_rate, total_years)
-
-    df['cumulative property_tax'] = cumulative_sum(df['property_tax'])
-
-    df['interest lost to property tax'] = df['cumulative property_tax'] * monthly_stock_interest
-
-    df['rent'] = yearly_incrementing(initial_rent, home_value_interest, total_years)
+@_graph.node
+def _monthly_payment_amount(loan_principal_amount, monthly_loan_interest_rate, loan_term_years):
+    yearly_payments=12
+    payments = loan_term_years * yearly_payments
+    return loan_principal_amount * (monthly_loan_interest_rate * (1 + monthly_loan_interest_rate) ** payments) / ((1 + monthly_loan_interest_rate) ** payments - 1)
 
-    df['interest lost to down payment'] = df['down_payment'] * (1+monthly_stock_interest)**(df['months']) - df['down_payment']
-    down_payment_interest_loss = df['interest lost to down payment']
-    property_tax_interest_lost = df['interest lost to property tax']
+@_graph.node
+def _home_value(home_price, home_value_interest, total_years):
+    return np.asarray(yearly_incrementing(home_price, home_value_interest, total_years), dtype=float)
 
-    df['cumulative interest lost to property tax'] = cumulative_sum(df['interest lost to property tax'])
-    cum_property_tax_interest_lost = df['cumulative interest lost to property tax']    
+@_graph.node
+def _property_tax(home_value, property_tax_rate):
+    return home_value * property_tax_rate/12
 
-    house_money_lost = df['property_tax'] + cum_property_tax_interest_lost + down_payment_interest_loss
-    df['house_money_lost'] = house_money_lost
+# renting
 
+@_graph.node
+def _rent(initial_rent, home_value_interest, total_years):
+    return np.asarray(yearly_incrementing(initial_rent, home_value_interest, total_years), dtype=float)
 
+@_graph.node
+def _cumulative_rent(rent):
+    return np.cumsum(rent)
 
-    df['payed_toward_home'] =  cumulative_sum(df['monthly_payment'] - df['monthly_interest_owed'])
+@_graph.node
+def _monthly_interest_lost_to_rent(cumulative_rent, monthly_stock_interest):
+    return cumulative_rent * monthly_stock_interest
 
-    df['home available to invest'] = monthly_payment - df['monthly_payment']
-    df.loc[0, 'home available to invest'] = 0
-    df['cumulative available to invest'] = cumulative_sum(df['home available to invest'])
-    df['monthly investment return with no rent and no mortgage']= df['cumulative available to invest']*monthly_stock_interest
-    df['cumulative investment after mortgage'] = cumulative_sum(df['monthly investment return with no rent and no mortgage']) + df['cumulative available to invest']
+@_graph.node
+def _invested_instead_of_downpayment(down_payment_amount, monthly_stock_interest, months):
+    return down_payment_amount * (1+monthly_stock_interest)**(months)
 
-    df['home_owned'] = df['payed_toward_home'] * (1+monthly_home_appreciation)**(df['months'])
-    df['buying'] = df['home_owned'] - house_money_lost + df['cumulative investment after mortgage'] 
+@_graph.node
+def _real_price_of_rent(monthly_interest_lost_to_rent, cumulative_rent):
+    return np.cumsum(monthly_interest_lost_to_rent) + cumulative_rent
+
+@_graph.node
+def _excess_available_investing_if_renting(property_tax, monthly_payment_amount, rent):
+    return property_tax + monthly_payment_amount - rent
+
+@_graph.node
+def _renting_available_to_invest(excess_available_investing_if_renting):
+    return np.cumsum(excess_available_investing_if_renting)
+
+@_graph.node
+def _monthly_investment_return_with_no_mortgage(renting_available_to_invest, monthly_stock_interest):
+    return renting_available_to_invest*monthly_stock_interest
+
+@_graph.node
+def _cumulative_investment_while_renting(monthly_investment_return_with_no_mortgage, renting_available_to_invest):
+    return np.cumsum(monthly_investment_return_with_no_mortgage) + renting_available_to_invest
+
+@_graph.node
+def _renting(cumulative_investment_while_renting, real_price_of_rent, invested_instead_of_downpayment):
+    return cumulative_investment_while_renting - real_price_of_rent + invested_instead_of_downpayment
+
+# buying
+
+@_graph.node
+def _monthly_payment(months, monthly_payment_amount, loan_term_years, down_payment_amount):
+    monthly_payment = np.where(months <= loan_term_years * 12, monthly_payment_amount, 0.0)
+    monthly_payment[:1] += down_payment_amount
+    return monthly_payment
+
+@_graph.node
+def _loan_principal(months, loan_principal_amount):
+    return np.full(len(months), loan_principal_amount, dtype=float)
+
+@_graph.node
+def _down_payment(months, down_payment_amount):
+    return np.full(len(months), down_payment_amount, dtype=float)
+
+@_graph.node
+def _monthly_interest_owed(loan_principal_amount, monthly_payment_amount, monthly_loan_interest_rate, total_years):
+    return get_monthly_interest_owed(
+        loan_principal_amount, monthly_payment_amount, monthly_loan_interest_rate, total_years)
+
+@_graph.node
+def _cumulative_property_tax(property_tax):
+    return np.cumsum(property_tax)
+
+@_graph.node
+def _interest_lost_to_property_tax(cumulative_property_tax, monthly_stock_interest):
+    return cumulative_property_tax * monthly_stock_interest
+
+@_graph.node
+def _interest_lost_to_down_payment(down_payment, monthly_stock_interest, months):
+    return down_payment * (1+monthly_stock_interest)**(months) - down_payment
+
+@_graph.node
+def _cumulative_interest_lost_to_property_tax(interest_lost_to_property_tax):
+    return np.cumsum(interest_lost_to_property_tax)
+
+@_graph.node
+def _house_money_lost(property_tax, cumulative_interest_lost_to_property_tax, interest_lost_to_down_payment):
+    return property_tax + cumulative_interest_lost_to_property_tax + interest_lost_to_down_payment
+
+@_graph.node
+def _payed_toward_home(monthly_payment, monthly_interest_owed):
+    return np.cumsum(monthly_payment - monthly_interest_owed)
+
+@_graph.node
+def _home_available_to_invest(monthly_payment_amount, monthly_payment):
+    home_available_to_invest = monthly_payment_amount - monthly_payment
+    home_available_to_invest[:1] = 0
+    return home_available_to_invest
+
+@_graph.node
+def _cumulative_available_to_invest(home_available_to_invest):
+    return np.cumsum(home_available_to_invest)
+
+@_graph.node
+def _monthly_investment_return_with_no_rent_and_no_mortgage(cumulative_available_to_invest, monthly_stock_interest):
+    return cumulative_available_to_invest*monthly_stock_interest
+
+@_graph.node
+def _cumulative_investment_after_mortgage(monthly_investment_return_with_no_rent_and_no_mortgage, cumulative_available_to_invest):
+    return np.cumsum(monthly_investment_return_with_no_rent_and_no_mortgage) + cumulative_available_to_invest
+
+@_graph.node
+def _home_owned(payed_toward_home, monthly_home_appreciation, months):
+    return payed_toward_home * (1+monthly_home_appreciation)**(months)
+
+@_graph.node
+def _buying(home_owned, house_money_lost, cumulative_investment_after_mortgage):
+    return home_owned - house_money_lost + cumulative_investment_after_mortgage
+
+@_graph.node
+def _diff(buying, renting):
+    return buying - renting
+
+# DataFrame column -> graph node, in DataFrame order.
+COLUMNS = {
+    'months': 'months',
+    'year': 'year',
+    'home_value': 'home_value',
+    'property_tax': 'property_tax',
+    'rent': 'rent',
+    'cumulative_rent': 'cumulative_rent',
+    'monthly interest lost to rent': 'monthly_interest_lost_to_rent',
+    'invested instead of downpayment': 'invested_instead_of_downpayment',
+    'real price of rent': 'real_price_of_rent',
+    'excess_available_investing_if_renting': 'excess_available_investing_if_renting',
+    'renting available to invest': 'renting_available_to_invest',
+    'monthly investment return with no mortgage': 'monthly_investment_return_with_no_mortgage',
+    'cumulative investment while renting': 'cumulative_investment_while_renting',
+    'renting': 'renting',
+    'monthly_payment': 'monthly_payment',
+    'loan_principal': 'loan_principal',
+    'down_payment': 'down_payment',
+    'monthly_interest_owed': 'monthly_interest_owed',
+    'cumulative property_tax': 'cumulative_property_tax',
+    'interest lost to property tax': 'interest_lost_to_property_tax',
+    'interest lost to down payment': 'interest_lost_to_down_payment',
+    'cumulative interest lost to property tax': 'cumulative_interest_lost_to_property_tax',
+    'house_money_lost': 'house_money_lost',
+    'payed_toward_home': 'payed_toward_home',
+    'home available to invest': 'home_available_to_invest',
+    'cumulative available to invest': 'cumulative_available_to_invest',
+    'monthly investment return with no rent and no mortgage': 'monthly_investment_return_with_no_rent_and_no_mortgage',
+    'cumulative investment after mortgage': 'cumulative_investment_after_mortgage',
+    'home_owned': 'home_owned',
+    'buying': 'buying',
+    'diff': 'diff',
+}
+
+
+@profiled()
+def get_data(total_years=45,
+             initial_rent=1500,
+             home_price=800000,
+             down_payment_perc=0.20,
+             loan_term_years=30,
+             loan_interest=0.065,
+             property_tax_rate=0.0105,
+             stock_interest=.11,
+             home_value_interest=.054,
+             columns=None,
+             output="dataframe",
+             ):
+    """
+    Month-by-month buy vs rent model.
 
-    df['diff'] = df['buying'] - df['renting']
+    columns: Names of the columns to compute (default: all of COLUMNS). Only
+             these columns and the values they depend on are computed.
+    output: "dataframe" returns a pandas DataFrame; "arrays" returns a
+            ColumnArrays dict of NumPy arrays (call .to_dataframe() if needed).
+    """
+    if output not in ("dataframe", "arrays"):
+        raise ValueError(f"Unknown output '{output}', expected 'dataframe' or 'arrays'.")
+    if columns is None:
+        columns = list(COLUMNS)
+    unknown = [column for column in columns if column not in COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns {unknown}, expected names from COLUMNS.")
+
+    params = dict(
+        total_years=total_years,
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+    )
+    values = _graph.evaluate(params, [COLUMNS[column] for column in columns])
+    arrays = ColumnArrays((column, values[COLUMNS[column]]) for column in columns)
 
-    return df
+    if output == "arrays":
+        return arrays
+    return arrays.to_dataframe()
 
 
 def get_buying_diff(at_year,
@@ -141,7 +293,7 @@ def get_buying_diff(at_year,
                     stock_interest,
                     home_value_interest,
                     ):
-    df = get_data(
+    arrays = get_data(
         total_years=at_year,
         initial_rent=initial_rent,
         home_price=home_price,
@@ -150,12 +302,53 @@ def get_buying_diff(at_year,
         loan_interest=loan_interest,
         property_tax_rate=property_tax_rate,
         stock_interest=stock_interest,
-        home_value_interest=home_value_interest)
-    return df['diff'].iloc[-1]
+        home_value_interest=home_value_interest,
+        columns=['diff'],
+        output="arrays")
+    return arrays['diff'][-1]
+
+
+def get_buying_diff_over_years(at_year,
+                               initial_rent,
+                               home_price,
+                               down_payment_perc,
+                               loan_term_years,
+                               loan_interest,
+                               property_tax_rate,
+                               stock_interest,
+                               home_value_interest,
+                               ):
+    """
+    get_buying_diff for every year in the 1-D array at_year, from one get_data run.
+
+    Every column of a shorter simulation is a prefix of a longer one, so the diff at
+    year y is row 12 * y - 1 of the simulation up to max(at_year). Year 0 has no rows
+    and gives NaN.
+    """
+    at_year = np.asarray(at_year)
+    arrays = get_data(
+        total_years=int(at_year.max(initial=0)),
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest,
+        columns=['diff'],
+        output="arrays")
+    diff = arrays['diff']
+    rows = at_year.astype(int) * 12 - 1
+    if diff.size == 0:
+        return np.full(rows.shape, np.nan)
+    return np.where(rows >= 0, diff[np.maximum(rows, 0)], np.nan)
 
 import numpy as np
 
-def grid_search_buying_diff(param_ranges=None, **kwargs):
+@profiled()
+def grid_search_buying_diff(param_ranges=None, executor="serial", max_workers=None, chunk_size=None,
+                            adaptive=False, coarse_step=8, gradient_threshold=None, out_dir=None, **kwargs):
     """
     Performs a grid search over specified parameters to find the buying diff 
     at a specific year.
@@ -172,12 +365,23 @@ def grid_search_buying_diff(param_ranges=None, **kwargs):
       home_value_interest: Home value appreciation interest rate.
       param_ranges: A dictionary where keys are parameter names and values 
                     are tuples (start, stop, step) for the range.
+      executor: "serial", "thread" or "process" (see sweep.run_grid).
+      max_workers: Number of pool workers (default: CPU count).
+      chunk_size: Number of grid cells per task.
+
+    When at_year is swept, each combination of the other parameters is simulated
+    once up to the last year (get_buying_diff_over_years).
+
+    adaptive, coarse_step, gradient_threshold and out_dir: see the point-in-time
+    model's grid_search_buying_diff (sweep.run_adaptive_grid, sweep.run_grid_to_file).
 
     Returns:
       A dictionary containing:
         - 'results': A NumPy array with the buying diff values.
         - 'param_values': A dictionary with parameter names as keys and lists of 
                           parameter values used in the grid search as values.
+      With adaptive=True, a sweep.AdaptiveGrid instead; its to_dense() returns
+      that dictionary.
     """
 
 
@@ -205,22 +409,21 @@ def grid_search_buying_diff(param_ranges=None, **kwargs):
         if param not in param_ranges and param not in kwargs:
             raise ValueError(f"Parameter '{param}' must be specified.")
 
-    param_values = {}
-    for param_name, (start, stop, step) in param_ranges.items():
-        param_values[param_name] = np.arange(start, stop, step)
+    param_values = expand_param_ranges(param_ranges)
 
-    # Determine the shape of the results array
-    shape = tuple(len(values) for values in param_values.values())
-    results = np.zeros(shape)
+    if adaptive:
+        return run_adaptive_grid(get_buying_diff, param_values, kwargs, coarse_step=coarse_step,
+                                 gradient_threshold=gradient_threshold, executor=executor,
+                                 max_workers=max_workers, chunk_size=chunk_size)
 
-    # Generate all combinations of parameter values
-    param_combinations = np.array(np.meshgrid(*param_values.values())).T.reshape(-1, len(param_ranges))
+    if out_dir is not None:
+        results = run_grid_to_file(get_buying_diff, param_values, kwargs, out_dir, executor=executor,
+                                   max_workers=max_workers, chunk_size=chunk_size or 65536)
+        return {"results": results, "param_values": param_values}
 
-    for i, combination in enumerate(param_combinations):
-        kwargs.update({param_name: value for param_name, value in zip(param_ranges.keys(), combination)})
-        index = tuple(np.searchsorted(param_values[param_name], value)
-                      for param_name, value in zip(param_ranges.keys(), combination))
-        results[index] = get_buying_diff(**kwargs)
+    func = get_buying_diff_over_years if "at_year" in param_values else get_buying_diff
+    results = run_grid(func, param_values, kwargs, executor=executor, max_workers=max_workers,
+                       chunk_size=chunk_size, time_axis="at_year")
 
     return {"results": results, "param_values": param_values}
 
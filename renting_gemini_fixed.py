@@ -1,6 +1,12 @@
 import pandas as pd
 import numpy as np
 
+from amortization import amortization_schedule
+from buy_v_rent import calculate_growth_repeated_investments
+from profiling import profiled, stage
+from sweep import run_adaptive_grid, run_grid, run_grid_to_file
+
+@profiled()
 def yearly_incrementing(initial_val, interest, years):
     # calculates rent with 1 year lag to home interest (comment from original)
     # Behavior: value is constant for 12 months, then increments.
@@ -15,52 +21,30 @@ def yearly_incrementing(initial_val, interest, years):
 def cumulative_sum(series):
     return series.cumsum()
 
+@profiled()
 def get_monthly_amortization_details(
         loan_principal, monthly_p_i_payment, monthly_loan_interest_rate, loan_term_years, total_years_sim):
-    
-    loan = loan_principal
-    interests_paid = []
-    principals_paid = []
-    remaining_balances = []
-    
+
     num_loan_payments = loan_term_years * 12
 
-    for i in range(total_years_sim * 12):
-        if i < num_loan_payments and loan > 0:
-            interest_for_month = loan * monthly_loan_interest_rate
-            
-            principal_for_month = monthly_p_i_payment - interest_for_month
-            
-            if loan + interest_for_month <= monthly_p_i_payment : # Final payment might be smaller
-                principal_for_month = loan
-                interest_for_month = loan * monthly_loan_interest_rate # Interest on remaining
-                # actual_payment_this_month = loan + interest_for_month # This would be the true final payment
-                # For simplicity, assume monthly_p_i_payment is made, and loan reduces.
-                # If monthly_p_i_payment overpays slightly on last payment, principal_for_month might be > loan.
-                if principal_for_month > loan:
-                    principal_for_month = loan
-
-            loan -= principal_for_month
-            
-            if loan < 0.01: # Effectively zero
-                loan = 0
-                # Adjust principal if it caused overpayment. Interest is based on pre-payment balance.
-                if principal_for_month > (loan_principal if i == 0 else remaining_balances[-1]): # Check if principal paid exceeds previous balance
-                     # This case needs careful handling if monthly_p_i_payment is not perfect
-                     pass
-
-
-            interests_paid.append(interest_for_month)
-            principals_paid.append(principal_for_month)
-            remaining_balances.append(loan)
-        else:
-            interests_paid.append(0)
-            principals_paid.append(0)
-            remaining_balances.append(0) # Loan paid off
-            
+    remaining_balances, interests_paid, principals_paid = amortization_schedule(
+        loan_principal,
+        monthly_loan_interest_rate,
+        monthly_p_i_payment,
+        total_years_sim * 12,
+        num_loan_payments,
+        payoff_tolerance=0.01, # Effectively zero
+    )
+
+    # Nothing is owed or paid after the loan term.
+    after_term = np.arange(total_years_sim * 12) >= num_loan_payments
+    interests_paid[after_term] = 0
+    remaining_balances[after_term] = 0
+
     return interests_paid, principals_paid, remaining_balances
 
 
+@profiled()
 def get_data(total_years=45,
              initial_rent=1500,
              home_price=800000,
@@ -92,79 +76,89 @@ def get_data(total_years=45,
     else: # No loan
         monthly_payment_p_i = 0
 
-    df = pd.DataFrame({"months": list(range(months))})
-    df['year'] = df['months'] / 12
+    # Every column is computed as a whole NumPy array and the DataFrame is built once at the end.
+    month_index = np.arange(months)
+    stock_growth = 1 + monthly_stock_interest
 
     # --- Home Value and Property Tax ---
-    df['home_value'] = yearly_incrementing(home_price, home_value_interest, total_years)
-    df['property_tax_monthly'] = df['home_value'] * property_tax_rate / 12
+    home_value = np.asarray(yearly_incrementing(home_price, home_value_interest, total_years), dtype=float)
+    property_tax_monthly = home_value * property_tax_rate / 12
 
     # --- Loan Details ---
     amort_interests, amort_principals, amort_balances = get_monthly_amortization_details(
         loan_principal, monthly_payment_p_i, monthly_loan_interest_rate, loan_term_years, total_years
     )
-    df['monthly_interest_paid'] = amort_interests
-    df['monthly_principal_paid'] = amort_principals
-    df['remaining_loan_balance'] = amort_balances
-    
-    df['actual_monthly_p_i_payment'] = 0.0
+
     # P&I payments only occur during the loan term and if there's a loan
+    actual_monthly_p_i_payment = np.zeros(months)
     if loan_principal > 0:
-      df.loc[df['months'] < num_loan_payments, 'actual_monthly_p_i_payment'] = monthly_payment_p_i
+        actual_monthly_p_i_payment[month_index < num_loan_payments] = monthly_payment_p_i
 
 
     # --- RENTING SCENARIO ---
-    df['rent_monthly'] = yearly_incrementing(initial_rent, home_value_interest, total_years)
+    rent_monthly = np.asarray(yearly_incrementing(initial_rent, home_value_interest, total_years), dtype=float)
 
     # Investment of the down payment amount (compounded value)
-    # (df['months'] + 1) because 0-indexed months, compounding happens over the period
-    df['renter_invested_down_payment_value'] = down_payment * (1 + monthly_stock_interest)**(df['months'] + 1)
+    # (month_index + 1) because 0-indexed months, compounding happens over the period
+    renter_invested_down_payment_value = down_payment * stock_growth**(month_index + 1)
 
     # Monthly cash flow difference for renter to invest
     # This is (Buyer's P&I + Buyer's Property Tax) - Renter's Rent
-    df['renter_monthly_cash_to_invest'] = (df['actual_monthly_p_i_payment'] + df['property_tax_monthly']) - df['rent_monthly']
-    
-    df['renter_cumulative_investments'] = 0.0
-    current_investment_balance_renter = 0.0
-    for i in range(months):
-        contribution = df.loc[i, 'renter_monthly_cash_to_invest']
-        # Investment balance grows, then new contribution is added and grows for the next period.
-        # Or, contribution added, then total grows. Let's use: (balance + contribution) * growth
-        current_investment_balance_renter = (current_investment_balance_renter + contribution) * (1 + monthly_stock_interest)
-        df.loc[i, 'renter_cumulative_investments'] = current_investment_balance_renter
-        
-    df['renting'] = df['renter_invested_down_payment_value'] + df['renter_cumulative_investments']
+    renter_monthly_cash_to_invest = (actual_monthly_p_i_payment + property_tax_monthly) - rent_monthly
+
+    # Each contribution is added and then the whole balance grows: b[i] = (b[i-1] + c[i]) * g,
+    # which is g times the calculate_growth_repeated_investments recurrence.
+    renter_cumulative_investments = calculate_growth_repeated_investments(
+        renter_monthly_cash_to_invest, monthly_stock_interest) * stock_growth
+
+    renting = renter_invested_down_payment_value + renter_cumulative_investments
 
     # --- BUYING SCENARIO ---
-    df['home_equity'] = df['home_value'] - df['remaining_loan_balance']
     # Ensure equity isn't negative if home value drops below remaining loan
-    df['home_equity'] = df['home_equity'].clip(lower=0)
+    home_equity = np.maximum(home_value - amort_balances, 0)
 
+    buyer_cumulative_property_tax_paid = np.cumsum(property_tax_monthly)
+    buyer_cumulative_interest_paid = np.cumsum(amort_interests)
 
-    df['buyer_cumulative_property_tax_paid'] = cumulative_sum(df['property_tax_monthly'])
-    df['buyer_cumulative_interest_paid'] = cumulative_sum(df['monthly_interest_paid'])
-    
     # Investments after mortgage is paid off
-    df['buyer_monthly_cash_to_invest_post_loan'] = 0.0
+    buyer_monthly_cash_to_invest_post_loan = np.zeros(months)
     if loan_principal > 0: # Only if there was a loan to pay off
-        df.loc[df['months'] >= num_loan_payments, 'buyer_monthly_cash_to_invest_post_loan'] = monthly_payment_p_i
-    
-    df['buyer_cumulative_investments_post_loan'] = 0.0
-    current_investment_balance_buyer_post_loan = 0.0
-    for i in range(months):
-        contribution = df.loc[i, 'buyer_monthly_cash_to_invest_post_loan']
-        current_investment_balance_buyer_post_loan = (current_investment_balance_buyer_post_loan + contribution) * (1 + monthly_stock_interest)
-        df.loc[i, 'buyer_cumulative_investments_post_loan'] = current_investment_balance_buyer_post_loan
+        buyer_monthly_cash_to_invest_post_loan[month_index >= num_loan_payments] = monthly_payment_p_i
+
+    buyer_cumulative_investments_post_loan = calculate_growth_repeated_investments(
+        buyer_monthly_cash_to_invest_post_loan, monthly_stock_interest) * stock_growth
 
     # Buyer's Net Position:
     # Home Equity - Initial Down Payment Outlay - Cumulative Taxes Paid - Cumulative Interest Paid + Investments made after loan payoff
-    df['buying'] = (df['home_equity'] - 
-                       down_payment - 
-                       df['buyer_cumulative_property_tax_paid'] - 
-                       df['buyer_cumulative_interest_paid'] + 
-                       df['buyer_cumulative_investments_post_loan'])
-    
-    df['diff'] = df['buying'] - df['renting']
+    buying = (home_equity -
+              down_payment -
+              buyer_cumulative_property_tax_paid -
+              buyer_cumulative_interest_paid +
+              buyer_cumulative_investments_post_loan)
+
+    with stage("to_dataframe"):
+        df = pd.DataFrame({
+            'months': month_index,
+            'year': month_index / 12,
+            'home_value': home_value,
+            'property_tax_monthly': property_tax_monthly,
+            'monthly_interest_paid': amort_interests,
+            'monthly_principal_paid': amort_principals,
+            'remaining_loan_balance': amort_balances,
+            'actual_monthly_p_i_payment': actual_monthly_p_i_payment,
+            'rent_monthly': rent_monthly,
+            'renter_invested_down_payment_value': renter_invested_down_payment_value,
+            'renter_monthly_cash_to_invest': renter_monthly_cash_to_invest,
+            'renter_cumulative_investments': renter_cumulative_investments,
+            'renting': renting,
+            'home_equity': home_equity,
+            'buyer_cumulative_property_tax_paid': buyer_cumulative_property_tax_paid,
+            'buyer_cumulative_interest_paid': buyer_cumulative_interest_paid,
+            'buyer_monthly_cash_to_invest_post_loan': buyer_monthly_cash_to_invest_post_loan,
+            'buyer_cumulative_investments_post_loan': buyer_cumulative_investments_post_loan,
+            'buying': buying,
+            'diff': buying - renting,
+        })
 
     return df
 
@@ -199,10 +193,55 @@ def get_buying_diff(at_year,
     return df['diff'].iloc[-1]
 
 
-def grid_search_buying_diff(param_ranges=None, **kwargs):
+def get_buying_diff_over_years(at_year,
+                               initial_rent,
+                               home_price,
+                               down_payment_perc,
+                               loan_term_years,
+                               loan_interest,
+                               property_tax_rate,
+                               stock_interest,
+                               home_value_interest,
+                               ):
+    # get_buying_diff for every year in the 1-D array at_year from a single simulation:
+    # a shorter simulation is a prefix of a longer one, so the diff at year y is
+    # row 12 * y - 1 of the run up to max(at_year). Year 0 has no rows and gives NaN.
+    at_year = np.asarray(at_year)
+    df = get_data(
+        total_years=int(at_year.max(initial=0)),
+        initial_rent=initial_rent,
+        home_price=home_price,
+        down_payment_perc=down_payment_perc,
+        loan_term_years=loan_term_years,
+        loan_interest=loan_interest,
+        property_tax_rate=property_tax_rate,
+        stock_interest=stock_interest,
+        home_value_interest=home_value_interest)
+
+    diff = df['diff'].to_numpy(dtype=float)
+    rows = at_year.astype(int) * 12 - 1
+    if diff.size == 0:
+        return np.full(rows.shape, np.nan)
+    return np.where(rows >= 0, diff[np.maximum(rows, 0)], np.nan)
+
+
+@profiled()
+def grid_search_buying_diff(param_ranges=None, executor="serial", max_workers=None, chunk_size=None,
+                            adaptive=False, coarse_step=8, gradient_threshold=None, out_dir=None, **kwargs):
     """
     Performs a grid search over specified parameters to find the buying diff.
     (Docstring from original)
+
+    executor, max_workers and chunk_size select how the grid is evaluated (see sweep.run_grid).
+    When at_year is swept, each combination of the other parameters is simulated once
+    up to the last year (get_buying_diff_over_years).
+    adaptive=True refines only the cells where the diff changes sign (or by more than
+    gradient_threshold per grid step) and returns a sweep.AdaptiveGrid; its to_dense()
+    gives the usual dictionary (see sweep.run_adaptive_grid).
+    out_dir streams the results into a resumable memory-mapped file in that directory
+    (see sweep.run_grid_to_file).
+    In every mode param_values holds the swept axes followed by a single-value array
+    for each fixed parameter.
     """
     if param_ranges is None:
         param_ranges = {}
@@ -255,32 +294,27 @@ def grid_search_buying_diff(param_ranges=None, **kwargs):
         param_values_dict = {k: np.array([v]) for k,v in kwargs.items() if k in valid_params}
 
     else:
-        param_combinations = np.array(np.meshgrid(*varying_param_values)).T.reshape(-1, len(varying_param_names))
-        
-        shape = tuple(len(values) for values in varying_param_values)
-        results_array = np.zeros(shape)
-
-        # Build the param_values dictionary for the return value
-        param_values_dict = {name: values for name, values in zip(varying_param_names, varying_param_values)}
-        for fixed_param_name in kwargs:
-             if fixed_param_name in valid_params and fixed_param_name not in param_values_dict:
-                  param_values_dict[fixed_param_name] = np.array([kwargs[fixed_param_name]])
-
-
-        for i, combination in enumerate(param_combinations):
-            current_kwargs = kwargs.copy() # Start with fixed kwargs
-            current_kwargs.update({name: value for name, value in zip(varying_param_names, combination)})
-            
-            # Determine index for results_array
-            if results_array.ndim == 1 and len(varying_param_names) == 1: # Single varying parameter
-                index = (np.searchsorted(varying_param_values[0], combination[0]),)
-            elif results_array.ndim > 1 : # Multiple varying parameters
-                 index = tuple(np.searchsorted(varying_param_values[j], combination[j]) for j in range(len(varying_param_names)))
-            else: # Should not happen if varying_param_values is not empty
-                index = ()
-
-
-            results_array[index] = get_buying_diff(**current_kwargs)
+        # The swept axes, and the param_values returned by every mode: the axes
+        # followed by a single-value entry for each fixed parameter.
+        axes = {name: values for name, values in zip(varying_param_names, varying_param_values)}
+        fixed_values = {name: np.array([kwargs[name]]) for name in kwargs
+                        if name in valid_params and name not in axes}
+        param_values_dict = dict(axes, **fixed_values)
+
+        if adaptive:
+            return run_adaptive_grid(get_buying_diff, axes, kwargs, coarse_step=coarse_step,
+                                     gradient_threshold=gradient_threshold, executor=executor,
+                                     max_workers=max_workers, chunk_size=chunk_size,
+                                     fixed_param_values=fixed_values)
+
+        if out_dir is not None:
+            results_array = run_grid_to_file(get_buying_diff, axes, kwargs, out_dir, executor=executor,
+                                              max_workers=max_workers, chunk_size=chunk_size or 65536)
+            return {"results": results_array, "param_values": param_values_dict}
+
+        func = get_buying_diff_over_years if "at_year" in axes else get_buying_diff
+        results_array = run_grid(func, axes, kwargs, executor=executor, max_workers=max_workers,
+                                 chunk_size=chunk_size, time_axis="at_year")
 
     return {"results": results_array, "param_values": param_values_dict}
 
@@ -350,6 +384,22 @@ if __name__ == "__main__":
     for hvi, diff_val in zip(search_results['param_values']['home_value_interest'], search_results['results']):
         print(f"Home Value Interest: {hvi:.2%}, Buying Advantage: {diff_val:,.0f}")
 
+    # --- Test 4: Every grid search mode reports the same parameters ---
+    import tempfile
+
+    sweep_ranges = {"at_year": (10, 31, 10), "loan_interest": (0.05, 0.08, 0.01)}
+    sweep_params = {name: value for name, value in grid_params_test.items() if name not in sweep_ranges}
+    in_memory = grid_search_buying_diff(param_ranges=sweep_ranges, home_value_interest=0.054, **sweep_params)
+    adaptive = grid_search_buying_diff(param_ranges=sweep_ranges, home_value_interest=0.054, adaptive=True,
+                                       coarse_step=2, **sweep_params).to_dense()
+    with tempfile.TemporaryDirectory() as out_dir:
+        on_disk = grid_search_buying_diff(param_ranges=sweep_ranges, home_value_interest=0.054, out_dir=out_dir,
+                                          **sweep_params)
+        assert list(on_disk["param_values"]) == list(in_memory["param_values"]), list(on_disk["param_values"])
+        assert np.allclose(on_disk["results"], in_memory["results"])
+    assert list(adaptive["param_values"]) == list(in_memory["param_values"]), list(adaptive["param_values"])
+    print("grid search param_values:", list(in_memory["param_values"]))
+
 
 if __name__ == "__main__":
     df = get_data()
@@ -0,0 +1,176 @@
+import itertools
+import json
+import os
+
+import numpy as np
+
+
+def _to_json(value):
+    """
+    JSON-friendly version of a fixed parameter value (NumPy scalars become numbers).
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    return repr(value)
+
+
+def _pair_file(first_axis, second_axis):
+    return f"pair_{first_axis}_{second_axis}.npy"
+
+
+def save_sweep(path, results, param_values, fixed_kwargs=None, pairs=None, dtype=None):
+    """
+    Saves a sweep to the directory path for fast slicing with ResultStore.
+
+    Besides the results array itself (results.npy), every pair of axes that can be
+    shown as a heatmap gets its own copy of the results with that pair as the last
+    two axes, so the 2-D slice for any combination of the other axes is one
+    contiguous block on disk. Min/max statistics of every slice along every axis are
+    computed once here and stored with the axes in sweep.json.
+
+    Args:
+      path: Directory to write (created if needed; existing files are overwritten).
+      results: The array returned by a grid search (may be a memmap).
+      param_values: The grid search's param_values, one entry per axis of results.
+      fixed_kwargs: The parameters that were held fixed, saved for reference.
+      pairs: Optional list of (name, name) axis pairs to store layouts for. Defaults
+             to every pair, which takes (n * (n - 1) / 2) copies of the results for
+             n axes.
+      dtype: Optional dtype to store the results and layouts in, e.g. np.float32 to
+             halve the store's size (default: the dtype of results).
+    """
+    results = np.asarray(results, dtype=dtype)
+    names = list(param_values)
+    if results.shape != tuple(len(values) for values in param_values.values()):
+        raise ValueError("results must have one axis per entry of param_values, in the same order.")
+    if pairs is None:
+        pairs = list(itertools.combinations(names, 2))
+
+    os.makedirs(path, exist_ok=True)
+    np.save(os.path.join(path, "results.npy"), results)
+
+    stored_pairs = []
+    for first, second in pairs:
+        first_axis, second_axis = sorted((names.index(first), names.index(second)))
+        if first_axis == second_axis:
+            raise ValueError(f"A heatmap needs two different axes, got '{first}' twice.")
+        other_axes = [axis for axis in range(results.ndim) if axis not in (first_axis, second_axis)]
+        layout = np.ascontiguousarray(np.transpose(results, other_axes + [first_axis, second_axis]))
+        np.save(os.path.join(path, _pair_file(first_axis, second_axis)), layout)
+        stored_pairs.append([first_axis, second_axis])
+
+    # Per-axis slice statistics: min and max of results[..., i, ...] for every index i.
+    slice_stats = {}
+    with np.errstate(all='ignore'):
+        for axis, name in enumerate(names):
+            by_index = np.moveaxis(results, axis, 0).reshape(results.shape[axis], -1)
+            slice_stats[name] = {
+                "min": np.nanmin(by_index, axis=1, initial=np.inf).tolist(),
+                "max": np.nanmax(by_index, axis=1, initial=-np.inf).tolist(),
+            }
+
+    description = {
+        "axes": [[name, np.asarray(values).tolist()] for name, values in param_values.items()],
+        "dtype": results.dtype.str,
+        "fixed_kwargs": {name: _to_json(value) for name, value in (fixed_kwargs or {}).items()},
+        "pairs": stored_pairs,
+        "slice_stats": slice_stats,
+        "min": float(np.nanmin(results, initial=np.inf)),
+        "max": float(np.nanmax(results, initial=-np.inf)),
+    }
+    # Written last, so a half-written store is never opened.
+    with open(os.path.join(path, "sweep.json"), "w") as f:
+        json.dump(description, f)
+
+
+class ResultStore:
+    """
+    Read access to a sweep saved with save_sweep.
+
+    All arrays are memory-mapped, so opening a store reads only sweep.json, and
+    each heatmap slice reads one contiguous block. Slices are addressed by
+    parameter value (the nearest grid value is used).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, "sweep.json")) as f:
+            description = json.load(f)
+        self.param_values = {name: np.asarray(values) for name, values in description["axes"]}
+        self.names = list(self.param_values)
+        self.fixed_kwargs = description["fixed_kwargs"]
+        self.min = description["min"]
+        self.max = description["max"]
+        self._slice_stats = description["slice_stats"]
+        self._pairs = {tuple(pair) for pair in description["pairs"]}
+        self._layouts = {}
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.param_values.values())
+
+    @property
+    def results(self):
+        """The full results array (memory-mapped)."""
+        return self._layout("results.npy")
+
+    def _layout(self, file_name):
+        if file_name not in self._layouts:
+            self._layouts[file_name] = np.load(os.path.join(self.path, file_name), mmap_mode="r")
+        return self._layouts[file_name]
+
+    def index_of(self, name, value):
+        """
+        Index of the grid value of parameter name nearest to value.
+        """
+        if name not in self.param_values:
+            raise ValueError(f"Unknown parameter '{name}', expected one of {self.names}.")
+        return int(np.argmin(np.abs(self.param_values[name] - value)))
+
+    def slice_stats(self, name, value):
+        """
+        (min, max) of the results over all cells where parameter name is at value.
+        """
+        index = self.index_of(name, value)
+        stats = self._slice_stats[name]
+        return stats["min"][index], stats["max"][index]
+
+    def slice(self, x, y, **values):
+        """
+        The 2-D heatmap slice with parameter x across and parameter y down.
+
+        Args:
+          x, y: Names of the two parameters to show.
+          **values: Values for the other parameters; each missing one is taken at its
+                    first grid value.
+
+        Returns:
+          An array of shape (len(y values), len(x values)) - rows are y, as a
+          heatmap's z expects.
+        """
+        for name in (x, y, *values):
+            if name not in self.param_values:
+                raise ValueError(f"Unknown parameter '{name}', expected one of {self.names}.")
+        if x == y:
+            raise ValueError("x and y must be different parameters.")
+
+        x_axis, y_axis = self.names.index(x), self.names.index(y)
+        first_axis, second_axis = sorted((x_axis, y_axis))
+        index = tuple(self.index_of(name, values[name]) if name in values else 0
+                      for axis, name in enumerate(self.names) if axis not in (first_axis, second_axis))
+
+        if (first_axis, second_axis) in self._pairs:
+            block = self._layout(_pair_file(first_axis, second_axis))[index]
+        else:
+            # No stored layout for this pair: gather it from the full array (strided read).
+            full_index = list(index)
+            full_index.insert(first_axis, slice(None))
+            full_index.insert(second_axis, slice(None))
+            block = self.results[tuple(full_index)]
+
+        # block has the lower-numbered axis first; rows must be y.
+        return np.asarray(block.T if x_axis < y_axis else block)
@@ -0,0 +1,263 @@
+import functools
+import hashlib
+import inspect
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import amortization
+import buy_v_rent
+import buy_v_rent_point_in_time as pit
+import column_graph
+import kernels
+import renting
+from column_graph import ColumnArrays
+
+# Modules whose code decides the cached results; see model_version.
+MODEL_MODULES = (amortization, column_graph, kernels, buy_v_rent, pit, renting)
+
+
+def model_version(modules=MODEL_MODULES):
+    """
+    Hash of the source code of modules. Results stored on disk under a different
+    version came from different model code and are discarded.
+    """
+    digest = hashlib.sha256()
+    for module in modules:
+        digest.update(module.__name__.encode())
+        digest.update(inspect.getsource(module).encode())
+    return digest.hexdigest()
+
+
+def _normalize(value, significant_digits):
+    """
+    Canonical, hashable form of one parameter value.
+
+    Numbers are rounded to significant_digits so that e.g. 0.1 + 0.2 and 0.3 map to
+    the same key, and ints, floats and NumPy scalars of the same value are equal.
+    """
+    if isinstance(value, (bool, np.bool_)) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(f"{float(value):.{significant_digits}g}")
+    if isinstance(value, np.ndarray):
+        return ("ndarray", value.shape, tuple(_normalize(item, significant_digits) for item in value.ravel().tolist()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize(item, significant_digits) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _normalize(item, significant_digits)) for key, item in value.items()))
+    return value
+
+
+def _size_in_bytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size_in_bytes(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    """
+    A copy that the caller may modify without touching the cached value.
+    """
+    if isinstance(value, (pd.DataFrame, np.ndarray)):
+        return value.copy()
+    if isinstance(value, ColumnArrays):
+        return ColumnArrays((key, _copy(item)) for key, item in value.items())
+    if isinstance(value, dict):
+        return {key: _copy(item) for key, item in value.items()}
+    return value
+
+
+class ScenarioCache:
+    """
+    LRU cache of scenario results keyed on normalized parameters.
+
+    Entries are evicted least-recently-used first once there are more than maxsize
+    of them or they take more than max_bytes in total. With cache_dir set, every
+    result is also stored in an sqlite file there and memory misses fall back to
+    it, so results survive process restarts. The file records the model_version it
+    was written with and is emptied when opened with a different one, so editing
+    the model never serves stale results.
+
+    The disk tier unpickles what it reads, and unpickling can run arbitrary code:
+    only point cache_dir at a directory that no one else can write to.
+
+    Cached values are returned as copies, so callers can modify DataFrames and
+    dicts freely. Callers that only read results can pass copy_results=False to
+    skip the copy.
+    """
+
+    def __init__(self, maxsize=1024, max_bytes=256 * 2**20, significant_digits=12, cache_dir=None, copy_results=True,
+                 version=None):
+        """
+        Args:
+          version: Version of the disk tier's contents (default: model_version()).
+        """
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self.significant_digits = significant_digits
+        self.cache_dir = cache_dir
+        self.copy_results = copy_results
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+        self._db = None
+        self.version = version
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(cache_dir, "scenarios.sqlite"), check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS scenarios (key TEXT PRIMARY KEY, value BLOB)")
+            self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+            if self.version is None:
+                self.version = model_version()
+            row = self._db.execute("SELECT value FROM meta WHERE name = 'model_version'").fetchone()
+            if row is None or row[0] != self.version:
+                # Written by other model code (or before versions were recorded).
+                self._db.execute("DELETE FROM scenarios")
+                self._db.execute("INSERT OR REPLACE INTO meta (name, value) VALUES ('model_version', ?)",
+                                 (self.version,))
+            self._db.commit()
+
+    def make_key(self, func, args, kwargs, signature=None):
+        """
+        (function name, sorted normalized arguments including defaults).
+        """
+        if signature is None:
+            signature = inspect.signature(func)
+        bound = signature.bind(*args, **kwargs)
+        bound.apply_defaults()
+        normalized = tuple(sorted((name, _normalize(value, self.significant_digits))
+                                  for name, value in bound.arguments.items()))
+        return (f"{func.__module__}.{func.__qualname__}", normalized)
+
+    def _disk_key(self, key):
+        return hashlib.sha256(repr(key).encode()).hexdigest()
+
+    def get(self, key):
+        """
+        The cached value for key (not copied), or None.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value FROM scenarios WHERE key = ?", (self._disk_key(key),)).fetchone()
+                if row is not None:
+                    value = pickle.loads(row[0])
+                    self._store_in_memory(key, value)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._store_in_memory(key, value)
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO scenarios (key, value) VALUES (?, ?)",
+                                 (self._disk_key(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)))
+                self._db.commit()
+
+    def _store_in_memory(self, key, value):
+        nbytes = _size_in_bytes(value)
+        if key in self._entries:
+            self.current_bytes -= self._entries.pop(key)[1]
+        if nbytes > self.max_bytes:
+            return
+        self._entries[key] = (value, nbytes)
+        self.current_bytes += nbytes
+        while len(self._entries) > self.maxsize or self.current_bytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_bytes
+
+    def clear(self, disk=False):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.disk_hits = 0
+            if disk and self._db is not None:
+                self._db.execute("DELETE FROM scenarios")
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+            }
+
+    def wrap(self, func):
+        """
+        A cached version of func. The cache is available as wrapper.cache.
+        """
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = self.make_key(func, args, kwargs, signature)
+            value = self.get(key)
+            if value is None:
+                value = func(*args, **kwargs)
+                self.put(key, value)
+            return _copy(value) if self.copy_results else value
+
+        wrapper.cache = self
+        return wrapper
+
+
+default_cache = ScenarioCache()
+
+cached_get_data_at_year = default_cache.wrap(pit.get_data_at_year)
+cached_buy_v_rent_get_data = default_cache.wrap(buy_v_rent.get_data)
+cached_renting_get_data = default_cache.wrap(renting.get_data)
+
+
+if __name__ == "__main__":
+    import tempfile
+
+    cache = ScenarioCache(maxsize=2)
+    get_data_at_year = cache.wrap(pit.get_data_at_year)
+    get_data_at_year(10)
+    get_data_at_year(10.0)  # the same normalized key: a hit
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1, cache.stats()
+    get_data_at_year(20)
+    get_data_at_year(30)    # a third entry evicts the least recently used one (year 10)
+    assert cache.stats()["entries"] == 2
+    get_data_at_year(10)
+    assert cache.stats()["misses"] == 4, cache.stats()
+    print("memory tier:", cache.stats())
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ScenarioCache(cache_dir=cache_dir)
+        cache.wrap(pit.get_data_at_year)(15)
+        reopened = ScenarioCache(cache_dir=cache_dir)
+        reopened.wrap(pit.get_data_at_year)(15)
+        assert reopened.stats()["disk_hits"] == 1, reopened.stats()
+        changed_model = ScenarioCache(cache_dir=cache_dir, version="other model code")
+        changed_model.wrap(pit.get_data_at_year)(15)
+        assert changed_model.stats()["misses"] == 1, changed_model.stats()
+        for db in (cache, reopened, changed_model):
+            db._db.close()
+    print("disk tier: hit after reopening, miss after a model version change")
@@ -0,0 +1,144 @@
+import inspect
+
+import numpy as np
+import pandas as pd
+
+import buy_v_rent_point_in_time as pit
+
+# Parameters of the point-in-time model that the diff is differentiated with respect to.
+PARAMS = tuple(name for name in pit.SCENARIO_COLUMNS if name != "target_year")
+
+# Imaginary step of the complex-step derivative. There is no subtraction of nearly
+# equal numbers, so it can be tiny and the result is exact to rounding.
+COMPLEX_STEP = 1e-20
+
+
+def _defaults():
+    """get_data_at_year's default value of every parameter in PARAMS."""
+    signature = inspect.signature(pit.get_data_at_year)
+    return {name: signature.parameters[name].default for name in PARAMS}
+
+
+def diff_gradient(at_year, wrt=PARAMS, **params):
+    """
+    The buy-minus-rent diff at at_year and its partial derivative with respect to each parameter.
+
+    All derivatives come from one evaluation of the closed-form batch model
+    (get_data_at_year_batch with solver="closed_form") using complex-step
+    differentiation: the model runs on complex inputs with one lane per parameter
+    in wrt, where lane p has a tiny imaginary step added to parameter p. The
+    imaginary part of each lane's diff, divided by the step, is the exact
+    derivative, with none of the step-size noise of finite differences.
+
+    The diff is piecewise smooth: at a kink (e.g. the loan being paid off exactly
+    at at_year) the derivative of the side the scenario is on is returned.
+    loan_term_years is differentiated as a continuous parameter.
+
+    Args:
+      at_year: Whole number of years at which the diff is measured.
+      wrt: Names of the parameters to differentiate with respect to (default: all of PARAMS).
+      **params: Other parameters of get_data_at_year (defaults are used for the rest).
+                Scalars or arrays; arrays are broadcast against each other and
+                define a batch of scenarios (a grid, if shaped with np.ix_).
+
+    Returns:
+      A tuple (diff, gradient): diff with the broadcast shape S of at_year and
+      params (a number if that is ()), and {name: d diff / d name} with the same shape.
+    """
+    unknown = [name for name in list(wrt) + list(params) if name not in PARAMS]
+    if unknown:
+        raise ValueError(f"Unknown parameters {unknown}, expected names from PARAMS.")
+
+    values = dict(_defaults(), **params)
+    arrays = np.broadcast_arrays(np.asarray(at_year, dtype=float),
+                                 *(np.asarray(values[name], dtype=float) for name in PARAMS))
+    at_year, arrays = arrays[0], dict(zip(PARAMS, arrays[1:]))
+    shape = at_year.shape
+
+    # Lane p (the new leading axis) steps parameter wrt[p] in the imaginary direction.
+    num_lanes = len(wrt)
+    lanes = {}
+    for name in PARAMS:
+        lane_values = np.broadcast_to(arrays[name], (max(num_lanes, 1),) + shape).astype(complex)
+        if name in wrt:
+            lane_values[list(wrt).index(name)] += 1j * COMPLEX_STEP
+        lanes[name] = lane_values
+
+    result = pit.get_data_at_year_batch(target_year=at_year, solver="closed_form", **lanes)
+    diff = result['effective_net_worth_with_home'] - result['effective_net_worth_renting']
+
+    value = diff[0].real
+    gradient = {name: diff[lane].imag / COMPLEX_STEP for lane, name in enumerate(wrt)}
+    if shape == ():
+        return float(value), {name: float(derivative) for name, derivative in gradient.items()}
+    return value, gradient
+
+
+def tornado(at_year, deltas=None, relative=0.1, wrt=PARAMS, **params):
+    """
+    Parameters ranked by how much they move the diff, ready for a tornado chart.
+
+    Each parameter is moved down and up by its delta and the change of the diff is
+    estimated to first order from diff_gradient (derivative * delta), so ranking
+    every parameter costs a single model evaluation.
+
+    Args:
+      at_year, wrt, **params: See diff_gradient. With array params the changes are
+                              averaged over the batch of scenarios.
+      deltas: Optional {name: delta} with the size of the move of some parameters,
+              e.g. {"loan_interest": 0.01} for one percentage point. Scalars or
+              arrays (broadcast against params).
+      relative: Parameters not in deltas move by this fraction of their own value
+                (so a parameter that is 0, like the default tenant rent, gets no bar).
+
+    Returns:
+      A DataFrame indexed by parameter, largest impact first, with columns diff
+      (the mean diff), delta (the mean move), low and high (the mean change of the
+      diff when the parameter moves down or up) and impact (the mean absolute change).
+    """
+    deltas = deltas or {}
+    unknown = [name for name in deltas if name not in wrt]
+    if unknown:
+        raise ValueError(f"Deltas given for {unknown}, which are not in wrt.")
+
+    diff, gradient = diff_gradient(at_year, wrt=wrt, **params)
+    values = dict(_defaults(), **params)
+    rows = {}
+    for name in wrt:
+        delta = deltas[name] if name in deltas else relative * np.abs(np.asarray(values[name], dtype=float))
+        change = np.broadcast_to(gradient[name] * delta, np.shape(diff))
+        rows[name] = {
+            "diff": np.mean(diff),
+            "delta": np.mean(delta),
+            "low": -np.mean(change),
+            "high": np.mean(change),
+            "impact": np.mean(np.abs(change)),
+        }
+    table = pd.DataFrame.from_dict(rows, orient="index")
+    table.index.name = "param"
+    return table.sort_values("impact", ascending=False)
+
+
+if __name__ == "__main__":
+    def diff_at(**params):
+        result = pit.get_data_at_year_batch(at_year, solver="closed_form", **params)
+        return float(result['effective_net_worth_with_home'] - result['effective_net_worth_renting'])
+
+    # The complex-step gradient should agree with central finite differences. The
+    # diff has a kink in loan_term_years where it equals at_year (the payments stop),
+    # so the scenario stays a few years away from it.
+    at_year = 20
+    scenario = dict(initial_rent=2500, home_price=700000, loan_interest=0.06, tenant_rent_initial=300,
+                    loan_term_years=30)
+    diff, gradient = diff_gradient(at_year, **scenario)
+    for name, derivative in gradient.items():
+        value = dict(_defaults(), **scenario)[name]
+        step = 1e-6 * max(abs(value), 1)
+        finite_difference = (diff_at(**dict(scenario, **{name: value + step}))
+                             - diff_at(**dict(scenario, **{name: value - step}))) / (2 * step)
+        print(f"{name:22s} {derivative:16.4f} {finite_difference:16.4f}")
+        assert abs(derivative - finite_difference) <= 1e-5 * max(abs(finite_difference), 1), name
+
+    rng = np.random.default_rng(0)
+    print(tornado(30, deltas={"loan_interest": 0.01, "stock_interest": 0.01, "home_value_interest": 0.01},
+                  home_price=rng.uniform(3e5, 1.5e6, 10000), initial_rent=rng.uniform(1000, 5000, 10000)))
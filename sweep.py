@@ -0,0 +1,505 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from profiling import profiled, stage
+
+EXECUTORS = ("serial", "thread", "process")
+
+
+def expand_param_ranges(param_ranges):
+    """
+    Turns {name: (start, stop, step)} into {name: np.arange(start, stop, step)}.
+    """
+    return {param_name: np.arange(start, stop, step)
+            for param_name, (start, stop, step) in param_ranges.items()}
+
+
+@profiled("sweep.evaluate_chunk")
+def _evaluate_chunk(func, fixed_kwargs, param_names, vectorized, result_shape, combinations, dtype=float):
+    """
+    Evaluates func for one chunk of parameter combinations.
+
+    combinations holds one array per parameter (as returned by LazyCombinations),
+    so every parameter keeps the dtype of its axis. Each combination gives a result
+    of shape result_shape: () normally, or (number of time values,) for a time-axis
+    sweep.
+
+    Module level so that it can be pickled and sent to a process pool.
+    """
+    # With no swept parameters there is exactly one combination: fixed_kwargs alone.
+    num_combinations = len(combinations[0]) if combinations else 1
+    if vectorized:
+        call_kwargs = dict(fixed_kwargs, **dict(zip(param_names, combinations)))
+        return np.broadcast_to(func(**call_kwargs), (num_combinations,) + result_shape)
+
+    results = np.zeros((num_combinations,) + result_shape, dtype=dtype)
+    # tolist() hands func plain Python ints and floats.
+    rows = zip(*(values.tolist() for values in combinations)) if combinations else [()]
+    for i, combination in enumerate(rows):
+        # A fresh dict per call, so the caller's kwargs are never mutated.
+        call_kwargs = dict(fixed_kwargs, **dict(zip(param_names, combination)))
+        results[i] = func(**call_kwargs)
+    return results
+
+
+def _make_executor(executor, max_workers):
+    if executor == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers)
+    if executor == "process":
+        return ProcessPoolExecutor(max_workers=max_workers)
+    raise ValueError(f"Unknown executor '{executor}', expected one of {EXECUTORS} or a concurrent.futures.Executor.")
+
+
+@profiled("sweep.run_grid")
+def run_grid(func, param_values, fixed_kwargs, executor="serial", max_workers=None, chunk_size=None, vectorized=False,
+             time_axis=None, dtype=float):
+    """
+    Evaluates func over every combination of the swept parameter values.
+
+    Combinations are enumerated by their flat (C-order) index into the results array
+    and split into chunks of chunk_size consecutive indices. Each chunk's parameter
+    values are gathered from the axes (see LazyCombinations), the chunk is evaluated
+    by the chosen executor, and its results are written to the matching contiguous
+    block of the flattened results array, so no value ever has to be looked up.
+
+    When time_axis names one of the swept parameters (e.g. "at_year"), that parameter
+    is not part of the combinations. Instead func receives all of its values as one
+    array and returns one result per value (a trailing axis), so models whose shorter
+    horizons are prefixes of longer ones simulate once to the longest horizon per
+    combination instead of once per horizon.
+
+    Args:
+      func: Called as func(**fixed_kwargs, **swept_values) and returns one number (but see
+            time_axis). Must be defined at module level when executor="process".
+      param_values: A dictionary of parameter name -> 1-D array of values. Its order
+                    defines the axes of the results array.
+      fixed_kwargs: Parameters that are the same for every combination. Not modified.
+      executor: "serial", "thread", "process", or an existing concurrent.futures.Executor.
+      max_workers: Number of workers for the thread/process pools (default: CPU count).
+      chunk_size: Number of combinations per task. Defaults to all combinations when
+                  serial, and to about four chunks per worker otherwise.
+      vectorized: If True, func accepts arrays and is called once per chunk with one
+                  array per swept parameter instead of once per combination.
+      time_axis: Optional name of a swept parameter that func takes as a whole array
+                 (see above). func then returns an array whose last axis matches the
+                 values of that parameter (shape (chunk, values) when vectorized).
+      dtype: dtype of the results array, e.g. np.float32 to halve its memory. func's
+             own precision is up to func (pass it a dtype through fixed_kwargs if
+             it takes one); sample_drift measures what the reduction cost.
+
+    Returns:
+      A NumPy array of shape (len(values) for values in param_values.values()).
+    """
+    if time_axis is not None and time_axis in param_values:
+        time_values = param_values[time_axis]
+        time_position = list(param_values).index(time_axis)
+        # Sweep the other parameters and put the time axis back in place at the end.
+        other_values = {param_name: values for param_name, values in param_values.items() if param_name != time_axis}
+        results = _run_grid(func, other_values, dict(fixed_kwargs, **{time_axis: time_values}),
+                            executor, max_workers, chunk_size, vectorized, (len(time_values),), dtype)
+        return np.moveaxis(results, -1, time_position)
+
+    return _run_grid(func, param_values, fixed_kwargs, executor, max_workers, chunk_size, vectorized, (), dtype)
+
+
+def _run_grid(func, param_values, fixed_kwargs, executor, max_workers, chunk_size, vectorized, result_shape, dtype):
+    """
+    run_grid without the time axis; every combination gives a result of shape result_shape.
+    """
+    param_names = list(param_values.keys())
+    combinations = LazyCombinations(param_values)
+    results = np.zeros(combinations.shape + result_shape, dtype=dtype)
+    if len(combinations) == 0:
+        return results
+
+    # Combination i belongs at flat index i, so each chunk fills a contiguous block.
+    flat_results = results.reshape((-1,) + result_shape)
+    for start, stop, chunk_result in _evaluate_combinations(func, fixed_kwargs, param_names, combinations,
+                                                            executor, max_workers, chunk_size, vectorized,
+                                                            result_shape, dtype=dtype):
+        with stage("sweep.store_results"):
+            flat_results[start:stop] = chunk_result
+
+    return results
+
+
+def _evaluate_combinations(func, fixed_kwargs, param_names, combinations, executor, max_workers, chunk_size,
+                           vectorized, result_shape=(), bounds=None, dtype=float):
+    """
+    Splits combinations into chunks, evaluates them with the chosen executor and
+    yields (start, stop, chunk_result) for every chunk, in order.
+
+    combinations only needs len() and slicing, so it can generate its rows lazily
+    (see LazyCombinations). bounds optionally lists the (start, stop) chunks to
+    evaluate, e.g. only the unfinished ones of a resumed sweep.
+    """
+    num_combinations = len(combinations)
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if chunk_size is None:
+        chunk_size = num_combinations if executor == "serial" else -(-num_combinations // (4 * max_workers))
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+
+    if bounds is None:
+        bounds = [(start, min(start + chunk_size, num_combinations))
+                  for start in range(0, num_combinations, chunk_size)]
+    evaluate = partial(_evaluate_chunk, func, fixed_kwargs, param_names, vectorized, result_shape, dtype=dtype)
+    chunks = (combinations[start:stop] for start, stop in bounds)
+
+    if executor == "serial":
+        chunk_results = map(evaluate, chunks)
+        pool = None
+    elif isinstance(executor, Executor):
+        chunk_results = _map_in_order(executor, evaluate, chunks, 2 * max_workers)
+        pool = None
+    else:
+        pool = _make_executor(executor, max_workers)
+        chunk_results = _map_in_order(pool, evaluate, chunks, 2 * max_workers)
+
+    try:
+        for (start, stop), chunk_result in zip(bounds, chunk_results):
+            yield start, stop, chunk_result
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+
+def _map_in_order(executor, func, items, max_pending):
+    """
+    Like executor.map, but submits at most max_pending items ahead of the results
+    being consumed, so lazily generated chunks are not all built up front.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= max_pending:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class LazyCombinations:
+    """
+    The combinations of param_values, generated on demand from integer grid indices.
+
+    Combination i is the one at flat (C-order) index i of the results array, or at
+    flat_indices[i] when only some cells are wanted. combinations[start:stop] turns
+    those flat indices into per-axis indices with unravel_index and gathers the
+    values from the axes, returning one array per parameter (each with its axis'
+    dtype). It costs memory for stop - start combinations only.
+    """
+
+    def __init__(self, param_values, flat_indices=None):
+        self.param_values = [np.asarray(values) for values in param_values.values()]
+        self.shape = tuple(len(values) for values in self.param_values)
+        self.flat_indices = flat_indices
+
+    def __len__(self):
+        if self.flat_indices is not None:
+            return len(self.flat_indices)
+        return int(np.prod(self.shape))
+
+    def __getitem__(self, rows):
+        start, stop, _ = rows.indices(len(self))
+        if not self.param_values:
+            return ()
+        with stage("sweep.combinations"):
+            flat = np.arange(start, stop) if self.flat_indices is None else self.flat_indices[start:stop]
+            indices = np.unravel_index(flat, self.shape)
+            return tuple(values[index] for values, index in zip(self.param_values, indices))
+
+
+def run_grid_to_file(func, param_values, fixed_kwargs, path, executor="serial", max_workers=None,
+                     chunk_size=65536, vectorized=False, dtype=float):
+    """
+    run_grid for grids that do not fit in memory, with results written to disk.
+
+    Combinations are generated chunk by chunk from flat indices, and every finished chunk is written straight into a
+    memory-mapped results.npy in the directory path. A done.npy bitmap records which
+    chunks are finished, so running the same sweep again with the same path resumes
+    where a crashed or interrupted run stopped.
+
+    Args:
+      func, param_values, fixed_kwargs, executor, max_workers, vectorized, dtype: See run_grid.
+      path: Directory for results.npy, done.npy and sweep.json (created if needed).
+      chunk_size: Number of combinations per chunk; also the unit of resumption.
+
+    Returns:
+      The results as a read-only memory-mapped array with one axis per swept
+      parameter. Cells of unfinished chunks are NaN.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1.")
+    param_names = list(param_values)
+    combinations = LazyCombinations(param_values)
+    shape = combinations.shape
+    num_combinations = len(combinations)
+    num_chunks = -(-num_combinations // chunk_size)
+
+    # Enough to tell whether an existing directory holds this very sweep.
+    description = {
+        "func": f"{func.__module__}.{func.__qualname__}",
+        "param_values": [[name, np.asarray(values).tolist()] for name, values in param_values.items()],
+        "fixed_kwargs": {name: repr(value) for name, value in sorted(fixed_kwargs.items())},
+        "chunk_size": chunk_size,
+    }
+    os.makedirs(path, exist_ok=True)
+    results_path = os.path.join(path, "results.npy")
+    done_path = os.path.join(path, "done.npy")
+    description_path = os.path.join(path, "sweep.json")
+
+    if os.path.exists(description_path):
+        with open(description_path) as f:
+            if json.load(f) != description:
+                raise ValueError(f"'{path}' holds the results of a different sweep; use another path.")
+        results = np.load(results_path, mmap_mode="r+")
+        done = np.load(done_path, mmap_mode="r+")
+        if results.dtype != np.dtype(dtype):
+            raise ValueError(f"'{path}' holds {results.dtype} results, not {np.dtype(dtype)}; use another path.")
+    else:
+        results = np.lib.format.open_memmap(results_path, mode="w+", dtype=dtype, shape=shape)
+        results[...] = np.nan
+        done = np.lib.format.open_memmap(done_path, mode="w+", dtype=bool, shape=(num_chunks,))
+        results.flush()
+        done.flush()
+        # Written last, so a directory without sweep.json is never taken for a resumable sweep.
+        with open(description_path, "w") as f:
+            json.dump(description, f)
+
+    flat_results = results.reshape(-1)
+    bounds = [(chunk * chunk_size, min((chunk + 1) * chunk_size, num_combinations))
+              for chunk in np.flatnonzero(~done)]
+    if bounds:
+        for start, stop, chunk_result in _evaluate_combinations(func, fixed_kwargs, param_names, combinations,
+                                                                executor, max_workers, chunk_size, vectorized,
+                                                                bounds=bounds, dtype=dtype):
+            flat_results[start:stop] = chunk_result
+            # The results must be on disk before the chunk is marked as done.
+            results.flush()
+            done[start // chunk_size] = True
+            done.flush()
+
+    del flat_results, results, done
+    return np.load(results_path, mmap_mode="r")
+
+
+def sample_drift(func, param_values, fixed_kwargs, results, num_samples=1000, seed=0):
+    """
+    How far reduced-precision grid results are from func evaluated in float64.
+
+    func is re-evaluated (vectorized, like run_grid with vectorized=True) at up to
+    num_samples cells of the grid, drawn at random without replacement, and
+    compared with results at the same cells.
+
+    Args:
+      func: Called as func(**fixed_kwargs, **swept_values) with one array per swept
+            parameter; must compute in float64.
+      param_values: The grid's axes, one per axis of results.
+      fixed_kwargs: The fixed parameters (without any reduced-precision dtype).
+      results: The grid results to check (may be a memmap).
+      num_samples: Number of cells to check.
+      seed: Seed of the cell sample.
+
+    Returns:
+      A dictionary with the dtype of results, the number of samples, max_abs_drift,
+      mean_abs_drift, max_rel_drift (relative to max(|exact|, 1)) and sign_flips (the
+      number of sampled cells whose sign differs from the exact one).
+    """
+    flat_results = np.asarray(results).reshape(-1)
+    rng = np.random.default_rng(seed)
+    cells = np.sort(rng.choice(flat_results.size, size=min(num_samples, flat_results.size), replace=False))
+    combinations = LazyCombinations(param_values, cells)[0:len(cells)]
+    exact = np.asarray(_evaluate_chunk(func, fixed_kwargs, list(param_values), True, (), combinations), dtype=float)
+    approx = flat_results[cells].astype(float)
+    drift = np.abs(approx - exact)
+    return {
+        "dtype": str(flat_results.dtype),
+        "samples": len(cells),
+        "max_abs_drift": float(drift.max(initial=0)),
+        "mean_abs_drift": float(drift.mean()) if len(cells) else 0.0,
+        "max_rel_drift": float((drift / np.maximum(np.abs(exact), 1)).max(initial=0)),
+        "sign_flips": int(np.count_nonzero(np.sign(approx) != np.sign(exact))),
+    }
+
+
+class AdaptiveGrid:
+    """
+    Sparse result of run_adaptive_grid.
+
+    Holds the lattice points that were actually evaluated and the leaf cells of the
+    refinement. Inside a leaf cell that was not refined down to single grid steps the
+    result is taken to be multilinear between the cell's corners.
+
+    Attributes:
+      param_values: The full (dense) parameter axes, as passed to run_adaptive_grid.
+      indices: (num_evaluations, num_params) lattice indices of the evaluated points.
+      values: The result at each evaluated point.
+      leaf_lower, leaf_upper: (num_leaves, num_params) lattice indices of the lower
+                              and upper corners of every leaf cell.
+      fixed_param_values: {name: single-value array} of parameters that were not
+                          swept, added to to_dense()'s 'param_values' after the axes.
+    """
+
+    def __init__(self, param_values, indices, values, leaf_lower, leaf_upper, fixed_param_values=None):
+        self.param_values = param_values
+        self.fixed_param_values = fixed_param_values or {}
+        self.indices = indices
+        self.values = values
+        self.leaf_lower = leaf_lower
+        self.leaf_upper = leaf_upper
+
+    @property
+    def shape(self):
+        return tuple(len(values) for values in self.param_values.values())
+
+    @property
+    def num_evaluations(self):
+        return len(self.values)
+
+    def to_dense(self):
+        """
+        Resamples onto the full grid, in the same format as a dense grid search.
+
+        Returns:
+          A dictionary with 'results' (an array of shape self.shape) and
+          'param_values' (the axes, then fixed_param_values). Evaluated points keep their exact values; every other
+          point is interpolated multilinearly from the corners of its leaf cell.
+        """
+        shape = self.shape
+        results = np.full(shape, np.nan)
+        flat_evaluated = np.ravel_multi_index(tuple(self.indices.T), shape)
+        order = np.argsort(flat_evaluated)
+        flat_evaluated, evaluated_values = flat_evaluated[order], self.values[order]
+
+        spans = self.leaf_upper - self.leaf_lower
+        corner_bits = _corner_bits(len(shape))
+        for span in np.unique(spans, axis=0):
+            in_group = np.all(spans == span, axis=1)
+            lower = self.leaf_lower[in_group]
+            corners = np.where(corner_bits, (lower + span)[:, None, :], lower[:, None, :])
+            corner_values = _lookup(flat_evaluated, evaluated_values, corners, shape)
+
+            # Every lattice point of the cell and its multilinear weight for every corner.
+            offsets = np.stack(np.meshgrid(*(np.arange(size + 1) for size in span), indexing='ij'), axis=-1)
+            offsets = offsets.reshape(-1, len(shape))
+            with np.errstate(divide='ignore', invalid='ignore'):
+                fractions = np.where(span > 0, offsets / span, 0.0)
+            weights = np.prod(np.where(corner_bits[None, :, :], fractions[:, None, :], 1 - fractions[:, None, :]), axis=-1)
+
+            points = lower[:, None, :] + offsets[None, :, :]
+            results[tuple(points.reshape(-1, len(shape)).T)] = (corner_values @ weights.T).ravel()
+
+        results[tuple(self.indices.T)] = self.values
+        return {"results": results, "param_values": dict(self.param_values, **self.fixed_param_values)}
+
+
+def _corner_bits(num_params):
+    """
+    (2**num_params, num_params) booleans: which corners use the upper index on each axis.
+    """
+    return ((np.arange(2**num_params)[:, None] >> np.arange(num_params)) & 1).astype(bool)
+
+
+def _lookup(sorted_flat_indices, values, points, shape):
+    """
+    Values at lattice points (..., num_params), given sorted flat indices of the evaluated points.
+    """
+    flat = np.ravel_multi_index(tuple(np.moveaxis(points, -1, 0)), shape)
+    return values[np.searchsorted(sorted_flat_indices, flat)]
+
+
+def run_adaptive_grid(func, param_values, fixed_kwargs, coarse_step=8, gradient_threshold=None,
+                      executor="serial", max_workers=None, chunk_size=None, vectorized=False,
+                      fixed_param_values=None):
+    """
+    Evaluates func on the lattice of param_values, refining only where it matters.
+
+    Starts from every coarse_step-th value on each axis. A cell of that coarse lattice
+    is split in half along each axis (and its new corners evaluated) when its corner
+    values straddle zero, or when they differ by more than gradient_threshold per grid
+    step. Splitting repeats until cells are a single grid step wide. Cells that stay
+    coarse are interpolated by AdaptiveGrid.to_dense().
+
+    Args:
+      func, param_values, fixed_kwargs, executor, max_workers, chunk_size, vectorized:
+        See run_grid (each refinement round is evaluated as one batch of combinations).
+      coarse_step: Number of grid steps between the initially evaluated values.
+      gradient_threshold: Optional largest acceptable change of the result per grid
+                          step within an unrefined cell. None refines only where the
+                          sign changes.
+      fixed_param_values: See AdaptiveGrid (only reported, not evaluated).
+
+    Returns:
+      An AdaptiveGrid.
+    """
+    if coarse_step < 1:
+        raise ValueError("coarse_step must be at least 1.")
+    param_names = list(param_values)
+    shape = tuple(len(values) for values in param_values.values())
+    num_params = len(shape)
+    if not num_params:
+        raise ValueError("run_adaptive_grid needs at least one swept parameter.")
+    if 0 in shape:
+        empty = np.zeros((0, num_params), dtype=int)
+        return AdaptiveGrid(param_values, empty, np.zeros(0), empty, empty, fixed_param_values)
+
+    # Cells of the coarse lattice; an axis with a single value has cells of width 0.
+    coarse_cells = []
+    for size in shape:
+        coarse = np.unique(np.append(np.arange(0, size, coarse_step), size - 1))
+        coarse_cells.append((coarse[:-1], coarse[1:]) if size > 1 else (coarse, coarse))
+    lower = np.stack(np.meshgrid(*(cells[0] for cells in coarse_cells), indexing='ij'), axis=-1).reshape(-1, num_params)
+    upper = np.stack(np.meshgrid(*(cells[1] for cells in coarse_cells), indexing='ij'), axis=-1).reshape(-1, num_params)
+
+    corner_bits = _corner_bits(num_params)
+    flat_evaluated = np.zeros(0, dtype=np.int64)
+    evaluated_values = np.zeros(0)
+    leaves_lower, leaves_upper = [], []
+
+    while len(lower):
+        corners = np.where(corner_bits, upper[:, None, :], lower[:, None, :])
+        flat_corners = np.ravel_multi_index(tuple(np.moveaxis(corners, -1, 0)), shape)
+        new_points = np.setdiff1d(flat_corners, flat_evaluated)
+        if len(new_points):
+            combinations = LazyCombinations(param_values, new_points)
+            new_values = np.zeros(len(new_points))
+            for start, stop, chunk_result in _evaluate_combinations(func, fixed_kwargs, param_names, combinations,
+                                                                    executor, max_workers, chunk_size, vectorized):
+                new_values[start:stop] = chunk_result
+            flat_evaluated = np.concatenate([flat_evaluated, new_points])
+            evaluated_values = np.concatenate([evaluated_values, new_values])
+            order = np.argsort(flat_evaluated)
+            flat_evaluated, evaluated_values = flat_evaluated[order], evaluated_values[order]
+
+        corner_values = evaluated_values[np.searchsorted(flat_evaluated, flat_corners)]
+        low, high = np.min(corner_values, axis=1), np.max(corner_values, axis=1)
+        spans = upper - lower
+        refine = ((low <= 0) & (high >= 0) & (low < high)) | np.isnan(corner_values).any(axis=1)
+        if gradient_threshold is not None:
+            refine |= (high - low) > gradient_threshold * np.max(spans, axis=1, initial=1)
+        refine &= np.any(spans > 1, axis=1)
+
+        leaves_lower.append(lower[~refine])
+        leaves_upper.append(upper[~refine])
+
+        # Split every refined cell in half along each axis that is more than one step wide.
+        lower, upper = lower[refine], upper[refine]
+        middle = (lower + upper) // 2
+        split = (upper - lower) > 1
+        child_lower = np.where(corner_bits, middle[:, None, :], lower[:, None, :])
+        child_upper = np.where(corner_bits, upper[:, None, :], middle[:, None, :])
+        # Corners that would split an axis that is not split are duplicates.
+        valid = ~np.any(corner_bits[None, :, :] & ~split[:, None, :], axis=-1)
+        child_lower = np.where(split[:, None, :], child_lower, lower[:, None, :])
+        child_upper = np.where(split[:, None, :], child_upper, upper[:, None, :])
+        lower, upper = child_lower[valid], child_upper[valid]
+
+    indices = np.stack(np.unravel_index(flat_evaluated, shape), axis=-1)
+    return AdaptiveGrid(param_values, indices, evaluated_values,
+                        np.concatenate(leaves_lower), np.concatenate(leaves_upper), fixed_param_values)